@@ -9,17 +9,43 @@ LOFI DASHBOARD v3.5 — GENDEMIK DIGITAL
     * Dashboard log (journalctl -u lofi-dashboard -n 40)
 - Login protected with PBKDF2-SHA256 hash
 - Uses system_helper.sh for reboot / camera reset
+- Live updates over one SSE stream (/api/stream): a single shared
+  producer samples everything every PUSH_INTERVAL and pushes only what
+  changed, however many tabs are open
+- System + service metrics come from a background sampler (METRICS);
+  request handlers only read its latest immutable snapshot
+- Log panes come from one journal follower (journal.py) kept in memory;
+  /api/logs/<pane>?after=<cursor> returns only the new lines
+- The streamer publishes structured state (now playing, ffmpeg progress,
+  audio buffer, restarts) as JSON datagrams on STATUS_SOCKET; the
+  dashboard binds it and pushes changes out within a second
+- A 1 s sampler feeds a fixed-memory history (history.py: 1 s / 1 min /
+  1 h rings, persisted to HISTORY_FILE); /api/history serves it
+  downsampled for charts
+- /metrics serves Prometheus/OpenMetrics text: host gauges + throttle
+  flags from here, encoder/audio/watchdog counters from the streamer's
+  status datagrams (optional bearer token LOFI_DASH_METRICS_TOKEN)
 """
 
 import os
+import sys
+import json
+import atexit
+import signal
+import queue
 import socket
+import time
+import threading
 import subprocess
 from datetime import datetime
 from pathlib import Path
+from types import MappingProxyType
+from typing import Mapping, NamedTuple
 
 import psutil
 from flask import (
     Flask,
+    Response,
     render_template,
     redirect,
     url_for,
@@ -29,6 +55,10 @@ from flask import (
 )
 from werkzeug.security import check_password_hash
 
+from journal import JournalFollower, is_camera_line
+from history import MetricsHistory
+import exporter
+
 # ---------- CONFIG ----------
 
 BASE_DIR = Path(__file__).resolve().parent.parent  # /home/<user>/LofiStream
@@ -37,7 +67,9 @@ DASH_DIR = BASE_DIR / "Dashboard"
 STREAM_SERVICE = "lofi-streamer"
 DASH_SERVICE = "lofi-dashboard"
 
-CURRENT_TRACK_FILE = Path("/tmp/current_track.txt")
+CURRENT_TRACK_FILE = Path(os.environ.get("LOFI_CURRENT_TRACK_FILE", "/tmp/current_track.txt"))
+STATUS_SOCKET = Path(os.environ.get("LOFI_STATUS_SOCKET", "/tmp/lofi_status.sock"))
+STATUS_STALE = 5         # seconds without a datagram before we fall back to files
 SYSTEM_HELPER = DASH_DIR / "system_helper.sh"
 
 # Your PBKDF2 hash
@@ -49,6 +81,21 @@ SECRET_KEY = os.environ.get("LOFI_DASH_SECRET", "change-me-please")
 
 LOG_LINES = 40
 
+PUSH_INTERVAL = 5        # seconds between samples while someone is watching
+
+# Metrics sampler: a snapshot lives this long before it is re-sampled, and
+# the sampler parks itself after METRICS_IDLE seconds without a reader.
+METRICS_TTL = float(os.environ.get("LOFI_DASH_METRICS_TTL", "5"))
+METRICS_IDLE = 60
+KEEPALIVE = 15           # SSE comment ping so dead clients get noticed
+
+HISTORY_FILE = Path(os.environ.get("LOFI_DASH_HISTORY", str(DASH_DIR / "history.bin")))
+HISTORY_POINTS = 300     # default chart width for /api/history
+THERMAL_ZONE = Path("/sys/class/thermal/thermal_zone0/temp")
+
+# /metrics is unauthenticated for scrapers unless a token is configured
+METRICS_TOKEN = os.environ.get("LOFI_DASH_METRICS_TOKEN", "")
+
 app = Flask(__name__, template_folder=str(DASH_DIR / "templates"),
             static_folder=str(DASH_DIR / "static"))
 app.secret_key = SECRET_KEY
@@ -80,10 +127,72 @@ def login_required(view):
     return wrapped
 
 
-def get_system_info() -> dict:
+class StatusListener:
+    """
+    Binds STATUS_SOCKET and keeps the latest datagram from the streamer.
+
+    on_change(msg) runs only when one of the `watch` fields differs from the
+    previous datagram, not on every heartbeat.
+    """
+
+    def __init__(self, path: Path = STATUS_SOCKET, on_change=None, watch=()):
+        self.path = path
+        self.on_change = on_change
+        self.watch = tuple(watch)
+        self.latest: dict = {}
+        self.received = 0.0
+        self._thread = None
+
+    def start(self):
+        try:
+            if self.path.exists() or self.path.is_symlink():
+                self.path.unlink()
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            sock.bind(str(self.path))
+            os.chmod(self.path, 0o660)
+        except OSError as e:
+            print(f"⚠️ Status socket unavailable ({e}) — using /tmp files only")
+            return self
+        self._thread = threading.Thread(target=self._run, args=(sock,), daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self, sock: socket.socket):
+        while True:
+            try:
+                data = sock.recv(65536)
+                msg = json.loads(data)
+            except (OSError, ValueError):
+                continue
+            if not isinstance(msg, dict):
+                continue
+            previous, self.latest = self.latest, msg
+            self.received = time.monotonic()
+            if self.on_change and any(msg.get(k) != previous.get(k) for k in self.watch):
+                try:
+                    self.on_change(msg)
+                except Exception as e:
+                    print(f"⚠️ Status handler failed: {e}")
+
+    def current(self) -> dict:
+        """Latest streamer state, or {} if it has gone quiet."""
+        if time.monotonic() - self.received > STATUS_STALE:
+            return {}
+        return self.latest
+
+
+# Top-level status fields the page shows; a change pushes at once, the
+# heartbeat's counters wait for the PUSH_INTERVAL tick
+STATUS_WATCH = ("now_playing", "state", "restarts", "fps", "version")
+
+# Started below, once HUB exists: a datagram can arrive as soon as we bind
+STATUS = StatusListener(on_change=lambda msg: HUB.poke(), watch=STATUS_WATCH)
+
+
+def get_system_info(cpu_interval: float = None) -> dict:
     """Return CPU, RAM, disk, temp, uptime, host."""
     try:
-        cpu = psutil.cpu_percent(interval=0.1)
+        cpu = psutil.cpu_percent(interval=cpu_interval)
         mem = psutil.virtual_memory().percent
         disk = psutil.disk_usage("/").percent
     except Exception:
@@ -119,6 +228,17 @@ def get_system_info() -> dict:
     }
 
 
+def get_throttled() -> int:
+    """Raw `vcgencmd get_throttled` bitmask (0 when unavailable)."""
+    ok, out = run_cmd(["vcgencmd", "get_throttled"])
+    if ok and "=" in out:
+        try:
+            return int(out.strip().split("=", 1)[1], 16)
+        except ValueError:
+            pass
+    return 0
+
+
 def get_streamer_status() -> dict:
     """Return basic systemd status and now playing info."""
     status = {
@@ -149,9 +269,9 @@ def get_streamer_status() -> dict:
                 except Exception:
                     pass
 
-    # Now playing from /tmp/current_track.txt
-    now_playing = ""
-    if CURRENT_TRACK_FILE.exists():
+    # Now playing from the status channel, else /tmp/current_track.txt
+    now_playing = STATUS.current().get("now_playing", "")
+    if not now_playing and CURRENT_TRACK_FILE.exists():
         try:
             now_playing = CURRENT_TRACK_FILE.read_text(encoding="utf-8").strip()
         except Exception:
@@ -177,28 +297,334 @@ def get_camera_log_from_streamer(lines: int = LOG_LINES) -> str:
     C1: recommended mode (clean camera log).
     """
     raw = get_journal_tail(STREAM_SERVICE, lines * 4)  # grab more, then filter
-    patterns = [
-        "Camera",
-        "camera",
-        "Picamera2",
-        "pipeline",
-        "Pipeline",
-        "Device or resource busy",
-        "/dev/media",
-        "ffmpeg",
-    ]
 
-    filtered = []
-    for ln in raw.splitlines():
-        if any(p in ln for p in patterns):
-            filtered.append(ln)
+    filtered = [ln for ln in raw.splitlines() if is_camera_line(ln)]
 
     if not filtered:
-        return "(no camera-specific entries found in streamer log)"
+        return NO_CAMERA_LINES
     # Limit to last N lines to match column
     return "\n".join(filtered[-lines:])
 
 
+NO_CAMERA_LINES = "(no camera-specific entries found in streamer log)"
+
+JOURNAL = JournalFollower([STREAM_SERVICE, DASH_SERVICE], camera_unit=STREAM_SERVICE).start()
+
+LOG_VIEWS = {"streamer": STREAM_SERVICE, "camera": "camera", "dashboard": DASH_SERVICE}
+
+
+def read_log(pane: str, after: int = None) -> dict:
+    """
+    One log pane from the in-memory journal follower: the last LOG_LINES
+    lines, or with `after` just the lines since that cursor (append=True).
+    Without a usable journal it falls back to a per-request journalctl.
+    """
+    JOURNAL.ready.wait(2)
+    if not JOURNAL.available:
+        if pane == "camera":
+            return {"log": get_camera_log_from_streamer(LOG_LINES)}
+        return {"log": get_journal_tail(LOG_VIEWS[pane], LOG_LINES)}
+
+    lines, cursor, append = JOURNAL.read(LOG_VIEWS[pane], LOG_LINES, after)
+    text = "\n".join(lines)
+    if not text and not append:
+        text = NO_CAMERA_LINES if pane == "camera" else "(no log data)"
+    return {"log": text, "cursor": cursor, "append": append}
+
+
+# ---------- METRICS SAMPLER ----------
+
+class MetricsSnapshot(NamedTuple):
+    taken: float                    # time.time() of the sample
+    system: Mapping
+    streamer: Mapping
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.taken
+
+
+class MetricsCollector:
+    """
+    Samples get_system_info() (plus the get_throttled() bitmask) +
+    get_streamer_status() on one background thread every `ttl` seconds. Readers never fork or block: they get the
+    latest snapshot (read-only mappings). With nobody reading for
+    METRICS_IDLE seconds the thread parks until the next read.
+    """
+
+    def __init__(self, ttl: float = METRICS_TTL):
+        self.ttl = ttl
+        self._snapshot = None
+        self._ready = threading.Event()
+        self._sampled = threading.Condition()
+        self._wake = threading.Event()
+        self._last_read = time.monotonic()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def snapshot(self) -> MetricsSnapshot:
+        self._last_read = time.monotonic()
+        self._ensure_running()
+        # Only the very first read after start-up waits for a sample
+        self._ready.wait(5)
+        return self._snapshot or MetricsSnapshot(0.0, MappingProxyType({}), MappingProxyType({}))
+
+    def refresh(self, timeout: float = 3.0):
+        """Resample now (e.g. right after a start/stop) and wait for it."""
+        old = self._snapshot
+        self._ensure_running()
+        with self._sampled:
+            self._wake.set()
+            self._sampled.wait_for(lambda: self._snapshot is not old, timeout)
+
+    def _ensure_running(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        psutil.cpu_percent(interval=None)   # prime: next call measures since now
+        while True:
+            try:
+                self._snapshot = MetricsSnapshot(
+                    time.time(),
+                    MappingProxyType({**get_system_info(), "throttled": get_throttled()}),
+                    MappingProxyType(get_streamer_status()),
+                )
+            except Exception as e:
+                print(f"⚠️ Metrics sample failed: {e}")
+            self._ready.set()
+            with self._sampled:
+                self._sampled.notify_all()
+
+            self._wake.wait(self.ttl)
+            self._wake.clear()
+            if time.monotonic() - self._last_read > METRICS_IDLE:
+                with self._lock:
+                    self._thread = None
+                return
+
+
+METRICS = MetricsCollector()
+
+
+# ---------- HISTORY ----------
+
+class CpuMeter:
+    """CPU busy % between calls, from our own cpu_times() deltas so we don't
+    disturb psutil.cpu_percent()'s shared state used by METRICS."""
+
+    def __init__(self):
+        self.last = psutil.cpu_times()
+
+    def __call__(self) -> float:
+        now = psutil.cpu_times()
+        total = sum(now) - sum(self.last)
+        idle = (now.idle + getattr(now, "iowait", 0)) - (self.last.idle + getattr(self.last, "iowait", 0))
+        self.last = now
+        return 100.0 * (total - idle) / total if total > 0 else 0.0
+
+
+def read_temp() -> float:
+    """SoC temperature straight from sysfs (no vcgencmd fork every second)."""
+    try:
+        return int(THERMAL_ZONE.read_text()) / 1000.0
+    except (OSError, ValueError):
+        return None
+
+
+def _live_value(section: str, key: str):
+    return lambda: (STATUS.current().get(section) or {}).get(key)
+
+
+HISTORY = MetricsHistory({
+    "cpu": CpuMeter(),
+    "mem": lambda: psutil.virtual_memory().percent,
+    "temp": read_temp,
+    "disk": lambda: psutil.disk_usage("/").percent,
+    "fps": _live_value("ffmpeg", "frame_rate"),        # per interval, not ffmpeg's running totals
+    "speed": _live_value("ffmpeg", "speed_rate"),
+    "buffer_fill": _live_value("audio", "buffer_fill"),
+}, path=HISTORY_FILE).start()
+atexit.register(HISTORY.save)
+
+RANGE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_range(text: str, default: int = 3600) -> int:
+    """'90s', '15m', '6h', '7d' or plain seconds → seconds."""
+    if not text:
+        return default
+    text = text.strip().lower()
+    try:
+        if text[-1] in RANGE_UNITS:
+            return max(1, int(float(text[:-1]) * RANGE_UNITS[text[-1]]))
+        return max(1, int(float(text)))
+    except ValueError:
+        return default
+
+
+# ---------- PROMETHEUS ----------
+
+def metrics_rows() -> list:
+    snap = METRICS.snapshot()
+    live = STATUS.current()
+    rows = [
+        ["lofi_cpu_temperature_celsius", "gauge", "SoC temperature", read_temp()],
+        ["lofi_cpu_usage_percent", "gauge", "Host CPU usage", snap.system.get("cpu")],
+        ["lofi_memory_usage_percent", "gauge", "Host memory usage", snap.system.get("mem")],
+        ["lofi_disk_usage_percent", "gauge", "Root filesystem usage", snap.system.get("disk")],
+        ["lofi_streamer_service_active", "gauge", "systemd reports the streamer unit active",
+         1 if snap.streamer.get("active") else 0],
+        ["lofi_streamer_status_connected", "gauge", "Streamer status datagrams are arriving",
+         1 if live else 0],
+    ]
+    rows += exporter.throttle_rows(snap.system.get("throttled") or 0)
+    if live:
+        rows.append(["lofi_streamer_info", "gauge", "Running streamer build", 1,
+                     {"version": live.get("version", ""), "state": live.get("state", "")}])
+        rows.append(["lofi_streamer_restarts", "gauge", "Session restarts since the streamer started",
+                     live.get("restarts") or 0])
+        rows += [r for r in live.get("metrics") or [] if isinstance(r, list) and len(r) >= 4]
+    return rows
+
+
+# ---------- LIVE PUSH (SSE) ----------
+
+def collect_state() -> dict:
+    """Everything the dashboard shows, straight from the in-memory samplers."""
+    snap = METRICS.snapshot()
+    live = STATUS.current()
+    streamer = dict(snap.streamer)
+    if live.get("now_playing"):
+        streamer["now_playing"] = live["now_playing"]
+    return {
+        "system": dict(snap.system),
+        "streamer": streamer,
+        "live": flatten_live(live),
+        "logs": {pane: read_log(pane)["log"] for pane in LOG_VIEWS},
+    }
+
+
+def flatten_live(live: dict) -> dict:
+    """Status datagram → flat fields for the Stream Health tile."""
+    ffmpeg = live.get("ffmpeg") or {}
+    audio = live.get("audio") or {}
+    return {
+        "connected": bool(live),
+        "state": live.get("state", ""),
+        "version": live.get("version", ""),
+        "restarts": live.get("restarts"),
+        "fps": ffmpeg.get("fps"),
+        "target_fps": live.get("fps"),
+        "speed": ffmpeg.get("speed"),
+        "drop_frames": ffmpeg.get("drop_frames"),
+        "dup_frames": ffmpeg.get("dup_frames"),
+        "last_error": ffmpeg.get("last_error", ""),
+        "buffer_fill": audio.get("buffer_fill"),
+        "underruns": audio.get("underruns"),
+    }
+
+
+def diff_state(old: dict, new: dict) -> dict:
+    """Per-section patch holding only the fields that changed."""
+    patch = {}
+    for section, values in new.items():
+        before = old.get(section, {})
+        changed = {k: v for k, v in values.items() if before.get(k) != v}
+        if changed:
+            patch[section] = changed
+    return patch
+
+
+class LiveHub:
+    """
+    One producer thread, many SSE subscribers.
+
+    The producer only runs while at least one client is connected; each
+    client gets the full state on connect, then patches. Slow clients
+    get their queue reset to a fresh snapshot instead of piling up.
+    """
+
+    def __init__(self, interval: float = PUSH_INTERVAL):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.clients: set[queue.Queue] = set()
+        self.state: dict = {}
+        self.thread = None
+
+    def subscribe(self) -> queue.Queue:
+        q = queue.Queue(maxsize=16)
+        with self.lock:
+            self.clients.add(q)
+            if self.state:
+                q.put(("snapshot", self.state))
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+        self.wake.set()
+        return q
+
+    def unsubscribe(self, q: queue.Queue):
+        with self.lock:
+            self.clients.discard(q)
+
+    def poke(self):
+        """Sample now (after a control action) instead of waiting for the tick."""
+        self.wake.set()
+
+    def _run(self):
+        while True:
+            with self.lock:
+                if not self.clients:
+                    self.thread = None
+                    return
+            try:
+                new = collect_state()
+            except Exception as e:
+                print(f"⚠️ Live update failed: {e}")
+                new = self.state
+            with self.lock:
+                patch = diff_state(self.state, new)
+                self.state = new
+                for q in list(self.clients):
+                    if patch:
+                        self._send(q, "patch", patch)
+            self.wake.wait(self.interval)
+            self.wake.clear()
+
+    def _send(self, q: queue.Queue, event: str, data: dict):
+        try:
+            q.put_nowait((event, data))
+        except queue.Full:
+            # Client fell behind: drop its backlog, resync with one snapshot
+            while not q.empty():
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    break
+            q.put_nowait(("snapshot", self.state))
+
+
+HUB = LiveHub()
+STATUS.start()
+
+
+def sse_stream(q: queue.Queue):
+    try:
+        while True:
+            try:
+                event, data = q.get(timeout=KEEPALIVE)
+            except queue.Empty:
+                yield ": ping\n\n"
+                continue
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    finally:
+        HUB.unsubscribe(q)
+
+
 # ---------- ROUTES ----------
 
 @app.route("/login", methods=["GET", "POST"])
@@ -226,37 +652,69 @@ def index():
 
 # ----- API: STATUS / METRICS / LOGS -----
 
+@app.route("/api/stream")
+@login_required
+def api_stream():
+    return Response(
+        sse_stream(HUB.subscribe()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.route("/api/system")
 @login_required
 def api_system():
-    return jsonify(get_system_info())
+    return jsonify(dict(METRICS.snapshot().system))
 
 
 @app.route("/api/streamer")
 @login_required
 def api_streamer():
-    return jsonify(get_streamer_status())
+    return jsonify(dict(METRICS.snapshot().streamer))
+
+
+@app.route("/api/live")
+@login_required
+def api_live():
+    return jsonify(STATUS.current())
+
+
+@app.route("/api/history")
+@login_required
+def api_history():
+    names = [n for n in request.args.get("series", "").split(",") if n]
+    seconds = parse_range(request.args.get("range"))
+    points = min(request.args.get("points", HISTORY_POINTS, type=int), 2000)
+    return jsonify(HISTORY.query(names, seconds, points))
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        return Response("unauthorized\n", status=401, mimetype="text/plain")
+    openmetrics = "application/openmetrics-text" in request.headers.get("Accept", "")
+    body = exporter.render(metrics_rows(), openmetrics=openmetrics)
+    return Response(body, content_type=exporter.OPENMETRICS_TYPE if openmetrics
+                    else exporter.PROMETHEUS_TYPE)
 
 
 @app.route("/api/logs/streamer")
 @login_required
 def api_logs_streamer():
-    text = get_journal_tail(STREAM_SERVICE, LOG_LINES)
-    return jsonify({"log": text})
+    return jsonify(read_log("streamer", request.args.get("after", type=int)))
 
 
 @app.route("/api/logs/camera")
 @login_required
 def api_logs_camera():
-    text = get_camera_log_from_streamer(LOG_LINES)
-    return jsonify({"log": text})
+    return jsonify(read_log("camera", request.args.get("after", type=int)))
 
 
 @app.route("/api/logs/dashboard")
 @login_required
 def api_logs_dashboard():
-    text = get_journal_tail(DASH_SERVICE, LOG_LINES)
-    return jsonify({"log": text})
+    return jsonify(read_log("dashboard", request.args.get("after", type=int)))
 
 
 # ----- CONTROL ENDPOINTS -----
@@ -269,6 +727,8 @@ def control_streamer():
         return jsonify({"ok": False, "error": "Invalid action"}), 400
 
     ok, out = run_cmd(["sudo", "systemctl", action, STREAM_SERVICE])
+    METRICS.refresh()
+    HUB.poke()
     return jsonify({"ok": ok, "output": out})
 
 
@@ -285,8 +745,13 @@ def control_reboot():
 @login_required
 def control_camera():
     ok, out = run_cmd(["sudo", str(SYSTEM_HELPER), "camera_restart"])
+    METRICS.refresh()
+    HUB.poke()
     return jsonify({"ok": ok, "output": out})
 
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=4455, debug=False)
+    # systemd stops us with SIGTERM; exit cleanly so atexit saves HISTORY
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    # threaded: each open SSE stream holds a worker thread
+    app.run(host="0.0.0.0", port=4455, debug=False, threaded=True)
@@ -0,0 +1,71 @@
+"""
+Prometheus / OpenMetrics text rendering for the dashboard's /metrics.
+
+Metrics arrive as [name, kind, help, value] rows (the shape the streamer
+publishes from lofistream.metrics), optionally with a labels dict as a
+fifth element. Plain Prometheus text (0.0.4) is the default; scrapers that
+ask for application/openmetrics-text get the OpenMetrics variant.
+"""
+
+import math
+from typing import Iterable, List
+
+PROMETHEUS_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+OPENMETRICS_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# vcgencmd get_throttled bit → flag name; bit + 16 is the "has occurred" twin
+THROTTLE_BITS = {
+    0: "under_voltage",
+    1: "arm_freq_capped",
+    2: "throttled",
+    3: "soft_temp_limit",
+}
+
+
+def throttle_rows(mask: int) -> List[list]:
+    rows = []
+    for bit, flag in THROTTLE_BITS.items():
+        rows.append(["lofi_throttle_active", "gauge", "Firmware throttle flags active now",
+                     1 if mask & (1 << bit) else 0, {"flag": flag}])
+        rows.append(["lofi_throttle_occurred", "gauge", "Firmware throttle flags seen since boot",
+                     1 if mask & (1 << (bit + 16)) else 0, {"flag": flag}])
+    return rows
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(v: float) -> str:
+    if math.isnan(v):
+        return "NaN"
+    if math.isinf(v):
+        return "+Inf" if v > 0 else "-Inf"
+    return repr(float(v)) if v != int(v) else str(int(v))
+
+
+def render(rows: Iterable[list], openmetrics: bool = False) -> str:
+    """Group rows into families (first HELP/TYPE wins) and render the exposition text."""
+    families = {}
+    for row in rows:
+        name, kind, help_text, value = row[:4]
+        labels = row[4] if len(row) > 4 else {}
+        if value is None:
+            continue
+        fam = families.setdefault(name, (kind, help_text, []))
+        fam[2].append((labels, float(value)))
+
+    lines = []
+    for name, (kind, help_text, samples) in families.items():
+        family = name
+        if openmetrics and kind == "counter" and name.endswith("_total"):
+            family = name[:-len("_total")]
+        lines.append(f"# HELP {family} {_escape(help_text)}")
+        lines.append(f"# TYPE {family} {kind}")
+        for labels, value in samples:
+            label_str = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            label_str = "{" + label_str + "}" if label_str else ""
+            lines.append(f"{name}{label_str} {_format_value(value)}")
+    if openmetrics:
+        lines.append("# EOF")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,204 @@
+"""
+Fixed-memory metrics history for the dashboard.
+
+Each series is kept at three resolutions in preallocated array('f') rings:
+
+    1 s   × 3600    (last hour)
+    1 min × 10080   (last 7 days)
+    1 h   × 2160    (last 90 days)
+
+A slot belongs to time bucket `t // step`; a parallel array of bucket
+numbers marks which slots are current, so gaps (dashboard down, Pi off)
+read back as missing rather than as stale values. Coarser tiers store the
+mean of the samples that fell in their bucket.
+
+The whole store is saved as one small binary file (JSON header + raw
+arrays) every few minutes and on exit, and reloaded on start.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+TIERS: List[Tuple[int, int]] = [(1, 3600), (60, 7 * 24 * 60), (3600, 90 * 24)]
+SAVE_INTERVAL = 300
+FORMAT_VERSION = 1
+
+NAN = float("nan")
+
+
+class _Tier:
+    def __init__(self, step: int, size: int, names: List[str]):
+        self.step = step
+        self.size = size
+        self.buckets = array("q", [-1]) * size
+        self.values: Dict[str, array] = {n: array("f", [NAN]) * size for n in names}
+        # Running mean for the bucket being filled
+        self.current = -1
+        self.sums: Dict[str, float] = {n: 0.0 for n in names}
+        self.counts: Dict[str, int] = {n: 0 for n in names}
+
+    def add(self, t: float, sample: Dict[str, Optional[float]]):
+        bucket = int(t // self.step)
+        if bucket != self.current:
+            self.current = bucket
+            for n in self.sums:
+                self.sums[n] = 0.0
+                self.counts[n] = 0
+        slot = bucket % self.size
+        self.buckets[slot] = bucket
+        for n, ring in self.values.items():
+            v = sample.get(n)
+            if v is None or math.isnan(v):
+                if self.counts[n] == 0:
+                    ring[slot] = NAN
+                continue
+            self.sums[n] += v
+            self.counts[n] += 1
+            ring[slot] = self.sums[n] / self.counts[n]
+
+    def window(self, name: str, start_bucket: int, end_bucket: int) -> List[Optional[float]]:
+        ring = self.values[name]
+        out = []
+        for b in range(start_bucket, end_bucket + 1):
+            slot = b % self.size
+            v = ring[slot] if self.buckets[slot] == b else NAN
+            out.append(None if math.isnan(v) else v)
+        return out
+
+
+class MetricsHistory:
+    """Ring-buffer time series for a fixed set of named metrics."""
+
+    def __init__(self, sources: Dict[str, Callable[[], Optional[float]]],
+                 path: Optional[Path] = None, tiers: List[Tuple[int, int]] = TIERS):
+        self.sources = sources
+        self.names = list(sources)
+        self.path = Path(path) if path else None
+        self.lock = threading.Lock()
+        self.tiers = [_Tier(step, size, self.names) for step, size in tiers]
+        if self.path:
+            self._load()
+
+    # ---------- sampling ----------
+
+    def sample(self, t: Optional[float] = None):
+        t = time.time() if t is None else t
+        values = {}
+        for name, fn in self.sources.items():
+            try:
+                v = fn()
+                values[name] = None if v is None else float(v)
+            except Exception:
+                values[name] = None
+        with self.lock:
+            for tier in self.tiers:
+                tier.add(t, values)
+
+    def start(self, interval: float = 1.0):
+        threading.Thread(target=self._run, args=(interval,), daemon=True).start()
+        return self
+
+    def _run(self, interval: float):
+        last_save = time.monotonic()
+        next_tick = time.monotonic()
+        while True:
+            self.sample()
+            if self.path and time.monotonic() - last_save > SAVE_INTERVAL:
+                self.save()
+                last_save = time.monotonic()
+            next_tick += interval
+            delay = next_tick - time.monotonic()
+            if delay < 0:
+                next_tick = time.monotonic()
+                delay = 0
+            time.sleep(delay)
+
+    # ---------- queries ----------
+
+    def query(self, names: List[str], seconds: int, points: int = 300,
+              now: Optional[float] = None) -> dict:
+        """
+        Series covering the last `seconds`, from the finest tier that
+        reaches that far back, averaged down to at most `points` values.
+        """
+        now = time.time() if now is None else now
+        names = [n for n in names if n in self.names] or self.names
+        points = max(1, points)
+        tier = next((t for t in self.tiers if t.step * t.size >= seconds), self.tiers[-1])
+        end = int(now // tier.step)
+        start = max(end - int(seconds // tier.step) + 1, end - tier.size + 1)
+        group = max(1, math.ceil((end - start + 1) / points))
+
+        with self.lock:
+            raw = {n: tier.window(n, start, end) for n in names}
+
+        series = {n: _downsample(vals, group) for n, vals in raw.items()}
+        return {
+            "start": start * tier.step,
+            "step": tier.step * group,
+            "resolution": tier.step,
+            "series": series,
+        }
+
+    # ---------- persistence ----------
+
+    def save(self):
+        if not self.path:
+            return
+        header = {
+            "version": FORMAT_VERSION,
+            "names": self.names,
+            "tiers": [[t.step, t.size] for t in self.tiers],
+            "saved": time.time(),
+        }
+        tmp = self.path.with_suffix(".tmp")
+        try:
+            with self.lock, tmp.open("wb") as f:
+                f.write(json.dumps(header).encode() + b"\n")
+                for tier in self.tiers:
+                    tier.buckets.tofile(f)
+                    for n in self.names:
+                        tier.values[n].tofile(f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"⚠️ Could not save metrics history: {e}")
+
+    def _load(self):
+        try:
+            with self.path.open("rb") as f:
+                header = json.loads(f.readline())
+                if (header.get("version") != FORMAT_VERSION
+                        or header.get("tiers") != [[t.step, t.size] for t in self.tiers]):
+                    return
+                saved_names = header["names"]
+                for tier in self.tiers:
+                    buckets = array("q")
+                    buckets.fromfile(f, tier.size)
+                    tier.buckets = buckets
+                    for n in saved_names:
+                        ring = array("f")
+                        ring.fromfile(f, tier.size)
+                        if n in tier.values:
+                            tier.values[n] = ring
+            print(f"📈 Metrics history loaded from {self.path}")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, EOFError, KeyError) as e:
+            print(f"⚠️ Ignoring unreadable metrics history ({e})")
+            self.tiers = [_Tier(t.step, t.size, self.names) for t in self.tiers]
+
+
+def _downsample(values: List[Optional[float]], group: int) -> List[Optional[float]]:
+    if group <= 1:
+        return [None if v is None else round(v, 2) for v in values]
+    out = []
+    for i in range(0, len(values), group):
+        chunk = [v for v in values[i:i + group] if v is not None]
+        out.append(round(sum(chunk) / len(chunk), 2) if chunk else None)
+    return out
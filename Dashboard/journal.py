@@ -0,0 +1,198 @@
+"""
+Journal follower for the dashboard log panes.
+
+One background reader follows the streamer + dashboard units and keeps
+the last few hundred lines of each in memory, plus a camera-only view of
+the streamer log filtered once as lines arrive. Handlers answer from
+these buffers; a cursor lets clients ask for just the lines they have
+not seen yet.
+
+Reads the journal natively through python3-systemd when installed,
+otherwise keeps a single `journalctl -f -o json` child running.
+"""
+
+import json
+import time
+import threading
+import subprocess
+from collections import deque
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    from systemd import journal as sd_journal
+    SYSTEMD_AVAILABLE = True
+except ImportError:
+    SYSTEMD_AVAILABLE = False
+
+BUFFER_LINES = 400
+BACKLOG_LINES = 160
+
+CAMERA_PATTERNS = (
+    "Camera",
+    "camera",
+    "Picamera2",
+    "pipeline",
+    "Pipeline",
+    "Device or resource busy",
+    "/dev/media",
+    "ffmpeg",
+)
+
+
+def is_camera_line(line: str) -> bool:
+    return any(p in line for p in CAMERA_PATTERNS)
+
+
+def _text(value) -> str:
+    # journald hands back binary-ish fields as byte lists in JSON mode
+    if isinstance(value, list):
+        try:
+            return bytes(value).decode("utf-8", "replace")
+        except (TypeError, ValueError):
+            return ""
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    return "" if value is None else str(value)
+
+
+def format_entry(entry: dict) -> str:
+    """Render an entry like `journalctl -o short`."""
+    ts = entry.get("__REALTIME_TIMESTAMP")
+    if isinstance(ts, datetime):
+        when = ts
+    else:
+        try:
+            when = datetime.fromtimestamp(int(ts) / 1e6)
+        except (TypeError, ValueError):
+            when = datetime.now()
+    ident = _text(entry.get("SYSLOG_IDENTIFIER")) or _text(entry.get("_COMM")) or "-"
+    pid = _text(entry.get("_PID"))
+    host = _text(entry.get("_HOSTNAME"))
+    who = f"{ident}[{pid}]" if pid else ident
+    return f"{when:%b %d %H:%M:%S} {host} {who}: {_text(entry.get('MESSAGE'))}"
+
+
+class JournalFollower:
+    """Bounded in-memory tails of a few systemd units, kept current in the background."""
+
+    def __init__(self, units: Iterable[str], camera_unit: str,
+                 buffer_lines: int = BUFFER_LINES, backlog: int = BACKLOG_LINES):
+        self.units = [u if u.endswith(".service") else f"{u}.service" for u in units]
+        self.camera_unit = camera_unit if camera_unit.endswith(".service") else f"{camera_unit}.service"
+        self.backlog = backlog
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.views: Dict[str, deque] = {u: deque(maxlen=buffer_lines) for u in self.units}
+        self.views["camera"] = deque(maxlen=buffer_lines)
+        self.evicted: Dict[str, int] = {v: 0 for v in self.views}   # newest seq rolled out
+        self.mode = "stopped"
+        self.ready = threading.Event()
+        self._thread = None
+
+    # ---------- public ----------
+
+    @property
+    def available(self) -> bool:
+        return self.mode != "unavailable"
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def read(self, view: str, lines: int, after: Optional[int] = None) -> Tuple[List[str], int, bool]:
+        """
+        Return (lines, cursor, append). With `after` (a cursor from an
+        earlier call) only newer lines come back and append is True, unless
+        the buffer has already rolled past that cursor.
+        """
+        key = view if view == "camera" else (view if view.endswith(".service") else f"{view}.service")
+        with self.lock:
+            buf = self.views.get(key, ())
+            cursor = self.seq
+            if after is not None and self.evicted.get(key, 0) <= after <= cursor:
+                return [ln for seq, ln in buf if seq > after], cursor, True
+            return [ln for _, ln in list(buf)[-lines:]], cursor, False
+
+    # ---------- ingest ----------
+
+    def _add(self, entry: dict):
+        unit = _text(entry.get("_SYSTEMD_UNIT"))
+        if unit not in self.views:
+            # systemd's own "Started/Stopped" lines carry the unit in UNIT=
+            unit = _text(entry.get("UNIT"))
+            if unit not in self.views:
+                return
+        line = format_entry(entry)
+        with self.lock:
+            self.seq += 1
+            self._append(unit, line)
+            if unit == self.camera_unit and is_camera_line(line):
+                self._append("camera", line)
+
+    def _append(self, view: str, line: str):
+        buf = self.views[view]
+        if len(buf) == buf.maxlen:
+            self.evicted[view] = buf[0][0]
+        buf.append((self.seq, line))
+
+    def _run(self):
+        while True:
+            try:
+                if SYSTEMD_AVAILABLE:
+                    self._follow_native()
+                else:
+                    self._follow_journalctl()
+            except FileNotFoundError:
+                print("⚠️ journalctl not found — dashboard logs fall back to per-request reads")
+                self.mode = "unavailable"
+                self.ready.set()
+                return
+            except Exception as e:
+                print(f"⚠️ Journal follower error: {e} — restarting in 5s")
+            self.ready.set()
+            time.sleep(5)
+
+    def _follow_native(self):
+        reader = sd_journal.Reader()
+        # Matches are ANDed within a group and groups are ORed, so every
+        # group needs its own _BOOT_ID term or it reaches back past a reboot
+        for unit in self.units:
+            for field in ("_SYSTEMD_UNIT", "UNIT"):
+                reader.add_match(**{field: unit})
+                reader.this_boot()
+                reader.add_disjunction()
+        reader.seek_tail()
+        # Step back over the backlog, then read forward from there
+        for _ in range(self.backlog * len(self.units)):
+            if not reader.get_previous():
+                break
+        self.mode = "native"
+        for entry in reader:
+            self._add(entry)
+        self.ready.set()
+        while True:
+            # INVALIDATE: files were added or rotated; new lines may be waiting
+            if reader.wait(1.0) in (sd_journal.APPEND, sd_journal.INVALIDATE):
+                for entry in reader:
+                    self._add(entry)
+
+    def _follow_journalctl(self):
+        cmd = ["journalctl", "-f", "-o", "json", "-n", str(self.backlog * len(self.units)),
+               "--no-pager"]
+        for unit in self.units:
+            cmd += ["-u", unit]
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        self.mode = "journalctl"
+        self.ready.set()
+        try:
+            for raw in proc.stdout:
+                try:
+                    self._add(json.loads(raw))
+                except ValueError:
+                    continue
+        finally:
+            proc.kill()
+            proc.wait()
@@ -46,6 +46,9 @@ echo "🌐 Fetching dashboard files from GitHub…"
 # Core scripts
 wget -qO "$DASH_DIR/dashboard.py"     "$RAW_BASE/dashboard.py"
 wget -qO "$DASH_DIR/system_helper.sh" "$RAW_BASE/system_helper.sh"
+wget -qO "$DASH_DIR/journal.py"       "$RAW_BASE/journal.py"
+wget -qO "$DASH_DIR/history.py"       "$RAW_BASE/history.py"
+wget -qO "$DASH_DIR/exporter.py"      "$RAW_BASE/exporter.py"
 
 # Templates
 wget -qO "$DASH_DIR/templates/index.html" "$RAW_BASE/templates/index.html"
@@ -58,6 +61,22 @@ chmod +x "$DASH_DIR/dashboard.py" "$DASH_DIR/system_helper.sh"
 
 echo "✅ Dashboard files installed."
 
+# ---------- Shared streamer package ----------
+# Every streamer build imports lofistream/, which must sit next to the
+# script in Servers/ (Python puts the script's own folder on sys.path).
+SERVERS_DIR="$BASE_DIR/Servers"
+PKG_DIR="$SERVERS_DIR/lofistream"
+PKG_RAW="https://raw.githubusercontent.com/teqherself/Lofi-Streamer-Pi4-dashboard/main/lofistream"
+PKG_MODULES="__init__ adaptive audio compositor core encoders library metrics nowplaying profiles sprites splice status telemetry visualiser watcher"
+
+echo "🌐 Fetching the lofistream package into $PKG_DIR…"
+mkdir -p "$PKG_DIR"
+for mod in $PKG_MODULES; do
+  wget -qO "$PKG_DIR/$mod.py" "$PKG_RAW/$mod.py"
+done
+
+echo "✅ lofistream installed next to the streamer scripts."
+
 # ---------- systemd service ----------
 SERVICE_FILE="/etc/systemd/system/lofi-dashboard.service"
 
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+LOFI STREAMER — BPM ESTIMATOR CHECK
+
+Runs track_cleaner's NumPy tempo estimator on synthetic lofi grooves and
+reports what it hears against the tempo that was generated:
+
+  groove  kick on 1 and 3, snare on 2 and 4, eighth-note hats, noise floor;
+          every tempo runs at each --hats level, since loud hats are what
+          used to pull a beat-period winner up to double time
+
+Each row gives the detected BPM, the confidence and the time taken. The
+exit code is 1 if any groove misses its tempo by more than --tolerance (a
+half/double-tempo error is always a miss).
+
+    python3 bench/bench_bpm.py
+    python3 bench/bench_bpm.py --bpm 70 75 80 85 90 95 --hats 0.15 0.4 0.8 --output bpm.json
+
+Needs NumPy only: the audio is generated in memory, no ffmpeg.
+"""
+
+import io
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+
+import track_cleaner  # noqa: E402
+
+SAMPLE_RATE = track_cleaner.BPM_RATES["numpy"]
+
+
+# -------------------------------------------------------
+#  Synthetic groove
+# -------------------------------------------------------
+def groove(bpm: float, hats: float, seconds: int, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    t = np.arange(SAMPLE_RATE * seconds) / SAMPLE_RATE
+    beat = t * bpm / 60.0
+    kick = np.exp(-(beat % 2) * 15) * np.sin(2 * np.pi * 55 * t)
+    snare = np.exp(-((beat + 1) % 2) * 25) * rng.standard_normal(len(t)) * 0.5
+    hat = np.exp(-((beat * 2) % 1.0) * 60) * rng.standard_normal(len(t)) * hats
+    noise = 0.02 * rng.standard_normal(len(t))
+    return (kick + snare + hat + noise).astype(np.float32)
+
+
+def run_one(bpm: float, hats: float, seconds: int, tolerance: float) -> dict:
+    pcm = io.BytesIO(groove(bpm, hats, seconds).tobytes())
+    t0 = time.perf_counter()
+    detected, confidence = track_cleaner._bpm_numpy(pcm, SAMPLE_RATE)
+    elapsed = time.perf_counter() - t0
+    ok = detected > 0 and abs(detected - bpm) <= tolerance * bpm
+    mark = "✅" if ok else "❌"
+    print(f"{mark} {bpm:5.1f} BPM, hats {hats:.2f} → {detected:6.1f} "
+          f"(confidence {confidence:.2f}, {elapsed * 1000:.0f} ms)", file=sys.stderr)
+    return {
+        "bpm": bpm, "hats": hats, "detected": detected, "confidence": confidence,
+        "ms": round(elapsed * 1000, 1), "ok": ok,
+    }
+
+
+# -------------------------------------------------------
+#  Main
+# -------------------------------------------------------
+def parse_args():
+    parser = argparse.ArgumentParser(description="Check the BPM estimator on synthetic grooves")
+    parser.add_argument("--bpm", type=float, nargs="+", default=[70, 75, 80, 85, 90, 95])
+    parser.add_argument("--hats", type=float, nargs="+", default=[0.15, 0.4, 0.8],
+                        help="hi-hat level relative to the snare (0.5)")
+    parser.add_argument("--seconds", type=int, default=track_cleaner.BPM_SECONDS)
+    parser.add_argument("--tolerance", type=float, default=0.02, help="allowed relative error")
+    parser.add_argument("--output", help="write the JSON report here as well as stdout")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    results = [run_one(bpm, hats, args.seconds, args.tolerance)
+               for hats in args.hats for bpm in args.bpm]
+
+    report = {
+        "timestamp": int(time.time()),
+        "config": {"seconds": args.seconds, "tolerance": args.tolerance,
+                   "prior": track_cleaner.BPM_PRIOR},
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+    return 0 if all(r["ok"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
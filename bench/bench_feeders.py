@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+LOFI STREAMER — AUDIO FEEDER BENCHMARK
+
+Measures what it costs to keep AUDIO_FIFO fed, for each feeder:
+
+  loop    the original LTS feeder: `ffmpeg -re` decoder, read(4096) and
+          write() every chunk through Python (reference)
+  engine  lofistream AudioEngine (ring buffers, paced 20 ms blocks)
+  splice  lofistream SpliceFeeder (os.splice decoder pipe → FIFO)
+
+Two passes, both against a generated sine track, with the FIFO drained by
+a `cat > /dev/null` child so the reader costs this process nothing:
+
+  realtime    each feeder runs as it would on the Pi for --seconds;
+              reports feeder CPU (cores), delivered rate vs real time and
+              underruns
+  throughput  decoded PCM forwarded unpaced, read/write loop vs splice
+              (--chunk sizes); reports MB/s and CPU per second of audio
+
+    python3 bench/bench_feeders.py --seconds 20 > feeders.json
+    python3 bench/bench_feeders.py --feeders loop splice --skip-throughput
+
+Needs ffmpeg on PATH; everything lives in a temp dir.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import resource
+import argparse
+import contextlib
+import platform
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from typing import Callable, List
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+
+from lofistream.audio import BYTE_RATE, CHANNELS, SAMPLE_RATE, AudioEngine  # noqa: E402
+from lofistream.splice import SPLICE_AVAILABLE, SpliceFeeder, set_pipe_size, splice_all  # noqa: E402
+
+FEEDERS = ["loop", "engine", "splice"]
+TRACK_SECONDS = 30
+
+
+# -------------------------------------------------------
+#  Sources and sinks
+# -------------------------------------------------------
+def make_track(work: Path, seconds: int = TRACK_SECONDS) -> Path:
+    track = work / "sine.wav"
+    subprocess.run([
+        "ffmpeg", "-v", "error", "-y",
+        "-f", "lavfi", "-i", f"sine=frequency=220:sample_rate={SAMPLE_RATE}:duration={seconds}",
+        "-ac", str(CHANNELS), str(track),
+    ], check=True)
+    return track
+
+
+def decoder(track: Path, realtime: bool = False) -> subprocess.Popen:
+    return subprocess.Popen([
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-nostdin",
+        *(["-re"] if realtime else []), "-vn", "-i", str(track),
+        "-f", "s16le", "-ar", str(SAMPLE_RATE), "-ac", str(CHANNELS), "pipe:1",
+    ], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0)
+
+
+def drain(fifo: Path) -> subprocess.Popen:
+    return subprocess.Popen(["sh", "-c", 'exec cat "$0" > /dev/null', str(fifo)])
+
+
+def _forever(track: Path):
+    while True:
+        yield track
+
+
+def _release_fifo(fifo: Path):
+    # The feeders reopen the FIFO once the reader is gone; let that open
+    # return so they see the stop event and shut their decoders down.
+    try:
+        fd = os.open(fifo, os.O_RDONLY | os.O_NONBLOCK)
+        time.sleep(0.2)
+        os.close(fd)
+    except OSError:
+        pass
+
+
+def cpu_seconds(who=resource.RUSAGE_SELF) -> float:
+    r = resource.getrusage(who)
+    return r.ru_utime + r.ru_stime
+
+
+# -------------------------------------------------------
+#  The original LTS loop (reference)
+# -------------------------------------------------------
+class LoopFeeder:
+    """audio_feeder from 8.7.27 before the engine: -re decoder, 4 KB copies."""
+
+    def __init__(self, tracks, fifo: Path):
+        self.tracks = tracks
+        self.fifo = fifo
+        self.bytes_out = 0
+        self.underruns = 0
+
+    def run(self, stop_event: threading.Event):
+        silence = b"\x00\x00" * SAMPLE_RATE * CHANNELS
+        p = None
+        try:
+            with open(self.fifo, "wb", buffering=0) as fifo:
+                for track in self.tracks:
+                    if stop_event.is_set():
+                        break
+                    p = decoder(track, realtime=True)
+                    while not stop_event.is_set():
+                        chunk = p.stdout.read(4096)
+                        if not chunk:
+                            break
+                        fifo.write(chunk)
+                        self.bytes_out += len(chunk)
+                    p.terminate()
+                    p.wait()
+                    fifo.write(silence)
+                    self.bytes_out += len(silence)
+        except BrokenPipeError:
+            pass
+        finally:
+            if p and p.poll() is None:
+                p.kill()
+                p.wait()
+
+
+# -------------------------------------------------------
+#  Realtime pass
+# -------------------------------------------------------
+def run_realtime(name: str, track: Path, work: Path, seconds: float, warmup: float) -> dict:
+    result = {"feeder": name, "ok": False}
+    if name == "splice" and not SPLICE_AVAILABLE:
+        result["error"] = "os.splice is not available here"
+        return result
+
+    fifo = work / f"{name}.pcm"
+    os.mkfifo(fifo)
+    if name == "loop":
+        feeder = LoopFeeder(_forever(track), fifo)
+    elif name == "engine":
+        feeder = AudioEngine(_forever(track), fifo)
+    else:
+        feeder = SpliceFeeder(_forever(track), fifo)
+
+    print(f"⏱  {name}: {warmup:.0f}s warm-up + {seconds:.0f}s measured", file=sys.stderr)
+    stop = threading.Event()
+    thread = threading.Thread(target=feeder.run, args=(stop,), daemon=True)
+    thread.start()
+    sink = drain(fifo)
+
+    time.sleep(warmup)
+    cpu0, t0 = cpu_seconds(), time.monotonic()
+    out0, under0 = _bytes_out(feeder), feeder.underruns
+    time.sleep(seconds)
+    cpu1, t1 = cpu_seconds(), time.monotonic()
+    out1, under1 = _bytes_out(feeder), feeder.underruns
+
+    stop.set()
+    sink.terminate()
+    sink.wait()
+    _release_fifo(fifo)
+    thread.join(timeout=5)
+
+    wall = t1 - t0
+    result.update({
+        "ok": True,
+        "cpu_cores": round((cpu1 - cpu0) / wall, 4),
+        "cpu_ms_per_audio_second": round(1000.0 * (cpu1 - cpu0) / wall, 2),
+        "realtime_ratio": round((out1 - out0) / BYTE_RATE / wall, 3) if out1 is not None else None,
+        "underruns": under1 - under0,
+    })
+    return result
+
+
+def _bytes_out(feeder):
+    if isinstance(feeder, AudioEngine):
+        return None         # paced by construction; its blocks aren't counted
+    return feeder.bytes_out
+
+
+# -------------------------------------------------------
+#  Throughput pass (unpaced forwarding)
+# -------------------------------------------------------
+def forward_loop(src: int, dst: int, chunk: int) -> int:
+    total = 0
+    while True:
+        data = os.read(src, chunk)
+        if not data:
+            return total
+        view = memoryview(data)
+        while len(view):
+            view = view[os.write(dst, view):]
+        total += len(data)
+
+
+def forward_splice(src: int, dst: int, chunk: int) -> int:
+    total = 0
+    while True:
+        n = splice_all(src, dst, chunk)
+        total += n
+        if n < chunk:
+            return total
+
+
+def run_throughput(name: str, forward: Callable[[int, int, int], int], chunk: int,
+                   track: Path, work: Path, pipe_size: int = 0) -> dict:
+    fifo = work / f"tp-{name}-{chunk}.pcm"
+    os.mkfifo(fifo)
+    sink = drain(fifo)
+    src = decoder(track)
+    fd = os.open(fifo, os.O_WRONLY)
+    if pipe_size:
+        set_pipe_size(src.stdout.fileno(), pipe_size)
+        set_pipe_size(fd, pipe_size)
+
+    cpu0, t0 = cpu_seconds(resource.RUSAGE_THREAD), time.monotonic()
+    total = forward(src.stdout.fileno(), fd, chunk)
+    cpu1, t1 = cpu_seconds(resource.RUSAGE_THREAD), time.monotonic()
+
+    os.close(fd)
+    src.wait()
+    sink.wait()
+    audio = total / BYTE_RATE
+    return {
+        "mode": name, "chunk": chunk, "pipe_size": pipe_size or "default",
+        "bytes": total,
+        "mb_per_s": round(total / (t1 - t0) / 1e6, 2),
+        "cpu_ms_per_audio_second": round(1000.0 * (cpu1 - cpu0) / audio, 3) if audio else None,
+        "syscalls_per_audio_second": round(BYTE_RATE / chunk * (2 if name == "loop" else 1), 1),
+    }
+
+
+# -------------------------------------------------------
+#  Main
+# -------------------------------------------------------
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the AUDIO_FIFO feeders")
+    parser.add_argument("--feeders", nargs="+", choices=FEEDERS, default=FEEDERS)
+    parser.add_argument("--seconds", type=float, default=20.0, help="measured time per feeder")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unmeasured start-up time")
+    parser.add_argument("--chunk", type=int, nargs="+", default=[4096, 17640, 65536],
+                        help="bytes per forward in the throughput pass (17640 = 100 ms)")
+    parser.add_argument("--skip-realtime", action="store_true")
+    parser.add_argument("--skip-throughput", action="store_true")
+    parser.add_argument("--output", help="write the JSON report here as well as stdout")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not shutil.which("ffmpeg"):
+        print("❌ ffmpeg not found on PATH", file=sys.stderr)
+        return 2
+
+    realtime: List[dict] = []
+    throughput: List[dict] = []
+    # The feeders log to stdout; keep stdout for the JSON report
+    with tempfile.TemporaryDirectory(prefix="lofi-feeders-") as tmp, \
+            contextlib.redirect_stdout(sys.stderr):
+        work = Path(tmp)
+        track = make_track(work)
+        if not args.skip_realtime:
+            realtime = [run_realtime(name, track, work, args.seconds, args.warmup)
+                        for name in args.feeders]
+        if not args.skip_throughput:
+            for chunk in args.chunk:
+                throughput.append(run_throughput("loop", forward_loop, chunk, track, work))
+                if SPLICE_AVAILABLE:
+                    throughput.append(run_throughput("splice", forward_splice, chunk, track, work,
+                                                     pipe_size=1 << 20))
+
+    report = {
+        "timestamp": int(time.time()),
+        "host": {
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "python": platform.python_version(),
+            "kernel": platform.release(),
+        },
+        "config": {"seconds": args.seconds, "warmup": args.warmup, "track_seconds": TRACK_SECONDS},
+        "realtime": realtime,
+        "throughput": throughput,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+    return 0 if all(r.get("ok") for r in realtime) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
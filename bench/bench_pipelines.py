@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+"""
+LOFI STREAMER — PIPELINE BENCHMARK
+
+Runs each build's real ffmpeg pipeline (8.7.9 start_pipeline, 8.7.11
+start_pipeline, LTS start_ffmpeg) for a fixed time against synthetic
+sources, and prints one JSON report:
+
+  camera  → ffmpeg testsrc2, H.264 into a private CAM_FIFO
+  audio   → lofistream AudioEngine playing a generated sine track
+  RTMP    → a local .flv file (or --url rtmp://127.0.0.1/... for a listener)
+
+Per build it reports encode fps, speed, dropped/duplicated frames, CPU
+(cores busy and % of the host), peak RSS and audio underruns. The 8.7.x
+builds can be run once per video encoder mode (LOFI_ENCODER: libx264,
+h264_v4l2m2m, copy) to compare the hardware and passthrough paths with the
+software one.
+
+    python3 bench/bench_pipelines.py --seconds 30 > bench.json
+    python3 bench/bench_pipelines.py --builds 8.7.11 --encoders libx264 h264_v4l2m2m copy
+    python3 bench/bench_pipelines.py --builds 8.7.11 --camera raw   # raw YUV + compositor
+
+With --camera raw, 8.7.11 runs its LOFI_CAMERA_MODE=test path: a test
+pattern goes through the in-process compositor to a rawvideo FIFO, and
+source_cpu_cores is the whole bench process (pattern, compositor, audio).
+    python3 bench/bench_pipelines.py --builds 8.7.9 8.7.11 --viz ffmpeg numpy
+
+--viz picks the 8.7.x visualiser: ffmpeg's showfreqs in the graph, or the
+in-process NumPy bars (LOFI_VIZ=numpy) fed from the bench's audio engine.
+    python3 bench/bench_pipelines.py --profiles pi4-safe pi5-quality headless lts
+
+--profiles runs every build once per pipeline profile (LOFI_PROFILE), taking
+encoder, overlay layout and visualiser from the profile instead of the
+--encoders / --viz matrix. Without it each build runs its own default.
+    python3 bench/bench_pipelines.py --compare bench.json   # exit 1 on regression
+
+Nothing here touches the live stream: every FIFO, overlay file and
+output lives in a temp dir. Needs ffmpeg on PATH.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import signal
+import resource
+import argparse
+import contextlib
+import platform
+import tempfile
+import threading
+import subprocess
+import importlib.util
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, List
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+
+from lofistream.audio import AudioEngine  # noqa: E402
+from lofistream.encoders import ENCODERS, LIBX264, V4L2M2M, ffmpeg_has_encoder  # noqa: E402
+from lofistream.profiles import PROFILES, Profile, resolve_profile  # noqa: E402
+from lofistream.visualiser import VISUALISER_AVAILABLE, Visualiser  # noqa: E402
+
+BUILDS = {
+    "8.7.9": "lofi-streamer.py",
+    "8.7.11": "lofi-streamer-RC_8-7-1.py",
+    "lts": "lofi-streamer-RC-8-7-27-LTS.py",
+}
+
+# Which direction is better for each metric --compare checks
+REGRESSION_KEYS = {
+    "encode_fps": "higher",
+    "speed": "higher",
+    "cpu_cores": "lower",
+    "max_rss_mb": "lower",
+    "dropped_frames": "lower",
+    "dup_frames": "lower",
+    "audio_underruns": "lower",
+}
+
+WIDTH, HEIGHT = 1280, 720
+
+
+# -------------------------------------------------------
+#  Loading the builds
+# -------------------------------------------------------
+def load_build(name: str):
+    """Import a streamer script as a module without running main()."""
+    path = REPO / BUILDS[name]
+    handlers = {s: signal.getsignal(s) for s in (signal.SIGINT, signal.SIGTERM)}
+    spec = importlib.util.spec_from_file_location(f"lofi_bench_{name.replace('.', '_')}", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    # LTS installs pkill-everything handlers at import; keep Ctrl-C harmless here
+    for s, h in handlers.items():
+        signal.signal(s, h)
+    return mod
+
+
+def capture_command(mod, start_fn, *args) -> List[str]:
+    """Call a build's start_pipeline/start_ffmpeg, but grab the argv instead of running it."""
+    captured = []
+
+    def fake_popen(cmd, *a, **kw):
+        captured.append(list(cmd))
+        return SimpleNamespace(args=cmd, poll=lambda: None, terminate=lambda: None)
+
+    real = mod.subprocess
+    mod.subprocess = SimpleNamespace(Popen=fake_popen, PIPE=subprocess.PIPE,
+                                     DEVNULL=subprocess.DEVNULL)
+    try:
+        start_fn(*args)
+    finally:
+        mod.subprocess = real
+    return captured[0]
+
+
+def configure_build(name: str, mod, work: Path, fps: int, logo: Path, with_logo: bool = True,
+                    profile: Profile = None):
+    """Point a build at the sandbox FIFOs/files; returns its start function."""
+    mod.CAM_FIFO = work / "cam.h264"
+    mod.AUDIO_FIFO = work / "audio.pcm"
+    mod.PROFILE = resolve_profile(profile or mod.PROFILE, raw_camera=hasattr(mod, "start_raw_camera"),
+                                  numpy=VISUALISER_AVAILABLE and hasattr(mod, "VISUALISER"))
+
+    if name == "lts":
+        mod.OVERLAY_FILE = work / "overlay.txt"
+        mod.OVERLAY_FILE.write_text("2000-01-01 00:00\nBenchmark - Sine")
+        if mod.OVERLAY_SPRITE:
+            mod.OVERLAY_SPRITE.path = work / "overlay.png"
+            mod.OVERLAY_SPRITE.show("2000-01-01 00:00\nBenchmark - Sine")
+        mod.LOGO_FILE = logo        # LTS always overlays the logo
+        mod.FPS, mod.GOP = fps, fps * 4
+        return mod.start_ffmpeg
+
+    mod.NOWPLAYING_FILE = work / "nowplaying.txt"
+    mod.CURRENT_TRACK_FILE = work / "current_track.txt"
+    if mod.NOWPLAYING_SPRITE:
+        mod.NOWPLAYING_SPRITE.path = work / "nowplaying.png"
+    mod.write_nowplaying("Benchmark - Sine")
+    mod.FFMPEG_LOGO = logo if with_logo else work / "missing.png"
+    mod.CHOSEN_FPS, mod.GOP_SIZE = fps, fps * 4
+    mod.VISUALISER = None
+    if mod.PROFILE.visualiser == "numpy":
+        mod.VIZ_FIFO = work / "viz.rgba"
+        mod.VISUALISER = Visualiser(mod.VIZ_FIFO, fps)
+    return mod.start_pipeline
+
+
+def instrument(cmd: List[str]) -> List[str]:
+    """Swap any -progress target for stdout so the bench can read it."""
+    out = []
+    skip = False
+    for arg in cmd:
+        if skip:
+            skip = False
+            continue
+        if arg == "-progress":
+            skip = True
+            continue
+        out.append(arg)
+    return out[:1] + ["-nostdin", "-nostats", "-progress", "pipe:1"] + out[1:]
+
+
+# -------------------------------------------------------
+#  Synthetic sources
+# -------------------------------------------------------
+def make_assets(work: Path):
+    track = work / "sine.wav"
+    subprocess.run([
+        "ffmpeg", "-v", "error", "-y",
+        "-f", "lavfi", "-i", "sine=frequency=220:sample_rate=44100:duration=30",
+        "-ac", "2", str(track),
+    ], check=True)
+
+    logo = work / "logo.png"
+    subprocess.run([
+        "ffmpeg", "-v", "error", "-y",
+        "-f", "lavfi", "-i", "color=c=white@0.8:s=300x67,format=rgba",
+        "-frames:v", "1", str(logo),
+    ], check=True)
+    return track, logo
+
+
+def start_camera_source(fifo: Path, fps: int) -> subprocess.Popen:
+    # Same shape as Picamera2's output: raw Annex-B H.264 baseline at the chosen fps
+    return subprocess.Popen([
+        "ffmpeg", "-v", "error", "-nostdin", "-re",
+        "-f", "lavfi", "-i", f"testsrc2=size={WIDTH}x{HEIGHT}:rate={fps}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-tune", "zerolatency",
+        "-profile:v", "baseline", "-g", str(fps * 4), "-bf", "0",
+        "-f", "h264", "-y", str(fifo),
+    ])
+
+
+def _forever(track: Path):
+    while True:
+        yield track
+
+
+def _release_fifo(fifo: Path):
+    # AudioEngine reopens the FIFO once ffmpeg is gone; let that open return
+    # so the engine sees the stop event and shuts its decoders down.
+    try:
+        fd = os.open(fifo, os.O_RDONLY | os.O_NONBLOCK)
+        time.sleep(0.2)
+        os.close(fd)
+    except OSError:
+        pass
+
+
+# -------------------------------------------------------
+#  Measuring
+# -------------------------------------------------------
+class Progress:
+    """Latest complete -progress block from ffmpeg's stdout."""
+
+    def __init__(self, proc: subprocess.Popen):
+        self.values: Dict[str, str] = {}
+        self.lock = threading.Lock()
+        threading.Thread(target=self._read, args=(proc,), daemon=True).start()
+
+    def _read(self, proc):
+        block = {}
+        for raw in proc.stdout:
+            key, _, value = raw.decode("utf-8", "replace").strip().partition("=")
+            block[key] = value
+            if key == "progress":
+                with self.lock:
+                    self.values = block
+                block = {}
+
+    def get(self, key: str, default=0.0) -> float:
+        with self.lock:
+            raw = self.values.get(key, "")
+        try:
+            return float(raw.rstrip("x"))
+        except ValueError:
+            return default
+
+
+def running(proc: subprocess.Popen) -> bool:
+    # WNOWAIT: peek without reaping, so reap() can still collect its rusage
+    return os.waitid(os.P_PID, proc.pid, os.WEXITED | os.WNOHANG | os.WNOWAIT) is None
+
+
+def reap(proc: subprocess.Popen, timeout: float = 10.0):
+    """Stop a child and return its own rusage (CPU seconds, peak RSS)."""
+    if running(proc):
+        proc.send_signal(signal.SIGINT)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+        if pid:
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            return usage
+        time.sleep(0.05)
+    proc.kill()
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return usage
+
+
+def run_build(name: str, args, work: Path, track: Path, logo: Path, encoder: str = LIBX264,
+              viz: str = "ffmpeg", profile: str = None) -> dict:
+    if profile:
+        encoder, viz = PROFILES[profile].encoder, PROFILES[profile].visualiser
+    elif name == "lts":
+        viz = "none"        # LTS draws no visualiser at all
+    result = {"build": name, "script": BUILDS[name], "profile": profile or "default",
+              "encoder": encoder, "camera": args.camera, "viz": viz, "ok": False}
+    bench_dir = work / f"{name}-{profile or 'default'}-{encoder}-{viz}"
+    bench_dir.mkdir()
+
+    if encoder == V4L2M2M and not ffmpeg_has_encoder(V4L2M2M):
+        result["error"] = f"this ffmpeg has no {V4L2M2M} encoder"
+        return result
+    if viz == "numpy" and not VISUALISER_AVAILABLE:
+        result["error"] = "the NumPy visualiser needs numpy"
+        return result
+
+    try:
+        mod = load_build(name)
+        result["version"] = getattr(mod, "VERSION", "")
+        if args.camera == "raw" and not hasattr(mod, "start_raw_camera"):
+            result["error"] = "this build has no raw camera mode"
+            return result
+        base = PROFILES[profile] if profile else mod.PROFILE
+        if not profile and name != "lts":
+            base = base._replace(visualiser=viz)
+        camera = "test" if args.camera == "raw" else "h264"
+        start_fn = configure_build(name, mod, bench_dir, args.fps, logo, not args.no_logo,
+                                   base._replace(encoder=encoder, camera=camera))
+        result.update(encoder=mod.PROFILE.encoder, viz=mod.PROFILE.visualiser,
+                      layout=mod.PROFILE.layout)
+        output = args.url or str(bench_dir / "out.flv")
+        cmd = instrument(capture_command(mod, start_fn, output))
+    except Exception as e:
+        result["error"] = f"setup failed: {e}"
+        return result
+
+    for f in (mod.CAM_FIFO, mod.AUDIO_FIFO):
+        os.mkfifo(f)
+
+    stop = threading.Event()
+    visualiser = getattr(mod, "VISUALISER", None)
+    if visualiser:
+        os.mkfifo(mod.VIZ_FIFO)
+        visualiser.start(stop)
+    engine = AudioEngine(_forever(track), mod.AUDIO_FIFO, prebuffer_seconds=2.0,
+                         tap=visualiser.feed if visualiser else None)
+    log = open(bench_dir / "ffmpeg.log", "wb")
+
+    print(f"⏱  {name} ({encoder}): {args.warmup:.0f}s warm-up + {args.seconds:.0f}s measured", file=sys.stderr)
+    ff = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=log)
+    raw = args.camera == "raw"
+    self0 = resource.getrusage(resource.RUSAGE_SELF)
+    cam = mod.start_camera() if raw else start_camera_source(mod.CAM_FIFO, args.fps)
+    audio = threading.Thread(target=engine.run, args=(stop,), daemon=True)
+    audio.start()
+    progress = Progress(ff)
+
+    t_start = time.monotonic()
+    time.sleep(args.warmup)
+    frames0, t0 = progress.get("frame"), time.monotonic()
+    underruns0 = engine.underruns
+    while time.monotonic() - t0 < args.seconds and running(ff):
+        time.sleep(0.2)
+    frames1, t1 = progress.get("frame"), time.monotonic()
+    underruns1 = engine.underruns
+    alive = running(ff)
+
+    usage = reap(ff)
+    wall = time.monotonic() - t_start
+    stop.set()
+    if raw:
+        mod.stop_camera(cam)
+        self1 = resource.getrusage(resource.RUSAGE_SELF)
+        source_cpu = (self1.ru_utime - self0.ru_utime) + (self1.ru_stime - self0.ru_stime)
+    else:
+        cam_usage = reap(cam)
+        source_cpu = cam_usage.ru_utime + cam_usage.ru_stime
+    _release_fifo(mod.AUDIO_FIFO)
+    if visualiser:
+        _release_fifo(mod.VIZ_FIFO)
+    audio.join(timeout=3)
+    log.close()
+
+    if not alive:
+        tail = (bench_dir / "ffmpeg.log").read_text(errors="replace").strip().splitlines()[-3:]
+        result["error"] = f"ffmpeg exited early ({ff.returncode}): " + " | ".join(tail)
+        return result
+
+    cpu = usage.ru_utime + usage.ru_stime
+    result.update({
+        "ok": True,
+        "target_fps": args.fps,
+        "encode_fps": round((frames1 - frames0) / (t1 - t0), 2),
+        "speed": progress.get("speed"),
+        "frames": int(frames1),
+        "dropped_frames": int(progress.get("drop_frames")),
+        "dup_frames": int(progress.get("dup_frames")),
+        "cpu_seconds": round(cpu, 2),
+        "cpu_cores": round(cpu / wall, 3),
+        "cpu_host_percent": round(100.0 * cpu / wall / (os.cpu_count() or 1), 1),
+        "max_rss_mb": round(usage.ru_maxrss / 1024.0, 1),
+        "audio_underruns": underruns1 - underruns0,
+        "source_cpu_cores": round(source_cpu / wall, 3),
+    })
+    return result
+
+
+# -------------------------------------------------------
+#  Regression check
+# -------------------------------------------------------
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    def ident(r):
+        return (r["build"], r.get("profile", "default"), r.get("encoder", LIBX264),
+                r.get("camera", "h264"), r.get("viz", "ffmpeg"))
+
+    old = {ident(r): r for r in baseline.get("results", []) if r.get("ok")}
+    problems = []
+    for r in report["results"]:
+        label = "{} ({} profile, {}, {} camera, {} viz)".format(*ident(r))
+        base = old.get(ident(r))
+        if not base:
+            continue
+        if not r.get("ok"):
+            problems.append(f"{label}: failed ({r.get('error', '')})")
+            continue
+        for key, better in REGRESSION_KEYS.items():
+            new, was = r.get(key), base.get(key)
+            if new is None or was is None:
+                continue
+            slack = max(abs(was) * tolerance, 1 if key.endswith(("frames", "underruns")) else 0)
+            worse = new < was - slack if better == "higher" else new > was + slack
+            if worse:
+                problems.append(f"{label}: {key} {was} → {new}")
+    return problems
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the streamer ffmpeg pipelines")
+    parser.add_argument("--builds", nargs="+", choices=list(BUILDS), default=list(BUILDS))
+    parser.add_argument("--seconds", type=float, default=30.0, help="measured time per build")
+    parser.add_argument("--warmup", type=float, default=5.0, help="unmeasured start-up time")
+    parser.add_argument("--encoders", nargs="+", choices=ENCODERS, default=[LIBX264],
+                        help="video encoder modes to run the 8.7.x builds with (LTS is libx264 only)")
+    parser.add_argument("--camera", choices=["h264", "raw"], default="h264",
+                        help="h264: synthetic H.264 camera; raw: 8.7.11's raw YUV compositor path")
+    parser.add_argument("--viz", nargs="+", choices=["ffmpeg", "numpy"], default=["ffmpeg"],
+                        help="8.7.x visualiser: showfreqs in ffmpeg, or in-process NumPy bars")
+    parser.add_argument("--profiles", nargs="+", choices=list(PROFILES),
+                        help="run each build once per pipeline profile (overrides --encoders/--viz)")
+    parser.add_argument("--fps", type=int, default=20, help="synthetic camera frame rate")
+    parser.add_argument("--no-logo", action="store_true",
+                        help="bench 8.7.x without the logo overlay (LTS always has one)")
+    parser.add_argument("--url", help="stream here instead of a local .flv (e.g. a local RTMP listener)")
+    parser.add_argument("--output", help="write the JSON report here as well as stdout")
+    parser.add_argument("--compare", help="baseline JSON; exit 1 if any metric regressed")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative drift")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not shutil.which("ffmpeg"):
+        print("❌ ffmpeg not found on PATH", file=sys.stderr)
+        return 2
+
+    # The builds and AudioEngine log to stdout; keep stdout for the JSON report
+    with tempfile.TemporaryDirectory(prefix="lofi-bench-") as tmp, \
+            contextlib.redirect_stdout(sys.stderr):
+        work = Path(tmp)
+        track, logo = make_assets(work)
+        if args.profiles:
+            results = [run_build(name, args, work, track, logo, profile=profile)
+                       for name in args.builds
+                       for profile in args.profiles]
+        else:
+            results = [run_build(name, args, work, track, logo, encoder, viz)
+                       for name in args.builds
+                       for encoder in args.encoders
+                       for viz in args.viz
+                       if name != "lts" or (encoder == LIBX264 and viz == args.viz[0])]
+
+    report = {
+        "timestamp": int(time.time()),
+        "host": {
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "python": platform.python_version(),
+            "ffmpeg": subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True)
+                      .stdout.split("\n", 1)[0],
+        },
+        "config": {"seconds": args.seconds, "warmup": args.warmup, "fps": args.fps,
+                   "encoders": args.encoders, "camera": args.camera,
+                   "profiles": args.profiles or ["default"],
+                   "logo": not args.no_logo, "output": args.url or "file"},
+        "results": results,
+    }
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+
+    status = 0 if all(r["ok"] for r in results) else 1
+    if args.compare:
+        problems = compare(report, json.loads(Path(args.compare).read_text()), args.tolerance)
+        for p in problems:
+            print(f"📉 {p}", file=sys.stderr)
+        if problems:
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,7 +7,7 @@ LOFI STREAMER v8.7.27 — WOOBOT LTS (FIXED)
 ✔ Audio FIFO never closes
 ✔ Playlist reshuffles forever
 ✔ Safe Python clock + date
-✔ Single drawtext
+✔ Clock + now playing as one pre-rendered overlay sprite
 ✔ Logo overlay (picam.png) — FIXED INPUT
 ✔ macOS junk ignored
 ✔ No restart on track change
@@ -17,23 +17,37 @@ import os
 import sys
 import time
 import socket
-import random
 import signal
 import threading
 import subprocess
 from pathlib import Path
 from datetime import datetime
 
+from lofistream.adaptive import Rung
+from lofistream.audio import Crossfade
+from lofistream.core import Overlays, ffmpeg_command, make_feeder
+from lofistream.library import TrackLibrary
+from lofistream.metrics import REGISTRY, TRACK_CHANGES, register_audio
+from lofistream.nowplaying import RUNTIME_DIR, NowPlayingPublisher
+from lofistream.profiles import load_profile, resolve_profile
+from lofistream.sprites import SPRITES_AVAILABLE, TextSprite
+from lofistream.status import StatusPublisher
+from lofistream.telemetry import FFmpegTelemetry, start_reader
+from lofistream.watcher import PlaylistWatcher
+
 VERSION = "8.7.27-woobot-lts"
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 SOUNDS_DIR = BASE_DIR / "Sounds"
 LOGO_FILE = BASE_DIR / "Logo" / "picam.png"
 STREAM_URL_FILE = BASE_DIR / "stream_url.txt"
+TRACK_INDEX_FILE = BASE_DIR / "track_index.db"
+ANALYSIS_CSV = BASE_DIR / "track_analysis.csv"
 
 CAM_FIFO = Path("/tmp/camfifo.ts")
 AUDIO_FIFO = Path("/tmp/lofi_audio.pcm")
-OVERLAY_FILE = Path("/tmp/overlay.txt")
+OVERLAY_FILE = RUNTIME_DIR / "overlay.txt"          # drawtext fallback (no Pillow)
+OVERLAY_SPRITE_FILE = RUNTIME_DIR / "overlay.png"
 
 WIDTH, HEIGHT = 1280, 720
 FPS = 20
@@ -42,13 +56,22 @@ GOP = FPS * 4
 VIDEO_BITRATE = "1500k"
 VIDEO_MAXRATE = "1800k"
 VIDEO_BUFSIZE = "2400k"
-AUDIO_BITRATE = "128k"
+CROSSFADE_SECONDS = 0      # 0 = hard cut between tracks
 
 FONT = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
 
+# Pipeline profile: the LTS look by default; LOFI_PROFILE / LOFI_ENCODER override.
+# Settled in main() (no raw camera path or visualiser in this build).
+PROFILE = load_profile("lts")
+
 GLOBAL_STOP = threading.Event()
 SESSION_STOP = threading.Event()
 NOW_PLAYING = "Starting…"
+OVERLAY_CHANGED = threading.Event()
+NOWPLAYING = NowPlayingPublisher()
+OVERLAY_SPRITE = TextSprite(OVERLAY_SPRITE_FILE, (WIDTH // 2, 70), font=Path(FONT),
+                            align="left") if SPRITES_AVAILABLE else None
+STATUS = StatusPublisher(VERSION)
 
 
 # --------------------------------------------------
@@ -92,72 +115,65 @@ def valid_track(p: Path) -> bool:
     )
 
 
+# Indexed once; later cycles only rescan if the folder actually changed
+LIBRARY = TrackLibrary(SOUNDS_DIR, TRACK_INDEX_FILE,
+                       is_valid=valid_track, analysis_csv=ANALYSIS_CSV)
+
+
 def load_tracks():
-    tracks = [p for p in SOUNDS_DIR.iterdir() if valid_track(p)]
-    if not tracks:
-        log("❌ No valid tracks found")
-        sys.exit(1)
-    random.shuffle(tracks)
-    log(f"🎶 Loaded {len(tracks)} tracks (filtered). Shuffled.")
+    try:
+        LIBRARY.sync()
+    except OSError as e:
+        log(f"❌ Cannot read {SOUNDS_DIR}: {e}")
+    tracks = LIBRARY.tracks()
+    if tracks:
+        log(f"🎶 Loaded {len(tracks)} tracks (filtered).")
+    else:
+        # No exit: the watcher picks music up as soon as it lands
+        log("⚠️ No valid tracks found — waiting for music")
     return tracks
 
 
 def playlist_forever(stop_event):
-    while not stop_event.is_set():
-        tracks = load_tracks()
-        for t in tracks:
-            if stop_event.is_set():
-                return
-            yield t
+    # Reshuffles forever over the live playlist; deleted files never get yielded
+    yield from LIBRARY.shuffled(stop_event)
 
 
 # --------------------------------------------------
 def overlay_writer():
+    # The text only changes on the minute or on a track change, so sleep
+    # until one of those; sprite/publisher skip the write if nothing changed.
     while not GLOBAL_STOP.is_set():
-        try:
-            OVERLAY_FILE.write_text(
-                f"{datetime.now():%Y-%m-%d %H:%M}\n{NOW_PLAYING}"
-            )
-        except Exception:
-            pass
-        time.sleep(1)
+        OVERLAY_CHANGED.clear()
+        text = f"{datetime.now():%Y-%m-%d %H:%M}\n{NOW_PLAYING}"
+        if OVERLAY_SPRITE:
+            OVERLAY_SPRITE.show(text)
+        else:
+            NOWPLAYING.write(OVERLAY_FILE, text)
+        OVERLAY_CHANGED.wait(60.2 - time.time() % 60)
 
 
 # --------------------------------------------------
-def audio_feeder(stop_event):
+def _on_track(track, label):
     global NOW_PLAYING
-    log("🎚 Audio feeder started (continuous FIFO)")
+    NOW_PLAYING = label
+    log(f"🎧 {NOW_PLAYING}")
+    OVERLAY_CHANGED.set()
+    STATUS.update(now_playing=label, track=track.name)
+    TRACK_CHANGES.inc()
 
-    silence = b"\x00\x00" * 44100 * 2
 
-    while not GLOBAL_STOP.is_set() and not stop_event.is_set():
-        try:
-            with open(AUDIO_FIFO, "wb", buffering=0) as fifo:
-                for track in playlist_forever(stop_event):
-                    NOW_PLAYING = track.stem
-                    log(f"🎧 {NOW_PLAYING}")
-
-                    cmd = [
-                        "ffmpeg", "-hide_banner", "-loglevel", "error",
-                        "-re", "-vn", "-i", str(track),
-                        "-f", "s16le", "-ar", "44100", "-ac", "2",
-                        "pipe:1"
-                    ]
-
-                    p = subprocess.Popen(cmd, stdout=subprocess.PIPE)
-
-                    while True:
-                        chunk = p.stdout.read(4096)
-                        if not chunk:
-                            break
-                        fifo.write(chunk)
-
-                    p.wait()
-                    fifo.write(silence)
-
-        except BrokenPipeError:
-            log("⚠️ Audio FIFO broken pipe — reopening")
-            time.sleep(1)
+def audio_feeder(stop_event):
+    log("🎚 Audio feeder started (continuous FIFO, gapless)")
+
+    # No silence between tracks: the next one is already decoded ahead
+    engine = make_feeder(
+        PROFILE, playlist_forever(stop_event), AUDIO_FIFO,
+        on_track=_on_track, crossfade=Crossfade(CROSSFADE_SECONDS, bpm_for=LIBRARY.bpm),
+    )
+    STATUS.provide("audio", engine.stats)
+    register_audio(engine)
+    engine.run(stop_event)
 
     log("🎚 Audio feeder stopped")
 
@@ -194,45 +210,18 @@ while True:
 
 # --------------------------------------------------
 def start_ffmpeg(stream_url):
-    subprocess.Popen([
-        "ffmpeg",
-        "-loglevel", "warning",
-        "-fflags", "+genpts",
-        "-use_wallclock_as_timestamps", "1",
-
-        "-thread_queue_size", "4096",
-        "-f", "h264", "-i", str(CAM_FIFO),
-
-        "-thread_queue_size", "4096",
-        "-f", "s16le", "-ar", "44100", "-ac", "2", "-i", str(AUDIO_FIFO),
-
-        "-loop", "1", "-i", str(LOGO_FILE),
-
-        "-filter_complex",
-        f"[0:v]scale={WIDTH}:{HEIGHT},format=yuv420p[v];"
-        f"[v][2:v]overlay=W-w-40:40[v2];"
-        f"[v2]drawtext=fontfile={FONT}:"
-        f"textfile='{OVERLAY_FILE}':reload=1:"
-        f"x=40:y=40:fontsize=24:fontcolor=white:borderw=2[vout]",
-
-        "-map", "[vout]",
-        "-map", "1:a",
-
-        "-c:v", "libx264",
-        "-preset", "veryfast",
-        "-profile:v", "baseline",
-        "-b:v", VIDEO_BITRATE,
-        "-maxrate", VIDEO_MAXRATE,
-        "-bufsize", VIDEO_BUFSIZE,
-        "-g", str(GOP),
-
-        "-c:a", "aac",
-        "-b:a", AUDIO_BITRATE,
-
-        "-f", "flv",
-        stream_url
-    ])
+    if OVERLAY_SPRITE:
+        OVERLAY_SPRITE.show(OVERLAY_SPRITE.current or "")   # must exist before ffmpeg opens it
+
+    cmd = ffmpeg_command(
+        PROFILE, stream_url, ["-f", "h264", "-i", str(CAM_FIFO)], AUDIO_FIFO,
+        Rung(FPS, VIDEO_BITRATE, VIDEO_MAXRATE, VIDEO_BUFSIZE), GOP,
+        Overlays(logo=LOGO_FILE, text=OVERLAY_SPRITE, text_file=OVERLAY_FILE, font=Path(FONT)),
+        size=(WIDTH, HEIGHT),
+    )
+    ff = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, bufsize=1)
     log("🎥 FFmpeg streaming")
+    return ff
 
 
 # --------------------------------------------------
@@ -250,6 +239,8 @@ signal.signal(signal.SIGTERM, shutdown)
 
 # --------------------------------------------------
 def main():
+    global PROFILE
+
     log(f"🌙 LOFI STREAMER {VERSION}\n")
     wait_for_pi_ready()
 
@@ -261,15 +252,34 @@ def main():
         os.mkfifo(f)
         log(f"✓ FIFO ready: {f}")
 
+    load_tracks()
+    PlaylistWatcher(LIBRARY).start(GLOBAL_STOP)
+    PROFILE = resolve_profile(PROFILE, raw_camera=False, numpy=False, log=log)
+    log(f"🎛 Profile: {PROFILE.name} — {PROFILE.encoder}, overlays {PROFILE.layout}, "
+        f"audio {PROFILE.feeder}")
+    STATUS.update(state="streaming", fps=FPS, bitrate=VIDEO_BITRATE, encoder=PROFILE.encoder,
+                  profile=PROFILE.name)
+    STATUS.provide("metrics", REGISTRY.collect)
+    STATUS.start(GLOBAL_STOP)
+
     threading.Thread(target=overlay_writer, daemon=True).start()
     threading.Thread(target=audio_feeder, args=(SESSION_STOP,), daemon=True).start()
 
     start_camera()
     time.sleep(2)
-    start_ffmpeg(stream_url)
+    ff = start_ffmpeg(stream_url)
+    tel = FFmpegTelemetry()
+    start_reader(ff, tel, GLOBAL_STOP, echo="all", log=log)
+    STATUS.provide("ffmpeg", tel.status)
+    tel.register_metrics()
 
+    last_issues = set()
     while True:
         time.sleep(1)
+        issues = tel.warnings()
+        if issues.keys() - last_issues:
+            log(f"⚠️ FFmpeg: {'; '.join(issues.values())}")
+        last_issues = issues.keys()
 
 
 if __name__ == "__main__":
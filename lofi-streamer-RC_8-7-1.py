@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 import os
 import time
-import random
 import socket
 import threading
 import subprocess
@@ -10,6 +9,22 @@ from typing import List, Optional
 import signal
 import sys
 
+from lofistream.adaptive import AdaptiveController, Rung, build_ladder, read_temp
+from lofistream.audio import Crossfade
+from lofistream.compositor import RawCamera
+from lofistream.core import (Overlays, choose_stream_params, ffmpeg_command, make_feeder,
+                             start_h264_camera, stop_h264_camera)
+from lofistream.library import TrackLibrary
+from lofistream.metrics import (REGISTRY, TRACK_CHANGES, SESSION_RESTARTS, STALLS, STALL_SECONDS,
+                                register_audio)
+from lofistream.nowplaying import CURRENT_TRACK_FILE, RUNTIME_DIR, NowPlayingPublisher
+from lofistream.profiles import RAW_CAMERAS, load_profile, resolve_profile
+from lofistream.sprites import SPRITES_AVAILABLE, TextSprite
+from lofistream.status import StatusPublisher
+from lofistream.telemetry import FFmpegTelemetry, start_reader
+from lofistream.visualiser import VISUALISER_AVAILABLE, Visualiser
+from lofistream.watcher import PlaylistWatcher
+
 # ======================================================================
 #  LOFI STREAMER v8.7.11 — PI4 BROADCAST STABLE (Susan fix)
 # ======================================================================
@@ -20,6 +35,7 @@ import sys
 #  ✔ Watchdog detects "stalled but alive" FFmpeg via -progress heartbeat
 #  ✔ Optional scheduled clean restart (default 6h) for true 24/7 stability
 #  ✔ Safer, ordered cleanup + restart loop
+#  ✔ Adaptive bitrate/fps ladder driven by live encoder telemetry
 # ======================================================================
 
 VERSION = "8.7.11-woobot-broadcast"
@@ -31,10 +47,27 @@ LOGO_PADDING = 40
 TEXT_PADDING = 40
 
 CAM_FIFO = Path("/tmp/camfifo.ts")
+
+# Pipeline profile (LOFI_PROFILE: auto | pi4-safe | pi5-quality | headless | lts).
+# Its camera field (LOFI_CAMERA_MODE overrides):
+#   h264: camera encodes, ffmpeg decodes + draws overlays (default)
+#   raw:  camera YUV → in-process compositor → rawvideo FIFO (no decode, no drawtext)
+#   test: raw mode fed by a moving test pattern instead of the camera
+PROFILE = load_profile("auto")
+OVERLAY_FONT = Path(os.environ.get("LOFI_FONT", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"))
 AUDIO_FIFO = Path("/tmp/lofi_audio.pcm")
 
-NOWPLAYING_FILE = Path("/tmp/nowplaying.txt")
-CURRENT_TRACK_FILE = Path("/tmp/current_track.txt")
+# Overlay files go to tmpfs when available; CURRENT_TRACK_FILE is the dashboard's
+NOWPLAYING = NowPlayingPublisher()
+NOWPLAYING_FILE = RUNTIME_DIR / "nowplaying.txt"    # drawtext fallback (no Pillow)
+
+# h264 mode: now playing is rendered once per track into a PNG that ffmpeg
+# overlays, instead of drawtext re-reading a text file on every frame.
+# Fixed canvas (right-aligned, clear of the visualiser) so ffmpeg never reconfigures.
+NOWPLAYING_SPRITE = TextSprite(
+    RUNTIME_DIR / "nowplaying.png", (OUTPUT_W - 2 * TEXT_PADDING - 180, 34),
+    font=OVERLAY_FONT, align="right",
+) if SPRITES_AVAILABLE else None
 
 # Watchdog / stability
 WATCHDOG_INTERVAL = 10            # seconds
@@ -45,6 +78,9 @@ RESTART_COOLDOWN = 60             # seconds
 # Optional scheduled clean restart (strongly recommended for Pi4)
 SESSION_MAX_SECONDS = int(os.environ.get("LOFI_SESSION_MAX_SECONDS", str(6 * 3600)))  # default 6h (0 disables)
 
+# Structured state for the dashboard (Unix datagram socket, fire-and-forget)
+STATUS = StatusPublisher(VERSION)
+
 CHOSEN_FPS: Optional[int] = None
 GOP_SIZE: Optional[int] = None
 
@@ -53,16 +89,8 @@ VIDEO_MAXRATE = "1800k"
 VIDEO_BUFSIZE = "2400k"
 
 # -------------------------------------------------------
-# Picamera2 Imports
+# Optional Imports (Picamera2 lives in lofistream.core)
 # -------------------------------------------------------
-try:
-    from picamera2 import Picamera2
-    from picamera2.encoders import H264Encoder
-    from picamera2.outputs import FileOutput
-    PICAMERA2_AVAILABLE = True
-except ImportError:
-    PICAMERA2_AVAILABLE = False
-
 try:
     import psutil
     PSUTIL_AVAILABLE = True
@@ -110,6 +138,8 @@ def _env_bool(name, default=False):
 # DIRS / CONFIG
 # -------------------------------------------------------
 PLAYLIST_DIR = _env_path("LOFI_PLAYLIST_DIR", BASE_DIR / "Sounds")
+TRACK_INDEX_FILE = _env_path("LOFI_TRACK_INDEX", BASE_DIR / "track_index.db")
+ANALYSIS_CSV = _env_path("LOFI_ANALYSIS_CSV", BASE_DIR / "track_analysis.csv")
 LOGO_DIR = _env_path("LOFI_BRAND_DIR", BASE_DIR / "Logo")
 
 STREAM_URL_FILE = _env_path("LOFI_STREAM_URL_FILE", BASE_DIR / "stream_url.txt")
@@ -117,6 +147,9 @@ STREAM_URL_ENV = os.environ.get("LOFI_YOUTUBE_URL", "")
 
 FFMPEG_LOGO = _env_path("LOFI_BRAND_IMAGE", LOGO_DIR / "picam.png")
 
+VIZ_FIFO = Path("/tmp/lofi_viz.rgba")
+VISUALISER = None
+
 FALLBACK_FPS = _env_int("LOFI_FALLBACK_FPS", 20)
 
 CHECK_HOST = os.environ.get("LOFI_CHECK_HOST", "a.rtmp.youtube.com")
@@ -124,6 +157,13 @@ CHECK_PORT = _env_int("LOFI_CHECK_PORT", 1935)
 
 SKIP_NETWORK_CHECK = _env_bool("LOFI_SKIP_NETWORK_CHECK", False)
 AUTO_RESTART = _env_bool("LOFI_AUTO_RESTART", True)
+# Step bitrate/fps down (and back up) from live telemetry via graceful restarts
+ADAPTIVE = _env_bool("LOFI_ADAPTIVE", True)
+
+# Track transitions: 0 = hard cut, N = N-second equal-power crossfade.
+# LOFI_CROSSFADE_BEATS snaps the overlap to whole beats when BPM is known.
+CROSSFADE_SECONDS = _env_int("LOFI_CROSSFADE_SECONDS", 0)
+CROSSFADE_BEATS = _env_int("LOFI_CROSSFADE_BEATS", 0)
 
 
 # -------------------------------------------------------
@@ -171,55 +211,6 @@ def wait_for_pi_ready():
     print("✅ Pi Ready!\n")
 
 
-# -------------------------------------------------------
-# PI MODEL + PARAM SELECTION
-# -------------------------------------------------------
-def detect_pi_model():
-    try:
-        with open("/proc/device-tree/model") as f:
-            m = f.read().lower()
-            if "raspberry pi 5" in m:
-                return 5
-            if "raspberry pi 4" in m:
-                return 4
-    except FileNotFoundError:
-        pass
-    except Exception:
-        pass
-    return 0
-
-
-def choose_stream_params():
-    model = detect_pi_model()
-
-    fps = FALLBACK_FPS
-    bitrate = "1500k"
-    maxrate = "1800k"
-    bufsize = "2400k"
-
-    if model == 5:
-        fps = 30
-        bitrate = "2500k"
-        maxrate = "3000k"
-        bufsize = "4000k"
-    elif model == 4:
-        fps = 20
-        bitrate = "1500k"
-        maxrate = "1800k"
-        bufsize = "2400k"
-
-    if PSUTIL_AVAILABLE:
-        load = psutil.cpu_percent(interval=1.0)
-        print(f"🧠 Startup CPU load: {load:.1f}%")
-        if load > 85:
-            print("⚠️ High startup CPU — tuning safer parameters")
-            fps = max(15, fps - 5)
-
-    print(f"🎞 Auto-selected FPS: {fps}")
-    print(f"📺 Video bitrate: {bitrate}, maxrate: {maxrate}, bufsize: {bufsize}")
-    return fps, bitrate, maxrate, bufsize
-
-
 # -------------------------------------------------------
 # TRACK HANDLING
 # -------------------------------------------------------
@@ -240,6 +231,11 @@ def _is_valid_audio(t: Path):
     return t.suffix.lower() in [".mp3", ".wav", ".flac", ".m4a"]
 
 
+# Loaded once, then kept in sync incrementally (no per-track tag parsing)
+LIBRARY = TrackLibrary(PLAYLIST_DIR, TRACK_INDEX_FILE,
+                       is_valid=_is_valid_audio, analysis_csv=ANALYSIS_CSV)
+
+
 def load_tracks() -> List[Path]:
     if not PLAYLIST_DIR.exists():
         print(f"❌ Playlist directory missing: {PLAYLIST_DIR}")
@@ -255,362 +251,180 @@ def load_tracks() -> List[Path]:
         return []
 
     try:
-        tracks = [t for t in PLAYLIST_DIR.iterdir() if _is_valid_audio(t)]
+        LIBRARY.sync()
     except Exception as e:
         print(f"❌ Failed to read playlist directory: {e}")
         return []
 
+    tracks = LIBRARY.tracks()
+
     print(f"🎶 Loaded {len(tracks)} tracks.")
     return tracks
 
 
 def _playlist_iterator(stop_event: threading.Event):
-    while not stop_event.is_set():
-        tracks = load_tracks()
-        if not tracks:
-            print("⚠️ No tracks found. Waiting 10 seconds before retry...")
-            for _ in range(10):
-                if stop_event.is_set():
-                    return
-                time.sleep(1)
-            continue
-
-        lst = list(tracks)
-        random.shuffle(lst)
-        for t in lst:
-            if stop_event.is_set():
-                return
-            yield t
+    # Live shuffle over the indexed playlist: new files join mid-cycle, deleted
+    # ones are skipped, and an empty folder waits instead of rescanning.
+    yield from LIBRARY.shuffled(stop_event)
 
 
 # -------------------------------------------------------
 # NOW PLAYING
 # -------------------------------------------------------
+NOWPLAYING_TEXT = ""
+RAW_CAMERA: Optional[RawCamera] = None
+
+
 def _escape(s: str):
     return s.replace(":", r"\:")
 
 
 def get_nowplaying(t: Path):
-    try:
-        import mutagen
-        m = mutagen.File(t, easy=True)
-        title = m.get("title", [""])[0]
-        artist = m.get("artist", [""])[0]
-        if not title:
-            title = t.stem
-    except Exception:
-        title = t.stem
-        artist = ""
-
-    return _escape(f"{artist} - {title}" if artist else title)
+    info = LIBRARY.lookup(t)   # indexed tags; parsed only if the file is new/changed
+    return _escape(info.label if info else t.stem)
 
 
 def write_nowplaying(txt: str):
-    try:
-        NOWPLAYING_FILE.write_text(f"Now Playing: {txt}")
-    except Exception:
-        pass
-    try:
-        CURRENT_TRACK_FILE.write_text(txt)
-    except Exception:
-        pass
-
-
-# -------------------------------------------------------
-# FILTER CHAIN
-# -------------------------------------------------------
-def _build_filter_chain(video_ref: str) -> str:
-    viz_w = 140
-    viz_h = 28
-
-    np_file = str(NOWPLAYING_FILE)
-
-    text_y = OUTPUT_H - viz_h - 30
-    viz_y = text_y
-    viz_x = 40
-
-    timestamp = (
-        f"drawtext=text='%{{localtime}}':"
-        f"x={LOGO_PADDING}:y={LOGO_PADDING}:"
-        "fontsize=24:fontcolor=white:borderw=2"
-    )
-
-    viz = (
-        f"[1:a]showfreqs=mode=bar:ascale=log:colors=0xCCCCCC:"
-        f"size={viz_w}x{viz_h}[viz];"
-    )
-
-    logo_x = f"W-w-{LOGO_PADDING}"
-    logo_y = LOGO_PADDING
-
-    if FFMPEG_LOGO.exists():
-        return (
-            viz +
-            f"{video_ref}scale={OUTPUT_W}:{OUTPUT_H},format=yuv420p[v0];"
-            f"[v0]{timestamp}[v1];"
-            f"[v1][2:v]overlay={logo_x}:{logo_y}[v2];"
-            f"[v2][viz]overlay={viz_x}:{viz_y}[v3];"
-            f"[v3]drawtext=textfile='{np_file}':reload=1:fontcolor=white:"
-            f"fontsize=24:x=w-tw-{TEXT_PADDING}:y={text_y}[vout]"
-        )
-
-    return (
-        viz +
-        f"{video_ref}scale={OUTPUT_W}:{OUTPUT_H},format=yuv420p[v0];"
-        f"[v0]{timestamp}[v1];"
-        f"[v1][viz]overlay={viz_x}:{viz_y}[v2];"
-        f"[v2]drawtext=textfile='{np_file}':reload=1:fontcolor=white:"
-        f"fontsize=24:x=w-tw-{TEXT_PADDING}:y={text_y}[vout]"
-    )
+    global NOWPLAYING_TEXT
+    NOWPLAYING_TEXT = f"Now Playing: {txt.replace(chr(92) + ':', ':')}"
+    if RAW_CAMERA:
+        RAW_CAMERA.now_playing = NOWPLAYING_TEXT
+    elif NOWPLAYING_SPRITE:
+        NOWPLAYING_SPRITE.show(NOWPLAYING_TEXT)
+    else:
+        NOWPLAYING.write(NOWPLAYING_FILE, f"Now Playing: {txt}")
+    NOWPLAYING.write(CURRENT_TRACK_FILE, txt)
 
 
 # -------------------------------------------------------
 # CAMERA (stable blocking FIFO output)
 # -------------------------------------------------------
-def start_camera():
-    if not PICAMERA2_AVAILABLE:
-        print("❌ Picamera2 not installed.")
-        return None
-
+def start_raw_camera():
+    global RAW_CAMERA
     fps = CHOSEN_FPS or 20
-
-    print("📸 Initialising Picamera2…")
-    picam = Picamera2()
-
-    config = picam.create_video_configuration(
-        main={"format": "YUV420", "size": (OUTPUT_W, OUTPUT_H)},
-        controls={"FrameRate": fps}
-    )
-    picam.configure(config)
-
-    def _br_to_int(br: str) -> int:
-        if br.endswith("k"):
-            return int(br[:-1]) * 1000
-        return int(br)
-
-    encoder = H264Encoder(bitrate=_br_to_int(VIDEO_BITRATE))
-
-    # IMPORTANT: blocking FIFO output is more stable for long runtimes
-    out = FileOutput(str(CAM_FIFO))
-
     try:
-        picam.start_recording(encoder, out)
+        cam = RawCamera(OUTPUT_W, OUTPUT_H, fps, CAM_FIFO,
+                        logo=FFMPEG_LOGO, font=OVERLAY_FONT,
+                        test_pattern=PROFILE.camera == "test",
+                        padding=LOGO_PADDING, text_y=OUTPUT_H - 28 - 30)
     except Exception as e:
-        print("❌ Failed to start camera:", e)
+        print("❌ Failed to start raw camera:", e)
         return None
+    cam.now_playing = NOWPLAYING_TEXT
+    RAW_CAMERA = cam.start()
+    source = "test pattern" if PROFILE.camera == "test" else "Picamera2"
+    print(f"📸 {source} (raw YUV420 {fps}fps) → compositor → {CAM_FIFO}")
+    return cam
+
 
-    print(f"📸 Picamera2 (H264 Baseline {fps}fps, {VIDEO_BITRATE}) → {CAM_FIFO}")
-    return picam
+def start_camera():
+    if PROFILE.camera in RAW_CAMERAS:
+        return start_raw_camera()
+
+    fps = CHOSEN_FPS or 20
+    return start_h264_camera(CAM_FIFO, fps, VIDEO_BITRATE, GOP_SIZE or fps * 4,
+                             PROFILE.encoder, (OUTPUT_W, OUTPUT_H))
 
 
 def stop_camera(picam):
+    global RAW_CAMERA
     if not picam:
         return
-    print("📷 Stopping Picamera2…")
-    try:
-        picam.stop_recording()
-    except Exception:
-        pass
-    try:
-        picam.close()
-    except Exception:
-        pass
+    if isinstance(picam, RawCamera):
+        print("📷 Stopping raw camera…")
+        picam.stop()
+        RAW_CAMERA = None
+        return
+    stop_h264_camera(picam)
 
 
 # -------------------------------------------------------
-# AUDIO FEEDER (self-healing)
+# AUDIO FEEDER (self-healing, gapless)
 # -------------------------------------------------------
+def _on_track(t: Path, np: str):
+    print(f"🎧 {np}")
+    write_nowplaying(np)
+    STATUS.update(now_playing=np, track=t.name)
+    TRACK_CHANGES.inc()
+
+
 def audio_feeder(stop_event: threading.Event):
     print("🎚 Audio feeder started.")
 
-    while not stop_event.is_set():
-        # Open FIFO (blocks until ffmpeg opens for reading)
-        try:
-            with open(AUDIO_FIFO, "wb", buffering=0) as fd:
-                for t in _playlist_iterator(stop_event):
-                    if stop_event.is_set():
-                        break
-
-                    np = get_nowplaying(t)
-                    print(f"🎧 {np}")
-                    write_nowplaying(np)
-
-                    cmd = [
-                        "ffmpeg", "-hide_banner", "-loglevel", "error",
-                        "-re", "-vn", "-i", str(t),
-                        "-f", "s16le", "-ar", "44100", "-ac", "2", "pipe:1"
-                    ]
-
-                    # Send decoded PCM directly into the FIFO
-                    try:
-                        p = subprocess.Popen(
-                            cmd,
-                            stdout=fd,
-                            stderr=subprocess.DEVNULL,  # avoid PIPE fill deadlocks
-                        )
-
-                        while p.poll() is None and not stop_event.is_set():
-                            time.sleep(0.5)
-
-                        if stop_event.is_set():
-                            try:
-                                p.terminate()
-                                p.wait(timeout=2)
-                            except Exception:
-                                try:
-                                    p.kill()
-                                except Exception:
-                                    pass
-                            break
-
-                        # If decode fails, move to next track
-                        if p.returncode != 0:
-                            print(f"⚠️ Audio decode error for {t.name} (ffmpeg rc={p.returncode})")
-                            continue
-
-                    except BrokenPipeError:
-                        # FFmpeg stopped reading audio FIFO. Do NOT exit permanently.
-                        print("⚠️ Audio FIFO broken pipe — FFmpeg likely restarted/stalled. Reopening FIFO...")
-                        time.sleep(1)
-                        break
-                    except Exception as e:
-                        print(f"❌ Audio feeder error: {e}")
-                        time.sleep(1)
-                        continue
-
-        except FileNotFoundError:
-            # FIFO not created yet, wait
-            time.sleep(0.5)
-        except Exception as e:
-            if stop_event.is_set():
-                break
-            print(f"❌ Audio feeder open/write error: {e}")
-            time.sleep(1)
+    # The engine reopens the FIFO itself if FFmpeg restarts/stalls, and keeps
+    # the next track decoded ahead so track changes are gapless.
+    engine = make_feeder(
+        PROFILE, _playlist_iterator(stop_event), AUDIO_FIFO,
+        describe=get_nowplaying, on_track=_on_track,
+        crossfade=Crossfade(CROSSFADE_SECONDS, CROSSFADE_BEATS, bpm_for=LIBRARY.bpm),
+        tap=VISUALISER.feed if VISUALISER else None,
+    )
+    STATUS.provide("audio", engine.stats)
+    register_audio(engine)
+    try:
+        engine.run(stop_event)
+    except Exception as e:
+        print(f"❌ Audio feeder error: {e}")
 
     print("🎚 Audio feeder stopped.")
 
 
 # -------------------------------------------------------
-# FFMPEG PIPELINE (with progress heartbeat)
+# VISUALISER
 # -------------------------------------------------------
-def start_pipeline(stream_url: str):
-    print("🎥 Starting ffmpeg pipeline…")
-
-    g = GOP_SIZE or 80
-
-    cmd = [
-        "ffmpeg",
-        "-hide_banner",
-        "-loglevel", "warning",
-        "-fflags", "+genpts+discardcorrupt",
-        "-flags", "low_delay",
-        "-thread_queue_size", "4096",
-        "-probesize", "64k",
-        "-analyzeduration", "0",
-        "-vsync", "1",
-        "-use_wallclock_as_timestamps", "1",
-
-        # Inputs
-        "-f", "h264", "-i", str(CAM_FIFO),
-        "-thread_queue_size", "4096",
-        "-f", "s16le", "-ar", "44100", "-ac", "2", "-i", str(AUDIO_FIFO),
-    ]
-
-    if FFMPEG_LOGO.exists():
-        cmd += ["-loop", "1", "-i", str(FFMPEG_LOGO)]
-
-    filter_chain = _build_filter_chain("[0:v]")
-
-    cmd += [
-        "-filter_complex", filter_chain,
-        "-map", "[vout]", "-map", "1:a",
-
-        "-c:v", "libx264",
-        "-preset", "veryfast",
-        "-tune", "zerolatency",
-        "-profile:v", "baseline",
-        "-level", "3.1",
-        "-b:v", VIDEO_BITRATE,
-        "-maxrate", VIDEO_MAXRATE,
-        "-bufsize", VIDEO_BUFSIZE,
-        "-g", str(g),
-        "-keyint_min", str(g),
-        "-sc_threshold", "0",
-        "-pix_fmt", "yuv420p",
-
-        "-c:a", "aac",
-        "-b:a", "128k",
-        "-ar", "44100",
-
-        # Heartbeat: emits key=value progress regularly to stderr
-        "-progress", "pipe:2",
-
-        "-f", "flv", stream_url,
-    ]
-
-    # IMPORTANT: do not PIPE stdout (can deadlock). stderr is drained by a reader thread.
-    return subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, bufsize=1)
+def start_visualiser(stop_event: threading.Event):
+    """Bars from the audio engine's own PCM (LOFI_VIZ=numpy) instead of showfreqs."""
+    global VISUALISER
+    if PROFILE.visualiser != "numpy":
+        return
+    # Created once: the writer reconnects to every ffmpeg session through it
+    if VIZ_FIFO.exists():
+        os.unlink(VIZ_FIFO)
+    os.mkfifo(VIZ_FIFO)
+    VISUALISER = Visualiser(VIZ_FIFO, CHOSEN_FPS or 20)
+    VISUALISER.start(stop_event)
+    print(f"📊 Visualiser: in-process, {VISUALISER.spectrum.bands} bands")
 
 
 # -------------------------------------------------------
-# FFmpeg stderr/progress reader (prevents pipe deadlocks + gives heartbeat)
+# FFMPEG PIPELINE (with progress heartbeat)
 # -------------------------------------------------------
-class FFmpegTelemetry:
-    def __init__(self):
-        self.lock = threading.Lock()
-        self.last_progress_ts = time.time()
-        self.last_line_ts = time.time()
-        self.last_error_line = ""
-        self.seen_broken_pipe = False
+def _camera_input_args() -> List[str]:
+    if PROFILE.camera in RAW_CAMERAS:
+        return ["-f", "rawvideo", "-pix_fmt", "yuv420p", "-video_size", f"{OUTPUT_W}x{OUTPUT_H}",
+                "-framerate", str(CHOSEN_FPS or 20), "-i", str(CAM_FIFO)]
+    return ["-f", "h264", "-i", str(CAM_FIFO)]
 
-    def update_line(self, line: str):
-        now = time.time()
-        with self.lock:
-            self.last_line_ts = now
-
-            # -progress emits key=value lines including out_time_ms periodically
-            if line.startswith("out_time_ms=") or line.startswith("frame=") or line.startswith("progress="):
-                self.last_progress_ts = now
 
-            low = line.lower()
-            if "broken pipe" in low or "av_interleaved_write_frame" in low:
-                self.seen_broken_pipe = True
-                self.last_error_line = line.strip()
-            elif "error" in low or "failed" in low or "connection" in low:
-                self.last_error_line = line.strip()
-
-    def snapshot(self):
-        with self.lock:
-            return (self.last_progress_ts, self.last_line_ts, self.last_error_line, self.seen_broken_pipe)
+def start_pipeline(stream_url: str):
+    print("🎥 Starting ffmpeg pipeline…")
 
+    if NOWPLAYING_SPRITE and PROFILE.camera not in RAW_CAMERAS:
+        NOWPLAYING_SPRITE.show(NOWPLAYING_TEXT)   # must exist before ffmpeg opens it
+    if VISUALISER:
+        VISUALISER.fps = CHOSEN_FPS or 20       # the adaptive ladder may have changed it
+
+    cmd = ffmpeg_command(
+        PROFILE, stream_url, _camera_input_args(), AUDIO_FIFO,
+        Rung(CHOSEN_FPS or 20, VIDEO_BITRATE, VIDEO_MAXRATE, VIDEO_BUFSIZE), GOP_SIZE or 80,
+        Overlays(logo=FFMPEG_LOGO, text=NOWPLAYING_SPRITE, text_file=NOWPLAYING_FILE,
+                 font=OVERLAY_FONT, visualiser=VISUALISER),
+        size=(OUTPUT_W, OUTPUT_H),
+    )
 
-def ffmpeg_reader_thread(ff: subprocess.Popen, tel: FFmpegTelemetry, stop_event: threading.Event):
-    try:
-        if not ff.stderr:
-            return
-        for line in ff.stderr:
-            if stop_event.is_set():
-                break
-            line = line.strip()
-            if not line:
-                continue
-            tel.update_line(line)
-            # Print only useful bits (avoid spam)
-            if "broken pipe" in line.lower():
-                print(f"⚠️ FFmpeg: {line}")
-            elif "error" in line.lower() or "failed" in line.lower():
-                print(f"⚠️ FFmpeg: {line}")
-    except Exception:
-        pass
+    # IMPORTANT: do not PIPE stdout (can deadlock). stderr is drained by a reader thread.
+    return subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, bufsize=1)
 
 
 # -------------------------------------------------------
 # WATCHDOG (monitors FFmpeg health and stalls)
 # -------------------------------------------------------
-def watchdog_monitor(ff: subprocess.Popen, tel: FFmpegTelemetry, stop_event: threading.Event, restart_flag):
+def watchdog_monitor(ff: subprocess.Popen, tel: FFmpegTelemetry, stop_event: threading.Event, restart_flag,
+                     adaptive: Optional[AdaptiveController] = None):
     print("🐕 Watchdog started")
     started = time.time()
     last_net_check = 0.0
+    last_issues = set()
 
     while not stop_event.is_set():
         time.sleep(WATCHDOG_INTERVAL)
@@ -631,10 +445,13 @@ def watchdog_monitor(ff: subprocess.Popen, tel: FFmpegTelemetry, stop_event: thr
             stop_event.set()
             break
 
-        last_progress_ts, _, last_err, seen_bp = tel.snapshot()
+        _, _, last_err, seen_bp = tel.snapshot()
+        silence = tel.progress_age()
 
         # stalled but alive (common RTMP dead socket case)
-        if (time.time() - last_progress_ts) > STALL_TIMEOUT:
+        if silence > STALL_TIMEOUT:
+            STALLS.inc()
+            STALL_SECONDS.inc(silence)
             print(f"❌ Watchdog: FFmpeg stalled (no progress for {STALL_TIMEOUT}s). Restarting.")
             if last_err:
                 print(f"   Last FFmpeg note: {last_err}")
@@ -651,6 +468,12 @@ def watchdog_monitor(ff: subprocess.Popen, tel: FFmpegTelemetry, stop_event: thr
             stop_event.set()
             break
 
+        # degraded but still moving: slow encode / dropped frames (logged, no restart)
+        issues = tel.warnings()
+        if issues.keys() - last_issues:
+            print(f"⚠️ Watchdog: FFmpeg {'; '.join(issues.values())}")
+        last_issues = issues.keys()
+
         # light network checks every 5 minutes
         if time.time() - last_net_check > 300:
             last_net_check = time.time()
@@ -658,6 +481,7 @@ def watchdog_monitor(ff: subprocess.Popen, tel: FFmpegTelemetry, stop_event: thr
                 print("⚠️ Watchdog: RTMP host unreachable (network issue).")
 
         # optional CPU warning
+        cpu = None
         if PSUTIL_AVAILABLE:
             try:
                 cpu = psutil.cpu_percent(interval=0.2)
@@ -666,6 +490,15 @@ def watchdog_monitor(ff: subprocess.Popen, tel: FFmpegTelemetry, stop_event: thr
             except Exception:
                 pass
 
+        # adaptive ladder: a rung change is applied by a graceful session restart
+        if adaptive:
+            change = adaptive.observe(tel.averages(), read_temp(), cpu)
+            if change:
+                print(f"🎚 Watchdog: {change}")
+                restart_flag["do_restart"] = True
+                stop_event.set()
+                break
+
     print("🐕 Watchdog stopped")
 
 
@@ -675,9 +508,11 @@ def watchdog_monitor(ff: subprocess.Popen, tel: FFmpegTelemetry, stop_event: thr
 class StreamerState:
     def __init__(self):
         self.restart_count = 0
+        self.total_restarts = 0
         self.last_restart_time = 0.0
         self.stop_event = threading.Event()
         self.global_stop = False
+        self.adaptive: Optional[AdaptiveController] = None
 
 
 def cleanup_resources(ff, picam, audio_thread, reader_thread, stop_event: threading.Event):
@@ -746,8 +581,12 @@ def run_streaming_session(state: StreamerState, stream_url: str) -> bool:
         return False
 
     tel = FFmpegTelemetry()
-    reader = threading.Thread(target=ffmpeg_reader_thread, args=(ff, tel, state.stop_event), daemon=True)
-    reader.start()
+    reader = start_reader(ff, tel, state.stop_event)
+    STATUS.provide("ffmpeg", tel.status)
+    tel.register_metrics()
+    if state.adaptive:
+        state.adaptive.session_start()
+    STATUS.update(state="streaming", restarts=state.total_restarts, session_started=time.time())
 
     # Start camera (FIFO writer)
     picam = start_camera()
@@ -765,7 +604,7 @@ def run_streaming_session(state: StreamerState, stream_url: str) -> bool:
     # Start watchdog
     wd = threading.Thread(
         target=watchdog_monitor,
-        args=(ff, tel, state.stop_event, restart_flag),
+        args=(ff, tel, state.stop_event, restart_flag, state.adaptive),
         daemon=True
     )
     wd.start()
@@ -793,7 +632,7 @@ def run_streaming_session(state: StreamerState, stream_url: str) -> bool:
 
 def main():
     global CHOSEN_FPS, GOP_SIZE
-    global VIDEO_BITRATE, VIDEO_MAXRATE, VIDEO_BUFSIZE
+    global VIDEO_BITRATE, VIDEO_MAXRATE, VIDEO_BUFSIZE, PROFILE
 
     print(f"🌙 LOFI STREAMER {VERSION} — Woobot Pi4 Stable\n")
 
@@ -815,12 +654,30 @@ def main():
 
     tracks = load_tracks()
     if not tracks:
-        return
+        print("⚠️ No tracks yet — streaming will pick up music as soon as it lands.")
+
+    # Folder watcher + status channel live for the whole process, across session restarts
+    watcher_stop = threading.Event()
+    PlaylistWatcher(LIBRARY).start(watcher_stop)
+    STATUS.provide("metrics", REGISTRY.collect)
+    STATUS.start(watcher_stop)
 
-    CHOSEN_FPS, VIDEO_BITRATE, VIDEO_MAXRATE, VIDEO_BUFSIZE = choose_stream_params()
+    PROFILE = resolve_profile(PROFILE, raw_camera=True, numpy=VISUALISER_AVAILABLE)
+    print(f"🎛 Profile: {PROFILE.name} — {PROFILE.encoder}, overlays {PROFILE.layout}, "
+          f"visualiser {PROFILE.visualiser}, audio {PROFILE.feeder}")
+    print(f"📸 Camera mode: {PROFILE.camera}")
+
+    CHOSEN_FPS, VIDEO_BITRATE, VIDEO_MAXRATE, VIDEO_BUFSIZE = choose_stream_params(
+        PROFILE, FALLBACK_FPS, VIDEO_BITRATE)
     GOP_SIZE = (CHOSEN_FPS or 20) * 4
 
     print(f"🎞 Final FPS: {CHOSEN_FPS}, GOP: {GOP_SIZE}")
+    STATUS.update(fps=CHOSEN_FPS, bitrate=VIDEO_BITRATE, encoder=PROFILE.encoder, profile=PROFILE.name)
+    if ADAPTIVE:
+        state.adaptive = AdaptiveController(
+            build_ladder(CHOSEN_FPS, VIDEO_BITRATE, VIDEO_MAXRATE, VIDEO_BUFSIZE))
+        print("🎚 Adaptive ladder: " + " → ".join(f"{r.fps}fps/{r.bitrate}" for r in state.adaptive.ladder))
+    start_visualiser(watcher_stop)
     print(f"🔄 Auto-restart: {'Enabled' if AUTO_RESTART else 'Disabled'}")
     if SESSION_MAX_SECONDS > 0:
         print(f"🧼 Scheduled restart: every {SESSION_MAX_SECONDS}s")
@@ -839,6 +696,16 @@ def main():
         if state.global_stop:
             break
 
+        # Planned rung change: restart straight away, it is not a failure
+        rung = state.adaptive.take() if state.adaptive else None
+        if rung:
+            CHOSEN_FPS, VIDEO_BITRATE, VIDEO_MAXRATE, VIDEO_BUFSIZE = rung
+            GOP_SIZE = CHOSEN_FPS * 4
+            print(f"🎚 Adaptive: restarting at {CHOSEN_FPS}fps, {VIDEO_BITRATE} ({state.adaptive.reason})")
+            STATUS.update(state="adapting", fps=CHOSEN_FPS, bitrate=VIDEO_BITRATE,
+                          rung=state.adaptive.index)
+            continue
+
         if not AUTO_RESTART or not do_restart:
             print("🛑 Streaming stopped (restart not requested or auto-restart disabled).")
             break
@@ -850,6 +717,9 @@ def main():
         else:
             state.restart_count = 1
         state.last_restart_time = now
+        state.total_restarts += 1
+        SESSION_RESTARTS.inc()
+        STATUS.update(state="restarting", restarts=state.total_restarts)
 
         if state.restart_count > MAX_RESTART_ATTEMPTS:
             print(f"❌ Max restart attempts ({MAX_RESTART_ATTEMPTS}) reached. Giving up.")
@@ -869,6 +739,8 @@ def main():
             while not check_network() and not state.global_stop:
                 time.sleep(5)
 
+    STATUS.update(state="stopped")
+    watcher_stop.set()
     print("👋 Streamer shut down completely.")
 
 
@@ -1,13 +1,26 @@
 #!/usr/bin/env python3
 import os
 import time
-import random
 import socket
 import threading
 import subprocess
 from pathlib import Path
 from typing import List, Optional
 
+from lofistream.adaptive import Rung
+from lofistream.audio import Crossfade
+from lofistream.core import (Overlays, choose_stream_params, ffmpeg_command, make_feeder,
+                             start_h264_camera, stop_h264_camera)
+from lofistream.library import TrackLibrary
+from lofistream.metrics import REGISTRY, TRACK_CHANGES, register_audio
+from lofistream.nowplaying import CURRENT_TRACK_FILE, RUNTIME_DIR, NowPlayingPublisher
+from lofistream.profiles import load_profile, resolve_profile
+from lofistream.sprites import SPRITES_AVAILABLE, TextSprite
+from lofistream.status import StatusPublisher
+from lofistream.telemetry import FFmpegTelemetry, start_reader
+from lofistream.visualiser import VISUALISER_AVAILABLE, Visualiser
+from lofistream.watcher import PlaylistWatcher
+
 # ======================================================================
 #  LOFI STREAMER v8.7.9
 # ======================================================================
@@ -47,8 +60,19 @@ TEXT_PADDING = 40
 CAM_FIFO = Path("/tmp/camfifo.ts")
 AUDIO_FIFO = Path("/tmp/lofi_audio.pcm")
 
-NOWPLAYING_FILE = Path("/tmp/nowplaying.txt")
-CURRENT_TRACK_FILE = Path("/tmp/current_track.txt")   # ← Dashboard file
+# Overlay files go to tmpfs when available; CURRENT_TRACK_FILE is the dashboard's
+NOWPLAYING = NowPlayingPublisher()
+NOWPLAYING_FILE = RUNTIME_DIR / "nowplaying.txt"    # drawtext fallback (no Pillow)
+
+# Now playing is rendered once per track into a PNG that ffmpeg overlays,
+# instead of drawtext re-reading a text file on every frame. Fixed canvas
+# (right-aligned text, clear of the visualiser) so ffmpeg never reconfigures.
+NOWPLAYING_SPRITE = TextSprite(
+    RUNTIME_DIR / "nowplaying.png", (OUTPUT_W - 2 * TEXT_PADDING - 180, 34), align="right",
+) if SPRITES_AVAILABLE else None
+
+# Structured state for the dashboard (Unix datagram socket, fire-and-forget)
+STATUS = StatusPublisher(VERSION)
 
 CHOSEN_FPS: Optional[int] = None
 GOP_SIZE: Optional[int] = None
@@ -59,16 +83,8 @@ VIDEO_MAXRATE = "1800k"
 VIDEO_BUFSIZE = "2400k"
 
 # -------------------------------------------------------
-# Picamera2 Imports
+# Optional Imports (Picamera2 lives in lofistream.core)
 # -------------------------------------------------------
-try:
-    from picamera2 import Picamera2
-    from picamera2.encoders import H264Encoder
-    from picamera2.outputs import FileOutput
-    PICAMERA2_AVAILABLE = True
-except ImportError:
-    PICAMERA2_AVAILABLE = False
-
 try:
     import psutil
     PSUTIL_AVAILABLE = True
@@ -113,6 +129,8 @@ def _env_bool(name, default=False):
 # DIRS
 # -------------------------------------------------------
 PLAYLIST_DIR = _env_path("LOFI_PLAYLIST_DIR", BASE_DIR / "Sounds")
+TRACK_INDEX_FILE = _env_path("LOFI_TRACK_INDEX", BASE_DIR / "track_index.db")
+ANALYSIS_CSV = _env_path("LOFI_ANALYSIS_CSV", BASE_DIR / "track_analysis.csv")
 LOGO_DIR = _env_path("LOFI_BRAND_DIR", BASE_DIR / "Logo")
 
 STREAM_URL_FILE = _env_path("LOFI_STREAM_URL_FILE", BASE_DIR / "stream_url.txt")
@@ -120,6 +138,13 @@ STREAM_URL_ENV = os.environ.get("LOFI_YOUTUBE_URL", "")
 
 FFMPEG_LOGO = _env_path("LOFI_BRAND_IMAGE", LOGO_DIR / "picam.png")
 
+# Pipeline profile (LOFI_PROFILE: auto | pi4-safe | pi5-quality | headless | lts):
+# encoder, overlay layout and visualiser. LOFI_ENCODER / LOFI_VIZ still override.
+PROFILE = load_profile("auto")
+
+VIZ_FIFO = Path("/tmp/lofi_viz.rgba")
+VISUALISER = None
+
 FALLBACK_FPS = _env_int("LOFI_FALLBACK_FPS", 25)
 
 CHECK_HOST = os.environ.get("LOFI_CHECK_HOST", "a.rtmp.youtube.com")
@@ -127,6 +152,11 @@ CHECK_PORT = _env_int("LOFI_CHECK_PORT", 1935)
 
 SKIP_NETWORK_CHECK = _env_bool("LOFI_SKIP_NETWORK_CHECK")
 
+# Track transitions: 0 = hard cut, N = N-second equal-power crossfade.
+# LOFI_CROSSFADE_BEATS snaps the overlap to whole beats when BPM is known.
+CROSSFADE_SECONDS = _env_int("LOFI_CROSSFADE_SECONDS", 0)
+CROSSFADE_BEATS = _env_int("LOFI_CROSSFADE_BEATS", 0)
+
 
 # -------------------------------------------------------
 # NETWORK CHECK
@@ -173,53 +203,6 @@ def wait_for_pi_ready():
     print("✅ Pi Ready!\n")
 
 
-# -------------------------------------------------------
-# PI MODEL + PARAM SELECTION
-# -------------------------------------------------------
-def detect_pi_model():
-    try:
-        with open("/proc/device-tree/model") as f:
-            m = f.read().lower()
-            if "raspberry pi 5" in m: return 5
-            if "raspberry pi 4" in m: return 4
-    except:
-        pass
-    return 0
-
-
-def choose_stream_params():
-    """Pick FPS + bitrate based on Pi model + startup load."""
-    model = detect_pi_model()
-
-    fps = FALLBACK_FPS
-    bitrate = "1800k"
-    maxrate = "1800k"
-    bufsize = "2400k"
-
-    if model == 5:
-        fps = 30
-        bitrate = "2500k"
-        maxrate = "3000k"
-        bufsize = "4000k"
-
-    elif model == 4:
-        fps = 20
-        bitrate = "1500k"
-        maxrate = "1800k"
-        bufsize = "2400k"
-
-    if PSUTIL_AVAILABLE:
-        load = psutil.cpu_percent(interval=1.0)
-        print(f"🧠 Startup CPU load: {load:.1f}%")
-        if load > 85:
-            print("⚠️ High startup CPU — tuning safer parameters")
-            fps = max(15, fps - 5)
-
-    print(f"🎞 Auto-selected FPS: {fps}")
-    print(f"📺 Video bitrate: {bitrate}, maxrate: {maxrate}, bufsize: {bufsize}")
-    return fps, bitrate, maxrate, bufsize
-
-
 # -------------------------------------------------------
 # TRACK HANDLING
 # -------------------------------------------------------
@@ -240,6 +223,11 @@ def _is_valid_audio(t: Path):
     return t.suffix.lower() in [".mp3", ".wav", ".flac", ".m4a"]
 
 
+# Loaded once, then kept in sync incrementally (no per-track tag parsing)
+LIBRARY = TrackLibrary(PLAYLIST_DIR, TRACK_INDEX_FILE,
+                       is_valid=_is_valid_audio, analysis_csv=ANALYSIS_CSV)
+
+
 def load_tracks() -> List[Path]:
     if not PLAYLIST_DIR.exists():
         print(f"❌ Playlist directory missing: {PLAYLIST_DIR}")
@@ -255,21 +243,20 @@ def load_tracks() -> List[Path]:
         return []
 
     try:
-        tracks = [t for t in PLAYLIST_DIR.iterdir() if _is_valid_audio(t)]
+        LIBRARY.sync()
     except Exception as e:
         print(f"❌ Failed to read playlist directory: {e}")
         return []
 
+    tracks = LIBRARY.tracks()
+
     print(f"🎶 Loaded {len(tracks)} tracks.")
     return tracks
 
 
-def _playlist_iterator(tracks):
-    while True:
-        lst = list(tracks)
-        random.shuffle(lst)
-        for t in lst:
-            yield t
+def _playlist_iterator(stop_event):
+    # Live shuffle: the folder watcher adds/removes entries as files change
+    yield from LIBRARY.shuffled(stop_event)
 
 # -------------------------------------------------------
 # NOW PLAYING (dual file writing)
@@ -279,157 +266,73 @@ def _escape(s: str):
 
 
 def get_nowplaying(t: Path):
-    try:
-        import mutagen
-        m = mutagen.File(t, easy=True)
-        title = m.get("title", [""])[0]
-        artist = m.get("artist", [""])[0]
-        if not title:
-            title = t.stem
-    except:
-        title = t.stem
-        artist = ""
-
-    return _escape(f"{artist} - {title}" if artist else title)
+    info = LIBRARY.lookup(t)   # indexed tags; parsed only if the file is new/changed
+    return _escape(info.label if info else t.stem)
 
 
 def write_nowplaying(txt):
-    """Write now playing info to BOTH overlay + dashboard files."""
-    NOWPLAYING_FILE.write_text(f"Now Playing: {txt}")
-    CURRENT_TRACK_FILE.write_text(txt)     # ← Dashboard compatibility
-
-
-# -------------------------------------------------------
-# FILTER CHAIN (timestamp + logo + viz)
-# -------------------------------------------------------
-def _build_filter_chain(video_ref: str) -> str:
-    viz_w = 140
-    viz_h = 28
-
-    np_file = str(NOWPLAYING_FILE)
-
-    text_y = OUTPUT_H - viz_h - 30
-    viz_y = text_y
-    viz_x = 40
-
-    timestamp = (
-        f"drawtext=text='%{{localtime}}':"
-        f"x={LOGO_PADDING}:y={LOGO_PADDING}:"
-        "fontsize=24:fontcolor=white:borderw=2"
-    )
-
-    viz = (
-        f"[1:a]showfreqs=mode=bar:ascale=log:colors=0xCCCCCC:"
-        f"size={viz_w}x{viz_h}[viz];"
-    )
-
-    logo_x = f"W-w-{LOGO_PADDING}"
-    logo_y = LOGO_PADDING
-
-    if FFMPEG_LOGO.exists():
-        return (
-            viz +
-            f"{video_ref}scale={OUTPUT_W}:{OUTPUT_H},format=yuv420p[v0];"
-            f"[v0]{timestamp}[v1];"
-            f"[v1][2:v]overlay={logo_x}:{logo_y}[v2];"
-            f"[v2][viz]overlay={viz_x}:{viz_y}[v3];"
-            f"[v3]drawtext=textfile='{np_file}':reload=1:fontcolor=white:"
-            f"fontsize=24:x=w-tw-{TEXT_PADDING}:y={text_y}[vout]"
-        )
-
-    return (
-        viz +
-        f"{video_ref}scale={OUTPUT_W}:{OUTPUT_H},format=yuv420p[v0];"
-        f"[v0]{timestamp}[v1];"
-        f"[v1][viz]overlay={viz_x}:{viz_y}[v2];"
-        f"[v2]drawtext=textfile='{np_file}':reload=1:fontcolor=white:"
-        f"fontsize=24:x=w-tw-{TEXT_PADDING}:y={text_y}[vout]"
-    )
+    """Update the now playing overlay + dashboard file."""
+    if NOWPLAYING_SPRITE:
+        NOWPLAYING_SPRITE.show(f"Now Playing: {txt.replace(chr(92) + ':', ':')}")
+    else:
+        NOWPLAYING.write(NOWPLAYING_FILE, f"Now Playing: {txt}")
+    NOWPLAYING.write(CURRENT_TRACK_FILE, txt)     # ← Dashboard compatibility
 
 
 # -------------------------------------------------------
 # CAMERA
 # -------------------------------------------------------
 def start_camera():
-    if not PICAMERA2_AVAILABLE:
-        print("❌ Picamera2 not installed.")
-        return None
-
-    fps = CHOSEN_FPS
-
-    print("📸 Initialising Picamera2…")
-    picam = Picamera2()
-
-    config = picam.create_video_configuration(
-        main={"format": "YUV420", "size": (OUTPUT_W, OUTPUT_H)},
-        controls={"FrameRate": fps}
-    )
-    picam.configure(config)
-
-    # Convert "1500k" to integer bitrate
-    def _br_to_int(br: str) -> int:
-        if br.endswith("k"):
-            return int(br[:-1]) * 1000
-        return int(br)
-
-    encoder = H264Encoder(bitrate=_br_to_int(VIDEO_BITRATE))
-    out = FileOutput(str(CAM_FIFO))
-
-    try:
-        picam.start_recording(encoder, out)
-    except Exception as e:
-        print("❌ Failed to start camera:", e)
-        return None
-
-    print(f"📸 Picamera2 (H264 Baseline {fps}fps, {VIDEO_BITRATE}) → {CAM_FIFO}")
-    return picam
+    return start_h264_camera(CAM_FIFO, CHOSEN_FPS, VIDEO_BITRATE, GOP_SIZE or CHOSEN_FPS * 4,
+                             PROFILE.encoder, (OUTPUT_W, OUTPUT_H))
 
 
 def stop_camera(picam):
-    if not picam:
-        return
-    print("📷 Stopping Picamera2…")
-    try:
-        picam.stop_recording()
-    except:
-        pass
-    try:
-        picam.close()
-    except:
-        pass
+    stop_h264_camera(picam)
 
 
 # -------------------------------------------------------
 # AUDIO FEEDER
 # -------------------------------------------------------
-def audio_feeder(tracks, stop_event):
-    print("🎚 Audio feeder started.")
+def _on_track(t: Path, np: str):
+    print(f"🎧 {np}")
+    write_nowplaying(np)   # Dual-write
+    STATUS.update(now_playing=np, track=t.name)
+    TRACK_CHANGES.inc()
 
-    with open(AUDIO_FIFO, "wb", buffering=0) as fd:
-        for t in _playlist_iterator(tracks):
 
-            if stop_event.is_set(): break
-
-            np = get_nowplaying(t)
-            print(f"🎧 {np}")
-            write_nowplaying(np)   # Dual-write
+def audio_feeder(stop_event):
+    print("🎚 Audio feeder started.")
 
-            cmd = [
-                "ffmpeg", "-hide_banner", "-loglevel", "error",
-                "-re", "-vn", "-i", str(t),
-                "-f", "s16le", "-ar", "44100", "-ac", "2", "pipe:1"
-            ]
-            p = subprocess.Popen(cmd, stdout=fd)
+    # Gapless engine: tracks are decoded ahead, PCM paced by the monotonic clock
+    engine = make_feeder(
+        PROFILE, _playlist_iterator(stop_event), AUDIO_FIFO,
+        describe=get_nowplaying, on_track=_on_track,
+        crossfade=Crossfade(CROSSFADE_SECONDS, CROSSFADE_BEATS, bpm_for=LIBRARY.bpm),
+        tap=VISUALISER.feed if VISUALISER else None,
+    )
+    STATUS.provide("audio", engine.stats)
+    register_audio(engine)
+    engine.run(stop_event)
 
-            while p.poll() is None and not stop_event.is_set():
-                time.sleep(0.5)
+    print("🎚 Audio feeder stopped.")
 
-            if stop_event.is_set():
-                try: p.terminate()
-                except: pass
-                break
 
-    print("🎚 Audio feeder stopped.")
+# -------------------------------------------------------
+# VISUALISER
+# -------------------------------------------------------
+def start_visualiser(stop_event: threading.Event):
+    """Bars from the audio engine's own PCM (LOFI_VIZ=numpy) instead of showfreqs."""
+    global VISUALISER
+    if PROFILE.visualiser != "numpy":
+        return
+    # Created once: the writer reconnects to every ffmpeg session through it
+    if VIZ_FIFO.exists():
+        os.unlink(VIZ_FIFO)
+    os.mkfifo(VIZ_FIFO)
+    VISUALISER = Visualiser(VIZ_FIFO, CHOSEN_FPS or 20)
+    VISUALISER.start(stop_event)
+    print(f"📊 Visualiser: in-process, {VISUALISER.spectrum.bands} bands")
 
 
 # -------------------------------------------------------
@@ -439,59 +342,17 @@ def start_pipeline(stream_url: str):
 
     print("🎥 Starting ffmpeg pipeline…")
 
-    g = GOP_SIZE
-
-    cmd = [
-        "ffmpeg", "-hide_banner", "-loglevel", "error",
-
-        "-fflags", "+genpts+discardcorrupt",
-        "-flags", "low_delay",
-
-        "-thread_queue_size", "4096",
-        "-probesize", "64k",
-        "-analyzeduration", "0",
-        "-vsync", "1",
-        "-use_wallclock_as_timestamps", "1",
-
-        "-f", "h264", "-i", str(CAM_FIFO),
-
-        "-thread_queue_size", "4096",
-        "-f", "s16le", "-ar", "44100", "-ac", "2", "-i", str(AUDIO_FIFO),
-    ]
-
-    if FFMPEG_LOGO.exists():
-        cmd += ["-loop", "1", "-i", str(FFMPEG_LOGO)]
-
-    filter_chain = _build_filter_chain("[0:v]")
-
-    cmd += [
-        "-filter_complex", filter_chain,
-        "-map", "[vout]", "-map", "1:a",
-
-        "-c:v", "libx264",
-        "-preset", "veryfast",
-        "-tune", "zerolatency",
-        "-profile:v", "baseline",
-        "-level", "3.1",
-
-        "-b:v", VIDEO_BITRATE,
-        "-maxrate", VIDEO_MAXRATE,
-        "-bufsize", VIDEO_BUFSIZE,
+    if NOWPLAYING_SPRITE:
+        NOWPLAYING_SPRITE.show(NOWPLAYING_SPRITE.current or "")   # must exist before ffmpeg opens it
 
-        "-g", str(g),
-        "-keyint_min", str(g),
-        "-sc_threshold", "0",
-
-        "-pix_fmt", "yuv420p",
-
-        "-c:a", "aac",
-        "-b:a", "128k",
-        "-ar", "44100",
-
-        "-f", "flv", stream_url
-    ]
-
-    return subprocess.Popen(cmd)
+    cmd = ffmpeg_command(
+        PROFILE, stream_url, ["-f", "h264", "-i", str(CAM_FIFO)], AUDIO_FIFO,
+        Rung(CHOSEN_FPS, VIDEO_BITRATE, VIDEO_MAXRATE, VIDEO_BUFSIZE), GOP_SIZE,
+        Overlays(logo=FFMPEG_LOGO, text=NOWPLAYING_SPRITE, text_file=NOWPLAYING_FILE,
+                 visualiser=VISUALISER),
+        size=(OUTPUT_W, OUTPUT_H),
+    )
+    return subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, bufsize=1)
 
 
 # -------------------------------------------------------
@@ -499,7 +360,7 @@ def start_pipeline(stream_url: str):
 # -------------------------------------------------------
 def main():
     global CHOSEN_FPS, GOP_SIZE
-    global VIDEO_BITRATE, VIDEO_MAXRATE, VIDEO_BUFSIZE
+    global VIDEO_BITRATE, VIDEO_MAXRATE, VIDEO_BUFSIZE, PROFILE
 
     print(f"🌙 LOFI STREAMER v{VERSION} — Dashboard Compatible\n")
 
@@ -511,9 +372,14 @@ def main():
 
     tracks = load_tracks()
     if not tracks:
-        return
+        print("⚠️ No tracks yet — streaming will pick up music as soon as it lands.")
+
+    PROFILE = resolve_profile(PROFILE, raw_camera=False, numpy=VISUALISER_AVAILABLE)
+    print(f"🎛 Profile: {PROFILE.name} — {PROFILE.encoder}, overlays {PROFILE.layout}, "
+          f"visualiser {PROFILE.visualiser}, audio {PROFILE.feeder}")
 
-    CHOSEN_FPS, VIDEO_BITRATE, VIDEO_MAXRATE, VIDEO_BUFSIZE = choose_stream_params()
+    CHOSEN_FPS, VIDEO_BITRATE, VIDEO_MAXRATE, VIDEO_BUFSIZE = choose_stream_params(
+        PROFILE, FALLBACK_FPS, VIDEO_BITRATE)
     GOP_SIZE = CHOSEN_FPS * 4
 
     print(f"🎞 Final FPS: {CHOSEN_FPS}, GOP: {GOP_SIZE}")
@@ -530,17 +396,30 @@ def main():
 
     stop_event = threading.Event()
 
+    PlaylistWatcher(LIBRARY).start(stop_event)
+    STATUS.update(state="streaming", fps=CHOSEN_FPS, bitrate=VIDEO_BITRATE, encoder=PROFILE.encoder,
+                  profile=PROFILE.name)
+    STATUS.provide("metrics", REGISTRY.collect)
+    STATUS.start(stop_event)
+
+    start_visualiser(stop_event)    # its FIFO writer must be waiting before ffmpeg opens inputs
     ff = start_pipeline(stream_url)
+    tel = FFmpegTelemetry()
+    start_reader(ff, tel, stop_event, echo="all")
+    STATUS.provide("ffmpeg", tel.status)
+    tel.register_metrics()
+
     picam = start_camera()
     if not picam:
         ff.terminate()
         return
 
     audio_thread = threading.Thread(
-        target=audio_feeder, args=(tracks, stop_event), daemon=True
+        target=audio_feeder, args=(stop_event,), daemon=True
     )
     audio_thread.start()
 
+    last_issues = set()
     try:
         while True:
             if ff.poll() is not None:
@@ -550,6 +429,11 @@ def main():
             if PSUTIL_AVAILABLE:
                 print(f"🧠 CPU {psutil.cpu_percent():.1f}%")
 
+            issues = tel.warnings()
+            if issues.keys() - last_issues:
+                print(f"⚠️ FFmpeg: {'; '.join(issues.values())}")
+            last_issues = issues.keys()
+
             time.sleep(0.5)
 
     except KeyboardInterrupt:
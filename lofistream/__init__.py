@@ -0,0 +1,23 @@
+"""
+lofistream — shared building blocks for the Lofi Streamer builds.
+
+Lives next to the streamer scripts (LofiStream/Servers/lofistream/) so
+`import lofistream` works from lofi-streamer.py, the RC builds and LTS
+without any packaging step.
+
+    adaptive bitrate/fps ladder driven by encoder telemetry
+    audio    gapless PCM engine that owns AUDIO_FIFO
+    compositor raw YUV frame ring + in-process overlay blending
+    core     camera, ffmpeg command and audio feeder shared by every build
+    encoders LOFI_ENCODER modes: libx264, h264_v4l2m2m, copy
+    library  persistent track metadata index + in-memory playlist
+    metrics  Prometheus-style counters/gauges published over status
+    nowplaying atomic, change-only now-playing/overlay files (tmpfs)
+    profiles LOFI_PROFILE pipeline profiles: pi4-safe, pi5-quality, headless, lts
+    sprites  now-playing text pre-rendered to PNG overlays, swapped on change
+    splice   zero-copy feeder: os.splice decoder pipe → AUDIO_FIFO
+    status   JSON datagram status channel to the dashboard
+    telemetry  ffmpeg -progress parser (samples, rates, moving averages)
+    visualiser NumPy FFT bars from the engine's PCM, as a rawvideo overlay
+    watcher  inotify (or polling) updates for the live playlist
+"""
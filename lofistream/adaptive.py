@@ -0,0 +1,171 @@
+"""
+Closed-loop bitrate / fps ladder.
+
+choose_stream_params() picks the top rung once at start-up; after that the
+watchdog feeds this controller every tick with the telemetry moving
+averages, CPU load and SoC temperature. Sustained trouble steps one rung
+down, a long clean stretch steps one rung back up (never above the start
+rung). Neither libx264 nor the Picamera2 encoder can be retuned inside a
+running ffmpeg, so a change is applied by a graceful session restart: the
+caller stops the session, take() hands back the new rung, and the next
+session starts with it.
+
+Classification of "trouble":
+
+    hot          SoC temperature at or over HOT_C
+    dropping     averaged dropped frames/s over DROP_RATE_BAD
+    cpu-bound    per-interval speed under SLOW_SPEED while the CPU is saturated
+    backpressure per-interval speed under SLOW_SPEED with CPU to spare — ffmpeg is
+                 blocked writing to RTMP, i.e. the uplink is congested
+"""
+
+import time
+from pathlib import Path
+from typing import List, NamedTuple, Optional
+
+from .metrics import REGISTRY
+
+THERMAL_ZONE = Path("/sys/class/thermal/thermal_zone0/temp")
+
+HOT_C = 80.0            # Pi 4 firmware starts soft throttling here
+COOL_C = 72.0           # must be below this to step back up
+SLOW_SPEED = 0.95
+DROP_RATE_BAD = 1.0
+CPU_SATURATED = 90.0
+CPU_HEADROOM = 75.0
+
+DOWN_TICKS = 3          # consecutive bad watchdog ticks before stepping down
+SETTLE_SECONDS = 60     # ignore a fresh session while its averages fill up
+UP_AFTER = 15 * 60      # clean seconds before trying the next rung up
+UP_AFTER_MAX = 4 * 3600
+
+# (bitrate multiplier, fps multiplier) relative to the start rung
+LADDER_STEPS = [(1.0, 1.0), (0.75, 1.0), (0.6, 0.75), (0.45, 0.75), (0.35, 0.5)]
+MIN_FPS = 10
+
+
+class Rung(NamedTuple):
+    fps: int
+    bitrate: str
+    maxrate: str
+    bufsize: str
+
+
+def _kbps(value: str) -> int:
+    value = value.strip().lower()
+    if value.endswith("k"):
+        return int(float(value[:-1]))
+    if value.endswith("m"):
+        return int(float(value[:-1]) * 1000)
+    return int(value) // 1000
+
+
+def build_ladder(fps: int, bitrate: str, maxrate: str, bufsize: str) -> List[Rung]:
+    """Start rung as chosen at start-up, then progressively cheaper ones."""
+    kb, max_kb, buf_kb = _kbps(bitrate), _kbps(maxrate), _kbps(bufsize)
+    ladder = []
+    for b_mul, f_mul in LADDER_STEPS:
+        rung = Rung(
+            fps=max(MIN_FPS, int(round(fps * f_mul))),
+            bitrate=f"{int(kb * b_mul)}k",
+            maxrate=f"{int(max_kb * b_mul)}k",
+            bufsize=f"{int(buf_kb * b_mul)}k",
+        )
+        if rung not in ladder:
+            ladder.append(rung)
+    return ladder
+
+
+def read_temp() -> Optional[float]:
+    try:
+        return int(THERMAL_ZONE.read_text()) / 1000.0
+    except (OSError, ValueError):
+        return None
+
+
+class AdaptiveController:
+    def __init__(self, ladder: List[Rung]):
+        self.ladder = ladder
+        self.index = 0
+        self.pending: Optional[int] = None
+        self.reason = ""
+        self.bad_ticks = 0
+        self.good_since: Optional[float] = None
+        self.up_after = UP_AFTER
+        self.session_started = time.monotonic()
+        REGISTRY.gauge("lofi_adaptive_rung", "Current ladder rung (0 = full quality)",
+                       fn=lambda: self.index)
+        REGISTRY.gauge("lofi_adaptive_bitrate_kbps", "Video bitrate of the current rung",
+                       fn=lambda: _kbps(self.rung.bitrate))
+
+    @property
+    def rung(self) -> Rung:
+        return self.ladder[self.index]
+
+    def session_start(self):
+        self.session_started = time.monotonic()
+        self.bad_ticks = 0
+        self.good_since = None
+
+    def trouble(self, avg: dict, temp: Optional[float], cpu: Optional[float]) -> str:
+        if temp is not None and temp >= HOT_C:
+            return f"hot ({temp:.0f}°C)"
+        if not avg:
+            return ""
+        if avg["drop_rate"] > DROP_RATE_BAD:
+            return f"dropping {avg['drop_rate']:.1f} frames/s"
+        if avg["speed_rate"] < SLOW_SPEED:
+            if cpu is not None and cpu >= CPU_SATURATED:
+                return f"cpu-bound (speed {avg['speed_rate']:.2f}x, CPU {cpu:.0f}%)"
+            return f"backpressure (speed {avg['speed_rate']:.2f}x, sending {avg['send_kbps']:.0f} kbit/s)"
+        return ""
+
+    def observe(self, avg: dict, temp: Optional[float] = None,
+                cpu: Optional[float] = None) -> Optional[str]:
+        """
+        One watchdog tick. Returns a message when a rung change is due;
+        the caller then restarts the session and picks it up via take().
+        """
+        now = time.monotonic()
+        if self.pending is not None or now - self.session_started < SETTLE_SECONDS:
+            return None
+
+        problem = self.trouble(avg, temp, cpu)
+        if problem:
+            self.good_since = None
+            self.bad_ticks += 1
+            if self.bad_ticks >= DOWN_TICKS and self.index < len(self.ladder) - 1:
+                self.pending = self.index + 1
+                self.reason = problem
+                # Each step down makes the next step up more patient
+                self.up_after = min(self.up_after * 2, UP_AFTER_MAX)
+                return f"stepping down to {self._describe(self.pending)}: {problem}"
+            return None
+
+        self.bad_ticks = 0
+        healthy = (
+            avg and avg["speed_rate"] >= 0.99 and avg["drop_rate"] < 0.1
+            and (temp is None or temp < COOL_C)
+            and (cpu is None or cpu < CPU_HEADROOM)
+        )
+        if not healthy or self.index == 0:
+            self.good_since = None
+            return None
+        if self.good_since is None:
+            self.good_since = now
+        if now - self.good_since >= self.up_after:
+            self.pending = self.index - 1
+            self.reason = f"stable for {self.up_after // 60:.0f} min"
+            return f"stepping up to {self._describe(self.pending)}: {self.reason}"
+        return None
+
+    def take(self) -> Optional[Rung]:
+        """The rung to restart with, if observe() asked for a change."""
+        if self.pending is None:
+            return None
+        self.index, self.pending = self.pending, None
+        return self.rung
+
+    def _describe(self, index: int) -> str:
+        r = self.ladder[index]
+        return f"rung {index} ({r.fps}fps, {r.bitrate})"
@@ -0,0 +1,506 @@
+"""
+Gapless PCM audio engine.
+
+One long-lived writer owns AUDIO_FIFO and emits steady s16le blocks paced
+by the monotonic clock (no `ffmpeg -re`). Tracks are decoded ahead of time
+into per-track ring buffers, so a track change is a switch between two
+buffers that are already full: no process start, probe or gap on the
+boundary, and the main encoder sees one continuous audio stream.
+
+An optional Crossfade stage (NumPy) blends the tail of one track into the
+head of the next on the same PCM blocks before they reach the FIFO.
+"""
+
+import math
+import time
+import queue
+import threading
+import subprocess
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+SAMPLE_RATE = 44100
+CHANNELS = 2
+FRAME_BYTES = CHANNELS * 2              # s16le
+BYTE_RATE = SAMPLE_RATE * FRAME_BYTES
+
+BLOCK_MS = 20                           # one FIFO write = 20 ms of audio
+PREBUFFER_SECONDS = 8.0                 # decoded-ahead audio per track
+WRITE_LEAD_SECONDS = 0.25               # how far ahead of real time we run
+
+
+# -------------------------------------------------------
+# RING BUFFER
+# -------------------------------------------------------
+class PcmRing:
+    """Fixed-size byte ring: one producer (decoder), one consumer (writer)."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._buf = bytearray(capacity)
+        self._view = memoryview(self._buf)
+        self._head = 0
+        self._size = 0
+        self.closed = False
+        self._cond = threading.Condition()
+
+    @property
+    def available(self) -> int:
+        return self._size
+
+    def write(self, data) -> bool:
+        """Copy data in, blocking while full. Returns False once closed."""
+        mv = memoryview(data)
+        while len(mv):
+            with self._cond:
+                while self._size == self.capacity and not self.closed:
+                    self._cond.wait(0.5)
+                if self.closed:
+                    return False
+                tail = (self._head + self._size) % self.capacity
+                n = min(len(mv), self.capacity - self._size, self.capacity - tail)
+                self._view[tail:tail + n] = mv[:n]
+                self._size += n
+            mv = mv[n:]
+        return True
+
+    def read_into(self, out: memoryview) -> int:
+        """Copy up to len(out) bytes out without blocking; returns the count."""
+        with self._cond:
+            n = min(len(out), self._size)
+            first = min(n, self.capacity - self._head)
+            out[:first] = self._view[self._head:self._head + first]
+            if n > first:
+                out[first:n] = self._view[:n - first]
+            self._head = (self._head + n) % self.capacity
+            self._size -= n
+            if n:
+                self._cond.notify()
+        return n
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+# -------------------------------------------------------
+# TRACK STREAM (one decoder, decoding ahead)
+# -------------------------------------------------------
+class TrackStream:
+    """A track decoded by plain ffmpeg (no -re) into its own ring buffer."""
+
+    def __init__(self, track: Path, capacity: int, label: str = ""):
+        self.track = track
+        self.label = label or track.stem
+        self.ring = PcmRing(capacity)
+        self.decoded = threading.Event()
+        self.total_bytes = 0
+        self.announced = False
+        self.fade_bytes = 0
+        self._proc: Optional[subprocess.Popen] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.decoded.is_set() and self.ring.available == 0
+
+    def start(self):
+        threading.Thread(target=self._decode, daemon=True).start()
+
+    def _decode(self):
+        cmd = [
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-nostdin",
+            "-vn", "-i", str(self.track),
+            "-f", "s16le", "-ar", str(SAMPLE_RATE), "-ac", str(CHANNELS), "pipe:1"
+        ]
+        try:
+            if self.ring.closed:
+                return
+            self._proc = subprocess.Popen(
+                cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0
+            )
+            chunk = bytearray(65536)
+            view = memoryview(chunk)
+            while True:
+                n = self._proc.stdout.readinto(chunk)
+                if not n:
+                    break
+                if not self.ring.write(view[:n]):
+                    break
+                self.total_bytes += n
+            rc = self._proc.wait()
+            if rc != 0 and not self.ring.closed:
+                print(f"⚠️ Audio decode error for {self.track.name} (ffmpeg rc={rc})")
+        except Exception as e:
+            print(f"❌ Audio decoder error for {self.track.name}: {e}")
+        finally:
+            self.decoded.set()
+
+    def close(self):
+        self.ring.close()
+        p = self._proc
+        if p and p.poll() is None:
+            try:
+                p.terminate()
+                p.wait(timeout=2)
+            except Exception:
+                try:
+                    p.kill()
+                except Exception:
+                    pass
+
+
+# -------------------------------------------------------
+# TRANSITIONS
+# -------------------------------------------------------
+class Crossfade:
+    """
+    Equal-power crossfade between the tail of one track and the next.
+
+    seconds  fixed overlap length
+    beats    if > 0 and bpm_for() knows the outgoing track, the overlap is
+             snapped to that many beats instead (16 = four bars of 4/4)
+    bpm_for  track -> BPM or None
+
+    Mixing runs in place on the engine's output block; every scratch
+    array is allocated once in bind(), so a transition costs a handful of
+    vectorised ops per 20 ms block and nothing at all between transitions.
+    """
+
+    def __init__(self, seconds: float, beats: int = 0,
+                 bpm_for: Optional[Callable[[Path], Optional[float]]] = None):
+        self.seconds = max(0.0, seconds)
+        self.beats = max(0, beats)
+        self.bpm_for = bpm_for
+        self.max_seconds = self.seconds
+
+    def overlap_frames(self, track: Path) -> int:
+        seconds = self.seconds
+        if self.beats and self.bpm_for:
+            try:
+                bpm = self.bpm_for(track)
+            except Exception:
+                bpm = None
+            if bpm and bpm > 0:
+                seconds = self.beats * 60.0 / bpm
+        return int(min(seconds, self.max_seconds) * SAMPLE_RATE)
+
+    def bind(self, block_bytes: int, max_seconds: float):
+        frames = block_bytes // FRAME_BYTES
+        self.max_seconds = max_seconds
+
+        self._in_buf = bytearray(block_bytes)
+        self._in_view = memoryview(self._in_buf)
+        self._in16 = np.frombuffer(self._in_buf, dtype=np.int16).reshape(frames, CHANNELS)
+
+        self._ramp = np.arange(frames, dtype=np.float32)
+        self._phase = np.empty(frames, dtype=np.float32)
+        self._gain_out = np.empty((frames, 1), dtype=np.float32)
+        self._gain_in = np.empty((frames, 1), dtype=np.float32)
+        self._mix = np.empty((frames, CHANNELS), dtype=np.float32)
+        self._tmp = np.empty((frames, CHANNELS), dtype=np.float32)
+
+    def mix(self, out16, pos: int, length: int):
+        """
+        out16 holds the outgoing block (int16 frames), self._in16 the incoming
+        one; blend them in place for frames pos .. pos+block of a fade that
+        is `length` frames long. Past the end the incoming gain stays at 1.
+        """
+        phase = self._phase
+        np.add(self._ramp, pos, out=phase)
+        np.multiply(phase, (math.pi / 2) / length, out=phase)
+        np.minimum(phase, math.pi / 2, out=phase)
+
+        phase2 = phase.reshape(-1, 1)
+        np.cos(phase2, out=self._gain_out)
+        np.sin(phase2, out=self._gain_in)
+
+        np.multiply(out16, self._gain_out, out=self._mix)
+        np.multiply(self._in16, self._gain_in, out=self._tmp)
+        np.add(self._mix, self._tmp, out=self._mix)
+        np.rint(self._mix, out=self._mix)
+        np.clip(self._mix, -32768, 32767, out=self._mix)
+        np.copyto(out16, self._mix, casting="unsafe")
+
+
+# -------------------------------------------------------
+# ENGINE
+# -------------------------------------------------------
+class AudioEngine:
+    """
+    Long-lived feeder for AUDIO_FIFO.
+
+    tracks    iterator of Paths (may block while the playlist is empty)
+    describe  track -> now-playing label; runs on the prefetch thread, so
+              tag parsing never delays the writer
+    on_track  (track, label) callback, fired from the writer thread when the
+              first samples of a track actually go out
+    crossfade optional Crossfade; None (or no NumPy) means hard cuts
+    tap       optional callable given every block as it goes to the FIFO
+              (the in-process visualiser); must be quick, runs on the writer
+    """
+
+    def __init__(self, tracks: Iterator[Path], fifo: Path,
+                 describe: Optional[Callable[[Path], str]] = None,
+                 on_track: Optional[Callable[[Path, str], None]] = None,
+                 crossfade: Optional[Crossfade] = None,
+                 tap: Optional[Callable[[memoryview], None]] = None,
+                 block_ms: int = BLOCK_MS,
+                 prebuffer_seconds: float = PREBUFFER_SECONDS):
+        self.fifo = Path(fifo)
+        self.describe = describe
+        self.on_track = on_track
+        self.tap = tap
+
+        self.block_bytes = SAMPLE_RATE * block_ms // 1000 * FRAME_BYTES
+        self.block_seconds = self.block_bytes / BYTE_RATE
+
+        if crossfade is not None and crossfade.seconds <= 0:
+            crossfade = None
+        if crossfade is not None and not NUMPY_AVAILABLE:
+            print("⚠️ Crossfade needs NumPy (python3-numpy) — using hard cuts")
+            crossfade = None
+        if crossfade is not None:
+            # The whole fade must fit in the outgoing track's ring
+            prebuffer_seconds = max(prebuffer_seconds, crossfade.seconds + 2.0)
+            crossfade.bind(self.block_bytes, prebuffer_seconds - 1.0)
+        self.crossfade = crossfade
+
+        self.capacity = int(prebuffer_seconds * SAMPLE_RATE) * FRAME_BYTES
+
+        self._tracks = tracks
+        self._upcoming: "queue.Queue[TrackStream]" = queue.Queue(maxsize=1)
+        self._current: Optional[TrackStream] = None
+        self._next: Optional[TrackStream] = None
+        self._fade_pos = 0
+        self._fade_len = 0
+        self._silence = bytes(self.block_bytes)
+
+        self._block = bytearray(self.block_bytes)
+        self._out16 = None
+        if self.crossfade is not None:
+            self._out16 = np.frombuffer(self._block, dtype=np.int16).reshape(-1, CHANNELS)
+
+        self.underruns = 0
+        self.tracks_played = 0
+
+    @property
+    def buffer_fill(self) -> float:
+        """Decoded-ahead fill of the playing track, 0.0 – 1.0."""
+        cur = self._current
+        if cur is None:
+            return 0.0
+        return cur.ring.available / cur.ring.capacity
+
+    def stats(self) -> dict:
+        """Snapshot for the status channel."""
+        return {
+            "buffer_fill": round(self.buffer_fill, 3),
+            "underruns": self.underruns,
+            "tracks_played": self.tracks_played,
+        }
+
+    # ---------- threads ----------
+
+    def run(self, stop_event: threading.Event):
+        """Feed AUDIO_FIFO until stop_event is set, reopening it if ffmpeg goes away."""
+        threading.Thread(target=self._prefetch, args=(stop_event,), daemon=True).start()
+
+        try:
+            while not stop_event.is_set():
+                try:
+                    # Blocks until ffmpeg opens the FIFO for reading
+                    with open(self.fifo, "wb", buffering=0) as fifo:
+                        self._pump(fifo, stop_event)
+                except BrokenPipeError:
+                    print("⚠️ Audio FIFO broken pipe — FFmpeg likely restarted. Reopening FIFO...")
+                    time.sleep(1)
+                except FileNotFoundError:
+                    time.sleep(0.5)
+                except OSError as e:
+                    if stop_event.is_set():
+                        break
+                    print(f"❌ Audio FIFO error: {e}")
+                    time.sleep(1)
+        finally:
+            self._shutdown()
+
+    def _prefetch(self, stop_event: threading.Event):
+        for track in self._tracks:
+            if stop_event.is_set():
+                break
+
+            label = track.stem
+            if self.describe:
+                try:
+                    label = self.describe(track)
+                except Exception:
+                    pass
+
+            stream = TrackStream(track, self.capacity, label)
+            if self.crossfade is not None:
+                stream.fade_bytes = self.crossfade.overlap_frames(track) * FRAME_BYTES
+            while not stop_event.is_set():
+                try:
+                    self._upcoming.put(stream, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+            else:
+                break
+
+            stream.start()
+
+    def _pump(self, fifo, stop_event: threading.Event):
+        view = memoryview(self._block)
+
+        started = time.monotonic()
+        sent = 0
+
+        while not stop_event.is_set():
+            self._fill(view)
+            if self.tap is not None:
+                try:
+                    self.tap(view)
+                except Exception as e:
+                    print(f"⚠️ Audio tap failed, disabling it: {e}")
+                    self.tap = None
+
+            out = view
+            while len(out):
+                n = fifo.write(out)
+                out = out[n:]
+            sent += 1
+
+            delay = started + sent * self.block_seconds - WRITE_LEAD_SECONDS - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -1.0:
+                # Reader stalled for a while: rebase the clock instead of bursting
+                started = time.monotonic() - sent * self.block_seconds + WRITE_LEAD_SECONDS
+
+    def _shutdown(self):
+        for stream in (self._current, self._next):
+            if stream:
+                stream.close()
+        self._current = self._next = None
+        self._fade_len = 0
+        while True:
+            try:
+                self._upcoming.get_nowait().close()
+            except queue.Empty:
+                break
+
+    # ---------- mixing ----------
+
+    def _take_next(self) -> Optional[TrackStream]:
+        stream, self._next = self._next, None
+        if stream is None:
+            try:
+                stream = self._upcoming.get_nowait()
+            except queue.Empty:
+                return None
+        return stream
+
+    def _fill(self, out: memoryview):
+        """Fill one block from the playing track, switching tracks mid-block if needed."""
+        if self.crossfade is not None and self._fade_ready():
+            self._fill_crossfade(out)
+            return
+
+        want = len(out)
+        filled = 0
+
+        while filled < want:
+            cur = self._current
+            if cur is None:
+                cur = self._current = self._take_next()
+                if cur is None:
+                    break
+
+            n = cur.ring.read_into(out[filled:])
+            if n and not cur.announced:
+                self._announce(cur)
+            filled += n
+
+            if filled < want and cur.finished:
+                if not cur.total_bytes:
+                    print(f"⚠️ Skipping {cur.track.name} (no audio decoded)")
+                # keep frames aligned if a decoder died mid-sample
+                pad = -filled % FRAME_BYTES
+                out[filled:filled + pad] = self._silence[:pad]
+                filled += pad
+                cur.close()
+                self._current = None
+                continue
+
+            if n == 0:
+                break
+
+        if filled < want:
+            out[filled:] = self._silence[:want - filled]
+            if self.tracks_played:
+                self.underruns += 1
+
+    def _fade_ready(self) -> bool:
+        """True while a crossfade is running, or when one should start now."""
+        if self._fade_len:
+            return True
+
+        cur = self._current
+        if cur is None or not cur.announced or not cur.decoded.is_set():
+            return False
+        remaining = cur.ring.available
+        if not cur.fade_bytes or remaining > cur.fade_bytes or remaining < self.block_bytes:
+            return False
+
+        if self._next is None:
+            try:
+                self._next = self._upcoming.get_nowait()
+            except queue.Empty:
+                return False
+        if self._next.ring.available < self.block_bytes:
+            return False
+
+        # Fade ends exactly where the outgoing track ends
+        self._fade_len = remaining // FRAME_BYTES
+        self._fade_pos = 0
+        return True
+
+    def _fill_crossfade(self, out: memoryview):
+        cf = self.crossfade
+        cur, nxt = self._current, self._next
+        want = len(out)
+
+        n = cur.ring.read_into(out)
+        out[n:] = self._silence[:want - n]
+
+        m = nxt.ring.read_into(cf._in_view)
+        cf._in_view[m:] = self._silence[:want - m]
+        if m < want:
+            self.underruns += 1
+        if m and not nxt.announced:
+            self._announce(nxt)
+
+        cf.mix(self._out16, self._fade_pos, self._fade_len)
+        self._fade_pos += want // FRAME_BYTES
+
+        if cur.finished or self._fade_pos >= self._fade_len:
+            cur.close()
+            self._current, self._next = nxt, None
+            self._fade_len = 0
+
+    def _announce(self, stream: TrackStream):
+        stream.announced = True
+        self.tracks_played += 1
+        if self.on_track:
+            try:
+                self.on_track(stream.track, stream.label)
+            except Exception as e:
+                print(f"⚠️ Track callback failed: {e}")
@@ -0,0 +1,414 @@
+"""
+Raw-frame camera path with in-process overlay compositing.
+
+The default pipeline has Picamera2 encode H.264 only for ffmpeg to decode
+it again to draw a clock, logo and now-playing text. In raw mode
+(LOFI_CAMERA_MODE=raw) the camera instead hands YUV420 frames to a
+shared-memory FrameRing; the compositor blends pre-rendered overlay
+sprites into each frame in place — touching only the sprite rectangles —
+and writes it to CAM_FIFO as rawvideo. ffmpeg then runs a single encode
+with no decode and no drawtext.
+
+    ring = FrameRing(1280, 720)
+    source = PicameraSource(ring, fps)        # or TestPatternSource
+    comp = Compositor(ring, fps, logo=..., font=...)
+    comp.now_playing = "Artist - Title"       # re-rendered once, then cached
+    comp.start(CAM_FIFO, stop_event)
+
+Sprites are rendered with Pillow into per-plane arrays (Y at full size,
+U/V and alpha at 2x2-subsampled size) with premultiplied colour, so the
+per-frame blend is two integer multiply-adds per touched pixel. Without
+Pillow the frames go out clean and a warning says so.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Optional, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+from .sprites import FONT_SIZE, SPRITE_CACHE, render_text
+
+RING_SLOTS = 4
+
+
+# -------------------------------------------------------
+# FRAME RING
+# -------------------------------------------------------
+class FrameRing:
+    """
+    Fixed ring of I420 frames in one SharedMemory block. One producer
+    (camera), one consumer (compositor). The consumer always takes the
+    newest frame and holds it while compositing; the producer never writes
+    into the held slot, so a slow consumer drops frames instead of tearing.
+    """
+
+    def __init__(self, width: int, height: int, slots: int = RING_SLOTS):
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("raw camera mode needs numpy (sudo apt install python3-numpy)")
+        self.width = width
+        self.height = height
+        self.frame_bytes = width * height * 3 // 2
+        self.slots = slots
+        self.shm = shared_memory.SharedMemory(create=True, size=self.frame_bytes * slots)
+        # ndarray over shm.buf: no per-frame allocation anywhere in the path
+        self.frames = np.ndarray((slots, self.frame_bytes), dtype=np.uint8, buffer=self.shm.buf)
+        self.seq = 0
+        self._latest = -1
+        self._held = -1
+        self._next = 0
+        self._writing = 0
+        self._consumed = 0
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    # ---------- producer ----------
+
+    def slot_for_write(self) -> np.ndarray:
+        with self._cond:
+            slot = self._next
+            if slot == self._held:
+                slot = (slot + 1) % self.slots
+            self._writing = slot
+            return self.frames[slot]
+
+    def commit(self):
+        with self._cond:
+            if self._consumed < self.seq:
+                self.dropped += 1       # previous frame never got picked up
+            self._latest = self._writing
+            self._next = (self._writing + 1) % self.slots
+            self.seq += 1
+            self._cond.notify_all()
+
+    # ---------- consumer ----------
+
+    def acquire(self, after_seq: int, timeout: float) -> Tuple[int, Optional[np.ndarray]]:
+        """Newest frame newer than after_seq, held until the next acquire/release."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.seq > after_seq, timeout):
+                return after_seq, None
+            self._held = self._latest
+            self._consumed = self.seq
+            return self.seq, self.frames[self._held]
+
+    def release(self):
+        with self._cond:
+            self._held = -1
+
+    def close(self):
+        self.frames = None
+        try:
+            self.shm.close()
+            self.shm.unlink()
+        except (OSError, BufferError):
+            pass
+
+    # ---------- plane views ----------
+
+    def planes(self, frame: np.ndarray):
+        w, h = self.width, self.height
+        y = frame[:w * h].reshape(h, w)
+        u = frame[w * h:w * h * 5 // 4].reshape(h // 2, w // 2)
+        v = frame[w * h * 5 // 4:].reshape(h // 2, w // 2)
+        return y, u, v
+
+
+# -------------------------------------------------------
+# SOURCES
+# -------------------------------------------------------
+class TestPatternSource:
+    """Moving colour bars at a fixed rate: a camera stand-in for benches and dev boxes."""
+
+    def __init__(self, ring: FrameRing, fps: int):
+        self.ring = ring
+        self.fps = fps
+        w, h = ring.width, ring.height
+        bars_y = np.array([235, 210, 170, 145, 106, 81, 41, 16], dtype=np.uint8)
+        bars_u = np.array([128, 16, 166, 54, 202, 90, 240, 128], dtype=np.uint8)
+        bars_v = np.array([128, 146, 16, 34, 222, 240, 110, 128], dtype=np.uint8)
+        self._y = np.repeat(bars_y, -(-w // 8))[:w]
+        self._u = np.repeat(bars_u, -(-(w // 2) // 8))[:w // 2]
+        self._v = np.repeat(bars_v, -(-(w // 2) // 8))[:w // 2]
+
+    def start(self, stop_event: threading.Event) -> threading.Thread:
+        t = threading.Thread(target=self._run, args=(stop_event,), daemon=True)
+        t.start()
+        return t
+
+    def _run(self, stop_event: threading.Event):
+        period = 1.0 / self.fps
+        next_t = time.monotonic()
+        n = 0
+        while not stop_event.is_set():
+            frame = self.ring.slot_for_write()
+            y, u, v = self.ring.planes(frame)
+            shift = (n * 4) % self.ring.width
+            y[:] = np.roll(self._y, shift)
+            u[:] = np.roll(self._u, shift // 2)
+            v[:] = np.roll(self._v, shift // 2)
+            self.ring.commit()
+            n += 1
+            next_t += period
+            delay = next_t - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_t = time.monotonic()
+
+    def stop(self):
+        pass
+
+
+class PicameraSource:
+    """Picamera2 main stream as YUV420, copied into the ring as each request completes."""
+
+    def __init__(self, ring: FrameRing, fps: int):
+        from picamera2 import Picamera2
+        self.ring = ring
+        self.picam = Picamera2()
+        config = self.picam.create_video_configuration(
+            main={"format": "YUV420", "size": (ring.width, ring.height)},
+            controls={"FrameRate": fps},
+            buffer_count=4,
+        )
+        self.picam.configure(config)
+
+    def start(self, stop_event: threading.Event) -> threading.Thread:
+        self.picam.start()
+        t = threading.Thread(target=self._run, args=(stop_event,), daemon=True)
+        t.start()
+        return t
+
+    def _run(self, stop_event: threading.Event):
+        while not stop_event.is_set():
+            try:
+                request = self.picam.capture_request()
+            except Exception:
+                break       # camera stopped underneath us
+            try:
+                # The I420 buffer is contiguous when the width needs no stride padding
+                frame = self.ring.slot_for_write()
+                frame[:] = request.make_buffer("main")[:self.ring.frame_bytes]
+            finally:
+                request.release()
+            self.ring.commit()
+
+    def stop(self):
+        for fn in (self.picam.stop, self.picam.close):
+            try:
+                fn()
+            except Exception:
+                pass
+
+
+# -------------------------------------------------------
+# SPRITES
+# -------------------------------------------------------
+class Sprite:
+    """An RGBA image converted once into premultiplied I420 planes + alpha."""
+
+    __slots__ = ("w", "h", "a_y", "y", "a_c", "u", "v")
+
+    def __init__(self, rgba: np.ndarray):
+        # Even dimensions keep luma and chroma rectangles aligned
+        h, w = rgba.shape[0] & ~1, rgba.shape[1] & ~1
+        rgba = rgba[:h, :w].astype(np.int32)
+        r, g, b, a = rgba[..., 0], rgba[..., 1], rgba[..., 2], rgba[..., 3]
+        # BT.601 limited range, same as the camera's YUV420
+        y = ((66 * r + 129 * g + 25 * b + 128) >> 8) + 16
+        u = ((-38 * r - 74 * g + 112 * b + 128) >> 8) + 128
+        v = ((112 * r - 94 * g - 18 * b + 128) >> 8) + 128
+
+        def sub(p):
+            return (p[0::2, 0::2] + p[1::2, 0::2] + p[0::2, 1::2] + p[1::2, 1::2] + 2) >> 2
+
+        a_c = sub(a)
+        self.w, self.h = w, h
+        self.a_y = (256 - a - (a >> 7)).astype(np.uint16)          # 256-α', α' in 0..256
+        self.y = (y * (a + (a >> 7))).astype(np.uint16)
+        self.a_c = (256 - a_c - (a_c >> 7)).astype(np.uint16)
+        self.u = sub(u * (a + (a >> 7))).astype(np.uint16)
+        self.v = sub(v * (a + (a >> 7))).astype(np.uint16)
+
+    def blend(self, planes, x: int, y: int):
+        """Blend into (Y, U, V) at an even (x, y); clips at the frame edge."""
+        Y, U, V = planes
+        x &= ~1
+        y &= ~1
+        w = min(self.w, Y.shape[1] - x)
+        h = min(self.h, Y.shape[0] - y)
+        if w <= 0 or h <= 0:
+            return
+        _mix(Y[y:y + h, x:x + w], self.a_y[:h, :w], self.y[:h, :w])
+        cx, cy, cw, ch = x // 2, y // 2, w // 2, h // 2
+        _mix(U[cy:cy + ch, cx:cx + cw], self.a_c[:ch, :cw], self.u[:ch, :cw])
+        _mix(V[cy:cy + ch, cx:cx + cw], self.a_c[:ch, :cw], self.v[:ch, :cw])
+
+
+def _mix(region, inv_alpha, premultiplied):
+    region[:] = (region * inv_alpha + premultiplied) >> 8
+
+
+class SpriteRenderer:
+    """Text → Sprite through a small LRU; the logo is loaded once."""
+
+    def __init__(self, font: Optional[Path], size: int = FONT_SIZE, cache: int = SPRITE_CACHE):
+        self.cache: OrderedDict[str, Sprite] = OrderedDict()
+        self.limit = cache
+        self.font = font
+        self.size = size
+
+    def text(self, text: str) -> Optional[Sprite]:
+        if not PIL_AVAILABLE or not text:
+            return None
+        sprite = self.cache.get(text)
+        if sprite is not None:
+            self.cache.move_to_end(text)
+            return sprite
+        sprite = Sprite(np.asarray(render_text(text, self.font, self.size)))
+        self.cache[text] = sprite
+        if len(self.cache) > self.limit:
+            self.cache.popitem(last=False)
+        return sprite
+
+    @staticmethod
+    def image(path: Optional[Path]) -> Optional[Sprite]:
+        if not PIL_AVAILABLE or not path or not Path(path).exists():
+            return None
+        with Image.open(path) as img:
+            return Sprite(np.asarray(img.convert("RGBA")))
+
+
+# -------------------------------------------------------
+# COMPOSITOR
+# -------------------------------------------------------
+class Compositor:
+    """Takes the newest ring frame, blends overlays in place, writes it to the FIFO."""
+
+    def __init__(self, ring: FrameRing, fps: int, logo: Optional[Path] = None,
+                 font: Optional[Path] = None, padding: int = 40, text_y: Optional[int] = None):
+        self.ring = ring
+        self.fps = fps
+        self.padding = padding
+        self.text_y = text_y if text_y is not None else ring.height - 58
+        self.renderer = SpriteRenderer(font)
+        self.logo = SpriteRenderer.image(logo)
+        self.now_playing = ""
+        self.frames_out = 0
+        if not PIL_AVAILABLE:
+            print("⚠️ Pillow not installed — raw camera frames go out without overlays")
+
+    def start(self, fifo: Path, stop_event: threading.Event) -> threading.Thread:
+        t = threading.Thread(target=self.run, args=(fifo, stop_event), daemon=True)
+        t.start()
+        return t
+
+    def composite(self, frame):
+        planes = self.ring.planes(frame)
+        W = self.ring.width
+        clock = self.renderer.text(datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        if clock:
+            clock.blend(planes, self.padding, self.padding)
+        if self.logo:
+            self.logo.blend(planes, W - self.logo.w - self.padding, self.padding)
+        np_sprite = self.renderer.text(self.now_playing)
+        if np_sprite:
+            np_sprite.blend(planes, W - np_sprite.w - self.padding, self.text_y)
+
+    def run(self, fifo: Path, stop_event: threading.Event):
+        seq = 0
+        timeout = 5.0 / self.fps
+        while not stop_event.is_set():
+            try:
+                fd = os.open(fifo, os.O_WRONLY)     # blocks until ffmpeg opens its end
+            except OSError:
+                stop_event.wait(0.5)
+                continue
+            try:
+                while not stop_event.is_set():
+                    seq, frame = self.ring.acquire(seq, timeout)
+                    if frame is None:
+                        continue
+                    try:
+                        self.composite(frame)
+                        view = memoryview(frame)
+                        while view:
+                            view = view[os.write(fd, view):]
+                    finally:
+                        self.ring.release()
+                    self.frames_out += 1
+            except BrokenPipeError:
+                pass        # ffmpeg went away: reopen for the next session
+            finally:
+                os.close(fd)
+
+
+class RawCamera:
+    """
+    Source + ring + compositor as one camera object for the streamer:
+    start() it after ffmpeg, set now_playing on track change, stop() it in
+    cleanup. It owns its stop event so a session restart can't leave a
+    writer blocked on the next session's FIFO.
+    """
+
+    def __init__(self, width: int, height: int, fps: int, fifo: Path,
+                 logo: Optional[Path] = None, font: Optional[Path] = None,
+                 test_pattern: bool = False, padding: int = 40, text_y: Optional[int] = None):
+        self.fifo = fifo
+        self.ring = FrameRing(width, height)
+        source_cls = TestPatternSource if test_pattern else PicameraSource
+        self.source = source_cls(self.ring, fps)
+        self.compositor = Compositor(self.ring, fps, logo=logo, font=font,
+                                     padding=padding, text_y=text_y)
+        self._stop = threading.Event()
+        self._threads = []
+
+    @property
+    def now_playing(self) -> str:
+        return self.compositor.now_playing
+
+    @now_playing.setter
+    def now_playing(self, text: str):
+        self.compositor.now_playing = text
+
+    def start(self):
+        self._threads = [self.source.start(self._stop),
+                         self.compositor.start(self.fifo, self._stop)]
+        return self
+
+    def stop(self):
+        self._stop.set()
+        # A writer still blocked in open() needs a reader to come and go
+        try:
+            fd = os.open(self.fifo, os.O_RDONLY | os.O_NONBLOCK)
+            time.sleep(0.1)
+            os.close(fd)
+        except OSError:
+            pass
+        self.source.stop()
+        for t in self._threads:
+            t.join(timeout=2)
+        if not any(t.is_alive() for t in self._threads):
+            self.ring.close()
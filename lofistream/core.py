@@ -0,0 +1,283 @@
+"""
+Streamer core shared by every build.
+
+The three scripts (8.7.9, 8.7.11, 8.7.27 LTS) keep their own main loops,
+restart policy and logging, but the parts that decide performance come
+from here, driven by a Profile (lofistream.profiles):
+
+    choose_stream_params(profile)       fps/bitrate for this Pi, capped by the profile
+    start_h264_camera / stop_h264_camera  Picamera2 → H.264 → CAM_FIFO
+    ffmpeg_command(profile, ...)        the whole ffmpeg argv: inputs, overlay
+                                        graph for the profile's layout, encoder
+    make_feeder(profile, ...)           the audio feeder that owns AUDIO_FIFO
+
+    cmd = ffmpeg_command(PROFILE, url, cam_input, AUDIO_FIFO, rung, gop,
+                         Overlays(logo=LOGO, text=NOWPLAYING_SPRITE, ...))
+    ff = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, ...)
+"""
+
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .adaptive import Rung
+from .audio import AudioEngine, CHANNELS, SAMPLE_RATE
+from .encoders import COPY, camera_encoder_kwargs, video_encoder_args
+from .profiles import RAW_CAMERAS, Profile, detect_pi_model
+from .splice import SpliceFeeder
+
+try:
+    from picamera2 import Picamera2
+    from picamera2.encoders import H264Encoder
+    from picamera2.outputs import FileOutput
+    PICAMERA2_AVAILABLE = True
+except ImportError:
+    PICAMERA2_AVAILABLE = False
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+SIZE = (1280, 720)
+PADDING = 40            # logo, clock and now-playing distance from the edges
+VIZ_SIZE = (140, 28)
+FONT_SIZE = 24
+
+
+# -------------------------------------------------------
+# STREAM PARAMETERS
+# -------------------------------------------------------
+def choose_stream_params(profile: Profile, fallback_fps: int = 20,
+                         fallback_bitrate: str = "1500k") -> Rung:
+    """
+    Pick FPS + bitrate based on Pi model + startup load, within the profile's
+    cap. Unknown models get the build's own fallback FPS and bitrate.
+    """
+    model = detect_pi_model()
+
+    fps, bitrate, maxrate, bufsize = fallback_fps, fallback_bitrate, "1800k", "2400k"
+    if model == 5:
+        fps, bitrate, maxrate, bufsize = 30, "2500k", "3000k", "4000k"
+    elif model == 4:
+        fps, bitrate, maxrate, bufsize = 20, "1500k", "1800k", "2400k"
+
+    if PSUTIL_AVAILABLE:
+        load = psutil.cpu_percent(interval=1.0)
+        print(f"🧠 Startup CPU load: {load:.1f}%")
+        if load > 85:
+            print("⚠️ High startup CPU — tuning safer parameters")
+            fps = max(15, fps - 5)
+
+    if profile.max_fps and fps > profile.max_fps:
+        print(f"🎛 Profile {profile.name} caps FPS at {profile.max_fps}")
+        fps = profile.max_fps
+
+    print(f"🎞 Auto-selected FPS: {fps}")
+    print(f"📺 Video bitrate: {bitrate}, maxrate: {maxrate}, bufsize: {bufsize}")
+    return Rung(fps, bitrate, maxrate, bufsize)
+
+
+# -------------------------------------------------------
+# CAMERA (Picamera2 H.264 into the FIFO)
+# -------------------------------------------------------
+def _br_to_int(br: str) -> int:
+    if br.endswith("k"):
+        return int(br[:-1]) * 1000
+    return int(br)
+
+
+def start_h264_camera(fifo: Path, fps: int, bitrate: str, gop: int, encoder: str,
+                      size: Tuple[int, int] = SIZE):
+    if not PICAMERA2_AVAILABLE:
+        print("❌ Picamera2 not installed.")
+        return None
+
+    print("📸 Initialising Picamera2…")
+    picam = Picamera2()
+    config = picam.create_video_configuration(
+        main={"format": "YUV420", "size": size},
+        controls={"FrameRate": fps}
+    )
+    picam.configure(config)
+
+    h264 = H264Encoder(bitrate=_br_to_int(bitrate), **camera_encoder_kwargs(encoder, gop))
+    try:
+        # Blocking FIFO output is the most stable option for long runtimes
+        picam.start_recording(h264, FileOutput(str(fifo)))
+    except Exception as e:
+        print("❌ Failed to start camera:", e)
+        return None
+
+    print(f"📸 Picamera2 (H264 Baseline {fps}fps, {bitrate}) → {fifo}")
+    return picam
+
+
+def stop_h264_camera(picam):
+    if not picam:
+        return
+    print("📷 Stopping Picamera2…")
+    try:
+        picam.stop_recording()
+    except Exception:
+        pass
+    try:
+        picam.close()
+    except Exception:
+        pass
+
+
+# -------------------------------------------------------
+# FFMPEG COMMAND
+# -------------------------------------------------------
+class Overlays(NamedTuple):
+    """What the build has to draw; which of it is used depends on the layout."""
+    logo: Optional[Path] = None
+    text: object = None                 # TextSprite: now playing (classic) / clock + now playing (lts)
+    text_file: Optional[Path] = None    # drawtext fallback for `text` when there is no sprite
+    font: Optional[Path] = None         # drawtext fallback font
+    visualiser: object = None           # Visualiser feeding a rawvideo FIFO
+
+
+def _inputs(profile: Profile, overlays: Overlays) -> List[Tuple[str, List[str]]]:
+    """Extra inputs after camera + audio, in input order (index 2, 3, …)."""
+    inputs = []
+    if profile.camera not in RAW_CAMERAS and profile.layout != "none":
+        if overlays.logo and Path(overlays.logo).exists():
+            inputs.append(("logo", ["-loop", "1", "-i", str(overlays.logo)]))
+        if overlays.text:
+            inputs.append(("text", overlays.text.ffmpeg_input()))
+    if overlays.visualiser and profile.visualiser == "numpy" and profile.layout != "lts":
+        inputs.append(("viz", overlays.visualiser.ffmpeg_input()))
+    return inputs
+
+
+def _bars(profile: Profile, index: Dict[str, int]) -> Tuple[str, Optional[str]]:
+    """(graph prefix, pad) for the visualiser bars, or ("", None) for none."""
+    if "viz" in index:
+        return "", f"[{index['viz']}:v]"
+    if profile.visualiser == "none":
+        return "", None
+    w, h = VIZ_SIZE
+    return f"[1:a]showfreqs=mode=bar:ascale=log:colors=0xCCCCCC:size={w}x{h}[viz];", "[viz]"
+
+
+def _drawtext(overlays: Overlays, x: str, y: int) -> str:
+    font = f"fontfile={overlays.font}:" if overlays.font else ""
+    return (f"drawtext={font}textfile='{overlays.text_file}':reload=1:"
+            f"x={x}:y={y}:fontsize={FONT_SIZE}:fontcolor=white:borderw=2")
+
+
+def filter_graph(profile: Profile, overlays: Overlays, index: Dict[str, int],
+                 size: Tuple[int, int] = SIZE) -> str:
+    """The -filter_complex for the profile's layout, ending in [vout]."""
+    w, h = size
+    viz_h = VIZ_SIZE[1]
+    bottom_y = h - viz_h - 30
+    graph, bars = _bars(profile, index) if profile.layout != "lts" else ("", None)
+    steps: List[Tuple[str, str]] = []     # (second input pad or "", filter)
+
+    def overlay(pad: str, x, y):
+        steps.append((pad, f"overlay={x}:{y}"))
+
+    if profile.camera in RAW_CAMERAS:
+        # clock, logo and now playing were composited into the raw frames already
+        if bars:
+            overlay(bars, PADDING, bottom_y)
+    else:
+        steps.append(("", f"scale={w}:{h},format=yuv420p"))
+        if profile.layout == "classic":
+            steps.append(("", f"drawtext=text='%{{localtime}}':x={PADDING}:y={PADDING}:"
+                              f"fontsize={FONT_SIZE}:fontcolor=white:borderw=2"))
+            if "logo" in index:
+                overlay(f"[{index['logo']}:v]", f"W-w-{PADDING}", PADDING)
+            if bars:
+                overlay(bars, PADDING, bottom_y)
+            if "text" in index:
+                overlay(f"[{index['text']}:v]", f"W-w-{PADDING}", bottom_y)
+            elif overlays.text_file:
+                steps.append(("", _drawtext(overlays, f"w-tw-{PADDING}", bottom_y)))
+        elif profile.layout == "lts":
+            if "logo" in index:
+                overlay(f"[{index['logo']}:v]", f"W-w-{PADDING}", PADDING)
+            if "text" in index:
+                overlay(f"[{index['text']}:v]", PADDING, PADDING)
+            elif overlays.text_file:
+                steps.append(("", _drawtext(overlays, str(PADDING), PADDING)))
+        elif bars:
+            overlay(bars, PADDING, bottom_y)
+
+    if not steps:
+        return graph + "[0:v]null[vout]"
+    src = "[0:v]"
+    for i, (pad, step) in enumerate(steps):
+        out = "[vout]" if i == len(steps) - 1 else f"[v{i}]"
+        graph += f"{src}{pad}{step}{out}" + ("" if out == "[vout]" else ";")
+        src = out
+    return graph
+
+
+def ffmpeg_command(profile: Profile, output: str, camera_input: List[str], audio_fifo: Path,
+                   rung: Rung, gop: int, overlays: Overlays = Overlays(),
+                   size: Tuple[int, int] = SIZE) -> List[str]:
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", profile.loglevel, "-nostats"]
+    if profile.low_delay_input:
+        cmd += [
+            "-fflags", "+genpts+discardcorrupt",
+            "-flags", "low_delay",
+            "-thread_queue_size", "4096",
+            "-probesize", "64k",
+            "-analyzeduration", "0",
+            "-vsync", "1",
+        ]
+    else:
+        cmd += ["-fflags", "+genpts", "-thread_queue_size", "4096"]
+    cmd += [
+        "-use_wallclock_as_timestamps", "1",
+        *camera_input,
+        "-thread_queue_size", "4096",
+        "-f", "s16le", "-ar", str(SAMPLE_RATE), "-ac", str(CHANNELS), "-i", str(audio_fifo),
+    ]
+
+    if profile.encoder == COPY:
+        # Headless passthrough: camera H.264 straight to FLV, no overlays
+        cmd += ["-map", "0:v", "-map", "1:a"]
+    else:
+        inputs = _inputs(profile, overlays)
+        for _, args in inputs:
+            cmd += args
+        index = {name: i + 2 for i, (name, _) in enumerate(inputs)}
+        cmd += [
+            "-filter_complex", filter_graph(profile, overlays, index, size),
+            "-map", "[vout]", "-map", "1:a",
+        ]
+
+    cmd += video_encoder_args(profile.encoder, rung.bitrate, rung.maxrate, rung.bufsize, gop,
+                              preset=profile.preset)
+    cmd += [
+        "-c:a", "aac",
+        "-b:a", profile.audio_bitrate,
+        "-ar", str(SAMPLE_RATE),
+
+        # Progress blocks on stderr, parsed by lofistream.telemetry
+        "-progress", "pipe:2",
+
+        "-f", "flv", output,
+    ]
+    return cmd
+
+
+# -------------------------------------------------------
+# AUDIO FEEDER
+# -------------------------------------------------------
+def make_feeder(profile: Profile, tracks, fifo: Path, **engine_kwargs):
+    """The profile's audio feeder; run(stop_event) it on its own thread."""
+    if profile.feeder == "splice":
+        crossfade = engine_kwargs.get("crossfade")
+        if crossfade is not None and crossfade.seconds > 0:
+            print("⚠️ Crossfades need the engine feeder — not splicing audio")
+        else:
+            print("🎚 Audio: spliced decoder → FIFO (no PCM copies)")
+            return SpliceFeeder(tracks, fifo, describe=engine_kwargs.get("describe"),
+                                on_track=engine_kwargs.get("on_track"))
+    return AudioEngine(tracks, fifo, **engine_kwargs)
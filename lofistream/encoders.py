@@ -0,0 +1,84 @@
+"""
+Video encoder modes for the ffmpeg pipeline (LOFI_ENCODER).
+
+    libx264       decode → scale/overlay → software x264 (veryfast). Default.
+    h264_v4l2m2m  same filter graph, encoded on the Pi's hardware H.264 block
+    copy          no decode at all: the camera's H.264 goes straight to FLV.
+                  Headless channels only — no logo, clock or now-playing text.
+
+In copy mode the GOP and bitrate YouTube sees are whatever Picamera2's
+H264Encoder produces, so the camera must be started with iperiod=GOP and
+repeated SPS/PPS (camera_encoder_kwargs).
+"""
+
+import subprocess
+from functools import lru_cache
+from typing import List
+
+LIBX264 = "libx264"
+V4L2M2M = "h264_v4l2m2m"
+COPY = "copy"
+ENCODERS = (LIBX264, V4L2M2M, COPY)
+
+
+@lru_cache(maxsize=None)
+def ffmpeg_has_encoder(name: str) -> bool:
+    try:
+        out = subprocess.run(["ffmpeg", "-hide_banner", "-encoders"],
+                             capture_output=True, text=True, timeout=10).stdout
+    except (OSError, subprocess.SubprocessError):
+        return False
+    return any(line.split()[1:2] == [name] for line in out.splitlines())
+
+
+def resolve_encoder(requested: str, log=print) -> str:
+    """Validate LOFI_ENCODER, falling back to libx264 when it cannot work here."""
+    requested = (requested or LIBX264).strip().lower()
+    if requested not in ENCODERS:
+        log(f"⚠️ Unknown LOFI_ENCODER '{requested}' — using {LIBX264}")
+        return LIBX264
+    if requested == V4L2M2M and not ffmpeg_has_encoder(V4L2M2M):
+        log(f"⚠️ This ffmpeg has no {V4L2M2M} — using {LIBX264}")
+        return LIBX264
+    return requested
+
+
+def video_encoder_args(encoder: str, bitrate: str, maxrate: str, bufsize: str, gop: int,
+                       preset: str = "veryfast") -> List[str]:
+    """The -c:v … part of the output options for one encoder mode."""
+    if encoder == COPY:
+        return ["-c:v", "copy"]
+
+    if encoder == V4L2M2M:
+        # The M2M block only does plain bitrate control: no maxrate/bufsize,
+        # no presets, and it wants yuv420p frames in.
+        return [
+            "-c:v", V4L2M2M,
+            "-b:v", bitrate,
+            "-g", str(gop),
+            "-pix_fmt", "yuv420p",
+            "-num_output_buffers", "32",
+            "-num_capture_buffers", "16",
+        ]
+
+    return [
+        "-c:v", LIBX264,
+        "-preset", preset,
+        "-tune", "zerolatency",
+        "-profile:v", "baseline",
+        "-level", "3.1",
+        "-b:v", bitrate,
+        "-maxrate", maxrate,
+        "-bufsize", bufsize,
+        "-g", str(gop),
+        "-keyint_min", str(gop),
+        "-sc_threshold", "0",
+        "-pix_fmt", "yuv420p",
+    ]
+
+
+def camera_encoder_kwargs(encoder: str, gop: int) -> dict:
+    """Extra Picamera2 H264Encoder arguments; copy mode ships its stream as-is."""
+    if encoder == COPY:
+        return {"iperiod": gop, "repeat": True}
+    return {}
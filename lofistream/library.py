@@ -0,0 +1,361 @@
+"""
+Persistent track metadata index.
+
+A small SQLite file (track_index.db) keyed by path, with mtime + size to
+detect changes. It stores title, artist, duration, loudness and BPM, so
+the streamer parses tags once per file ever instead of once per play,
+and a playlist "rescan" is a single stat() of the directory unless
+something was actually added, removed or renamed.
+
+Loudness and BPM come from track_cleaner's track_analysis.csv when it
+exists; the index just picks them up by filename.
+
+While streaming, lofistream.watcher feeds add/remove/rename events in,
+and shuffled() folds them into the running shuffle.
+"""
+
+import os
+import csv
+import random
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+try:
+    import mutagen
+    MUTAGEN_AVAILABLE = True
+except ImportError:
+    MUTAGEN_AVAILABLE = False
+
+SCHEMA_VERSION = 1
+
+
+class TrackInfo(NamedTuple):
+    path: str
+    mtime_ns: int
+    size: int
+    title: str
+    artist: str
+    duration: float                 # seconds, -1 if unknown
+    loudness: Optional[float]       # integrated LUFS (track_cleaner)
+    bpm: Optional[float]            # track_cleaner estimate
+
+    @property
+    def label(self) -> str:
+        return f"{self.artist} - {self.title}" if self.artist else self.title
+
+
+def read_tags(path: Path) -> Tuple[str, str, float]:
+    """Return (title, artist, duration) with the file stem as fallback title."""
+    title, artist, duration = path.stem, "", -1.0
+    if not MUTAGEN_AVAILABLE:
+        return title, artist, duration
+    try:
+        m = mutagen.File(path, easy=True)
+        if m is not None:
+            title = (m.get("title") or [""])[0] or path.stem
+            artist = (m.get("artist") or [""])[0]
+            length = getattr(m.info, "length", None)
+            if length:
+                duration = float(length)
+    except Exception:
+        pass
+    return title, artist, duration
+
+
+def _float_or_none(raw) -> Optional[float]:
+    try:
+        return float(raw) if raw not in (None, "") else None
+    except ValueError:
+        return None
+
+
+class TrackLibrary:
+    """
+    In-memory playlist backed by the on-disk index.
+
+    sync() is cheap to call often: it loads the index on first use, then
+    only walks the directory when its mtime changes, and only parses tags
+    for files whose (mtime, size) differ from the stored row.
+    """
+
+    def __init__(self, directory: Path, index_file: Path,
+                 is_valid: Optional[Callable[[Path], bool]] = None,
+                 analysis_csv: Optional[Path] = None):
+        self.directory = Path(directory)
+        self.index_file = Path(index_file)
+        self.analysis_csv = Path(analysis_csv) if analysis_csv else None
+        self.is_valid = is_valid or (lambda p: True)
+
+        self._lock = threading.RLock()
+        self._changed = threading.Condition(self._lock)
+        self.generation = 0
+        self._db: Optional[sqlite3.Connection] = None
+        self._loaded = False
+        self._rows: Dict[str, TrackInfo] = {}
+        self._dir_mtime_ns = -1
+        self._csv_mtime_ns = -1
+        self._analysis: Dict[str, Tuple[Optional[float], Optional[float]]] = {}
+
+    # ---------- persistence ----------
+
+    def _open(self):
+        try:
+            self.index_file.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(str(self.index_file), check_same_thread=False)
+            db.execute("PRAGMA synchronous=NORMAL")
+            if db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                db.execute("DROP TABLE IF EXISTS tracks")
+                db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS tracks ("
+                " path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER,"
+                " title TEXT, artist TEXT, duration REAL, loudness REAL, bpm REAL)"
+            )
+            db.commit()
+            self._db = db
+            for row in db.execute("SELECT * FROM tracks"):
+                info = TrackInfo(*row)
+                self._rows[info.path] = info
+            print(f"🗂 Track index: {len(self._rows)} entries from {self.index_file}")
+        except Exception as e:
+            print(f"⚠️ Track index unavailable ({e}) — keeping metadata in memory only")
+            self._db = None
+
+    def _store(self, upserts: List[TrackInfo], removed: List[str]):
+        if self._db is None or not (upserts or removed):
+            return
+        try:
+            with self._db:
+                if removed:
+                    self._db.executemany("DELETE FROM tracks WHERE path=?", [(p,) for p in removed])
+                if upserts:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO tracks VALUES (?,?,?,?,?,?,?,?)", upserts
+                    )
+        except Exception as e:
+            print(f"⚠️ Track index write failed: {e}")
+
+    def _load_analysis(self) -> bool:
+        """Reload loudness/BPM from track_analysis.csv if it changed."""
+        csv_path = self.analysis_csv
+        try:
+            mtime = csv_path.stat().st_mtime_ns if csv_path else -1
+        except OSError:
+            mtime = -1
+        if mtime == self._csv_mtime_ns:
+            return False
+        self._csv_mtime_ns = mtime
+
+        analysis = {}
+        if mtime >= 0:
+            try:
+                with csv_path.open(newline="") as f:
+                    for row in csv.DictReader(f):
+                        analysis[row.get("filename", "")] = (
+                            _float_or_none(row.get("loudness_lufs")),
+                            _float_or_none(row.get("bpm_estimate")),
+                        )
+            except Exception as e:
+                print(f"⚠️ Could not read {csv_path}: {e}")
+        self._analysis = analysis
+        return True
+
+    # ---------- indexing ----------
+
+    def _index_file(self, path: Path, st: os.stat_result) -> TrackInfo:
+        title, artist, duration = read_tags(path)
+        loudness, bpm = self._analysis.get(path.name, (None, None))
+        return TrackInfo(str(path), st.st_mtime_ns, st.st_size,
+                         title, artist, duration, loudness, bpm)
+
+    def sync(self, force: bool = False) -> bool:
+        """Bring the index in line with the directory. Returns True if anything changed."""
+        with self._lock:
+            if not self._loaded:
+                self._open()
+                self._loaded = True
+                force = True
+
+            csv_changed = self._load_analysis()
+
+            dir_mtime = self.directory.stat().st_mtime_ns
+            if not force and not csv_changed and dir_mtime == self._dir_mtime_ns:
+                return False
+            self._dir_mtime_ns = dir_mtime
+
+            seen = set()
+            upserts: List[TrackInfo] = []
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    path = Path(entry.path)
+                    try:
+                        if not entry.is_file() or not self.is_valid(path):
+                            continue
+                        st = entry.stat()
+                    except OSError:
+                        continue    # vanished mid-scan
+                    key = str(path)
+                    seen.add(key)
+                    old = self._rows.get(key)
+                    if old and old.mtime_ns == st.st_mtime_ns and old.size == st.st_size:
+                        if csv_changed:
+                            loudness, bpm = self._analysis.get(path.name, (None, None))
+                            if (loudness, bpm) != (old.loudness, old.bpm):
+                                upserts.append(old._replace(loudness=loudness, bpm=bpm))
+                        continue
+                    upserts.append(self._index_file(path, st))
+
+            removed = [k for k in self._rows if k not in seen]
+            for k in removed:
+                del self._rows[k]
+            for info in upserts:
+                self._rows[info.path] = info
+
+            self._store(upserts, removed)
+            if upserts or removed:
+                self._bump()
+            return bool(upserts or removed)
+
+    # ---------- live updates (no rescan) ----------
+
+    def _bump(self):
+        self.generation += 1
+        self._changed.notify_all()
+
+    def _touch_dir(self):
+        # The change is applied, so the next sync() need not walk the folder
+        try:
+            self._dir_mtime_ns = self.directory.stat().st_mtime_ns
+        except OSError:
+            pass
+
+    def add(self, path: Path) -> bool:
+        """Index one new/rewritten file. Returns True if it is in the playlist."""
+        path = Path(path)
+        with self._lock:
+            try:
+                st = path.stat()
+                valid = path.is_file() and self.is_valid(path)
+            except OSError:
+                valid = False
+            if not valid:
+                self.remove(path)
+                return False
+
+            key = str(path)
+            old = self._rows.get(key)
+            if old and old.mtime_ns == st.st_mtime_ns and old.size == st.st_size:
+                return True
+            info = self._index_file(path, st)
+            self._rows[key] = info
+            self._store([info], [])
+            self._touch_dir()
+            self._bump()
+            return True
+
+    def remove(self, path: Path) -> bool:
+        key = str(path)
+        with self._lock:
+            if self._rows.pop(key, None) is None:
+                return False
+            self._store([], [key])
+            self._touch_dir()
+            self._bump()
+            return True
+
+    def rename(self, old: Path, new: Path) -> bool:
+        """Move an entry to a new path, keeping its tags if the file is unchanged."""
+        new = Path(new)
+        with self._lock:
+            info = self._rows.pop(str(old), None)
+            if info is None:
+                return self.add(new)
+            try:
+                st = new.stat()
+                valid = self.is_valid(new)
+            except OSError:
+                valid = False
+            if not valid:
+                self._store([], [str(old)])
+                self._touch_dir()
+                self._bump()
+                return False
+            if info.mtime_ns == st.st_mtime_ns and info.size == st.st_size:
+                info = info._replace(path=str(new))
+            else:
+                info = self._index_file(new, st)
+            self._rows[info.path] = info
+            self._store([info], [str(old)])
+            self._touch_dir()
+            self._bump()
+            return True
+
+    # ---------- lookups ----------
+
+    def tracks(self) -> List[Path]:
+        with self._lock:
+            return [Path(p) for p in self._rows]
+
+    def __contains__(self, path) -> bool:
+        return str(path) in self._rows
+
+    def shuffled(self, stop_event: Optional[threading.Event] = None) -> Iterator[Path]:
+        """
+        Endless shuffle over the live playlist.
+
+        Files added mid-cycle are slotted into the remaining order at random;
+        removed or vanished files are dropped right before they would be
+        yielded, so they never reach the decoder. An empty playlist waits
+        for the first file to arrive instead of exiting.
+        """
+        def stopped():
+            return stop_event is not None and stop_event.is_set()
+
+        while not stopped():
+            with self._lock:
+                pending = list(self._rows)
+                gen = self.generation
+                if not pending:
+                    print("⚠️ No tracks found. Waiting for music in the playlist folder...")
+                    while not self._rows and not stopped():
+                        self._changed.wait(1.0)
+                    continue
+
+            random.shuffle(pending)
+            queued = set(pending)
+
+            while pending and not stopped():
+                if self.generation != gen:
+                    with self._lock:
+                        gen = self.generation
+                        fresh = [k for k in self._rows if k not in queued]
+                    for k in fresh:
+                        pending.insert(random.randint(0, len(pending)), k)
+                        queued.add(k)
+
+                key = pending.pop()
+                if key not in self._rows or not os.path.exists(key):
+                    continue
+                yield Path(key)
+
+    def lookup(self, path: Path) -> Optional[TrackInfo]:
+        """Cached metadata for path; indexes the file on a miss or if it changed."""
+        key = str(path)
+        with self._lock:
+            info = self._rows.get(key)
+            try:
+                st = path.stat()
+            except OSError:
+                return info
+            if info and info.mtime_ns == st.st_mtime_ns and info.size == st.st_size:
+                return info
+            info = self._index_file(path, st)
+            self._rows[key] = info
+            self._store([info], [])
+            return info
+
+    def bpm(self, path: Path) -> Optional[float]:
+        info = self._rows.get(str(path))
+        return info.bpm if info else None
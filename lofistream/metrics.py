@@ -0,0 +1,97 @@
+"""
+Prometheus-style counters and gauges for the streamer.
+
+Kept deliberately tiny so they can sit on hot paths: a counter is one
+attribute add, a gauge one attribute store, and callback metrics are only
+evaluated when collected. The streamer publishes REGISTRY.collect() on the
+status channel and the dashboard renders it at /metrics, so nothing here
+opens a port or pulls in prometheus_client.
+
+    TRACK_CHANGES = REGISTRY.counter("lofi_track_changes_total", "Tracks started")
+    TRACK_CHANGES.inc()
+    REGISTRY.gauge("lofi_audio_buffer_fill_ratio", "PCM buffer fill", fn=engine.buffer_level)
+"""
+
+import threading
+from typing import Callable, Dict, List, Optional
+
+COUNTER = "counter"
+GAUGE = "gauge"
+
+
+class Metric:
+    __slots__ = ("name", "kind", "help", "value", "fn")
+
+    def __init__(self, name: str, kind: str, help: str, fn: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.value = 0.0
+        self.fn = fn
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def set(self, value: float):
+        self.value = value
+
+    def read(self) -> Optional[float]:
+        if self.fn is None:
+            return self.value
+        try:
+            v = self.fn()
+        except Exception:
+            return None
+        return None if v is None else float(v)
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Metric] = {}
+
+    def _get(self, name: str, kind: str, help: str, fn) -> Metric:
+        with self._lock:
+            m = self._metrics.get(name)
+            if m is None:
+                m = self._metrics[name] = Metric(name, kind, help, fn)
+            elif fn is not None:
+                m.fn = fn       # re-registered by a new session: follow the new source
+            return m
+
+    def counter(self, name: str, help: str, fn: Optional[Callable[[], float]] = None) -> Metric:
+        return self._get(name, COUNTER, help, fn)
+
+    def gauge(self, name: str, help: str, fn: Optional[Callable[[], float]] = None) -> Metric:
+        return self._get(name, GAUGE, help, fn)
+
+    def collect(self) -> List[list]:
+        """[[name, kind, help, value], ...] — JSON-friendly for the status channel."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        out = []
+        for m in metrics:
+            v = m.read()
+            if v is not None:
+                out.append([m.name, m.kind, m.help, v])
+        return out
+
+
+REGISTRY = Registry()
+
+# Shared by every build
+TRACK_CHANGES = REGISTRY.counter("lofi_track_changes_total", "Tracks started by the audio engine")
+SESSION_RESTARTS = REGISTRY.counter("lofi_ffmpeg_restarts_total", "FFmpeg pipeline restarts")
+STALLS = REGISTRY.counter("lofi_ffmpeg_stalls_total", "Watchdog stall detections")
+STALL_SECONDS = REGISTRY.counter("lofi_ffmpeg_stall_seconds_total",
+                                 "Seconds without ffmpeg progress before each stall restart")
+
+
+def register_audio(engine):
+    """Expose an AudioEngine's counters; called once per engine."""
+    REGISTRY.counter("lofi_audio_underruns_total", "PCM buffer underruns (silence written)",
+                     fn=lambda: engine.underruns)
+    REGISTRY.counter("lofi_audio_tracks_played_total", "Tracks started",
+                     fn=lambda: engine.tracks_played)
+    REGISTRY.gauge("lofi_audio_buffer_fill_ratio", "Decoded PCM buffer fill (0-1)",
+                   fn=lambda: engine.buffer_fill)
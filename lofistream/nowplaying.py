@@ -0,0 +1,84 @@
+"""
+Now-playing / overlay text files, written atomically and only on change.
+
+ffmpeg's `drawtext=textfile=...:reload=1` re-reads its file on every frame,
+so an in-place `write_text` (truncate, then write) can be caught half way
+and shows up as a flickering or empty title. Every build writes through
+one NowPlayingPublisher instead:
+
+    NOWPLAYING = NowPlayingPublisher()
+    NOWPLAYING.write(RUNTIME_DIR / "nowplaying.txt", "Now Playing: …")
+
+write() skips the filesystem entirely when the text is what it last wrote
+(and the file is still there); otherwise it writes a temp file next to the
+target and os.replace()s it over, so readers see the old or the new
+content, never a mix.
+
+The overlay files live in RUNTIME_DIR: LOFI_RUNTIME_DIR if set, else
+/dev/shm/lofi (tmpfs, no SD-card writes), else /tmp. The dashboard's
+current-track file stays at /tmp/current_track.txt unless
+LOFI_CURRENT_TRACK_FILE points both sides somewhere else.
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Union
+
+
+def _runtime_dir() -> Path:
+    env = os.environ.get("LOFI_RUNTIME_DIR")
+    candidates = [Path(env)] if env else [Path("/dev/shm/lofi"), Path("/tmp")]
+    for d in candidates:
+        try:
+            d.mkdir(parents=True, exist_ok=True)
+        except OSError:
+            continue
+        if os.access(d, os.W_OK):
+            return d
+    return Path("/tmp")
+
+
+RUNTIME_DIR = _runtime_dir()
+CURRENT_TRACK_FILE = Path(os.environ.get("LOFI_CURRENT_TRACK_FILE", "/tmp/current_track.txt"))
+
+
+def write_atomic(path: Path, data: bytes):
+    """Temp file in the same directory, then rename over `path`."""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+        raise
+
+
+class NowPlayingPublisher:
+    def __init__(self, log=print):
+        self.log = log
+        self.writes = 0
+        self.skipped = 0
+        self._last: Dict[Path, bytes] = {}
+        self._lock = threading.Lock()
+
+    def write(self, path: Path, content: Union[str, bytes]) -> bool:
+        """Atomically replace `path` with `content`; returns False if nothing changed."""
+        path = Path(path)
+        data = content.encode("utf-8") if isinstance(content, str) else content
+        with self._lock:
+            if self._last.get(path) == data and path.exists():
+                self.skipped += 1
+                return False
+            try:
+                write_atomic(path, data)
+            except OSError as e:
+                self.log(f"⚠️ Could not write {path}: {e}")
+                return False
+            self._last[path] = data
+            self.writes += 1
+            return True
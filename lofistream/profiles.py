@@ -0,0 +1,148 @@
+"""
+Pipeline profiles (LOFI_PROFILE).
+
+A profile is the set of choices that used to be baked separately into each
+streamer script: which video encoder, which camera path, how overlays are
+laid out, how the visualiser is drawn and which audio feeder runs. The
+builds hand their profile to lofistream.core, so an optimisation lands in
+one place and can be benchmarked per profile
+(bench_pipelines.py --profiles ...).
+
+    pi4-safe     Pi 4 default: x264 veryfast, ≤20 fps, all overlays, NumPy bars
+    pi5-quality  Pi 5: x264 faster, ≤30 fps, all overlays, NumPy bars
+    headless     camera H.264 passed straight through, no overlays or bars,
+                 spliced audio
+    lts          the 8.7.27 LTS look: one clock + now-playing block, logo, no bars,
+                 spliced audio
+    auto         pi5-quality on a Pi 5, pi4-safe anywhere else (uncapped FPS
+                 when the model is unknown, so LOFI_FALLBACK_FPS holds)
+
+Individual knobs still win over the profile when set: LOFI_ENCODER,
+LOFI_CAMERA_MODE, LOFI_VIZ, LOFI_FEEDER.
+"""
+
+import os
+from typing import NamedTuple
+
+from .encoders import COPY, LIBX264, resolve_encoder
+from .splice import SPLICE_AVAILABLE
+
+RAW_CAMERAS = {"raw", "test"}
+LAYOUTS = ("classic", "lts", "none")
+VISUALISERS = ("numpy", "ffmpeg", "none")
+FEEDERS = ("engine", "splice")
+
+
+class Profile(NamedTuple):
+    name: str
+    summary: str
+    encoder: str = LIBX264          # libx264 | h264_v4l2m2m | copy
+    camera: str = "h264"            # h264 | raw | test (raw/test: 8.7.11 compositor path)
+    layout: str = "classic"         # classic: clock TL, logo TR, bars BL, now playing BR
+                                    # lts: clock + now playing TL, logo TR; none: no overlays
+    visualiser: str = "numpy"       # numpy (in-process bars) | ffmpeg (showfreqs) | none
+    feeder: str = "engine"          # engine (AudioEngine: crossfade, visualiser tap)
+                                    # splice (SpliceFeeder: PCM never enters Python)
+    max_fps: int = 30               # cap on what choose_stream_params picks (0: none)
+    low_delay_input: bool = True    # camera input: low_delay, 64k probe, discardcorrupt, vsync 1
+                                    # (False: the LTS input, +genpts and wallclock only)
+    preset: str = "veryfast"        # libx264 preset
+    loglevel: str = "warning"
+    audio_bitrate: str = "128k"
+
+
+PROFILES = {p.name: p for p in (
+    Profile("pi4-safe", "Pi 4: x264 veryfast, up to 20 fps, all overlays", max_fps=20),
+    Profile("pi5-quality", "Pi 5: x264 faster, up to 30 fps, all overlays", preset="faster"),
+    Profile("headless", "camera H.264 passthrough, no overlays", encoder=COPY,
+            layout="none", visualiser="none", feeder="splice"),
+    Profile("lts", "LTS look: clock + now playing block and logo, no bars",
+            layout="lts", visualiser="none", feeder="splice", max_fps=20,
+            low_delay_input=False),
+)}
+
+
+def detect_pi_model() -> int:
+    try:
+        with open("/proc/device-tree/model") as f:
+            m = f.read().lower()
+            if "raspberry pi 5" in m:
+                return 5
+            if "raspberry pi 4" in m:
+                return 4
+    except OSError:
+        pass
+    return 0
+
+
+def load_profile(default: str, log=print) -> Profile:
+    """LOFI_PROFILE (or the build's default) with any per-knob env overrides applied."""
+    name = os.environ.get("LOFI_PROFILE", default).strip().lower()
+    model = None
+    if name == "auto":
+        model = detect_pi_model()
+        name = "pi5-quality" if model == 5 else "pi4-safe"
+    profile = PROFILES.get(name)
+    if profile is None:
+        log(f"⚠️ Unknown LOFI_PROFILE '{name}' — using pi4-safe")
+        profile = PROFILES["pi4-safe"]
+    elif model == 0:
+        # auto on a board we don't recognise: the build's fallback FPS stands
+        profile = profile._replace(max_fps=0)
+
+    overrides = {}
+    for field, env in (("encoder", "LOFI_ENCODER"), ("camera", "LOFI_CAMERA_MODE"),
+                       ("visualiser", "LOFI_VIZ"), ("feeder", "LOFI_FEEDER")):
+        value = os.environ.get(env, "").strip().lower()
+        if value:
+            overrides[field] = value
+    return profile._replace(**overrides)
+
+
+def resolve_profile(profile: Profile, raw_camera: bool = True, numpy: bool = True,
+                    log=print) -> Profile:
+    """
+    Settle a profile against what this build and this Pi can actually do,
+    logging every fallback. Call once in main(), after the env is read.
+    """
+    encoder = resolve_encoder(profile.encoder, log=log)
+    camera, visualiser, feeder = profile.camera, profile.visualiser, profile.feeder
+
+    if camera not in RAW_CAMERAS | {"h264"}:
+        log(f"⚠️ Unknown camera mode '{camera}' — using h264")
+        camera = "h264"
+    if camera in RAW_CAMERAS and not raw_camera:
+        log("⚠️ This build has no raw camera path — using h264")
+        camera = "h264"
+    if camera in RAW_CAMERAS and encoder == COPY:
+        log("⚠️ LOFI_ENCODER=copy needs the H.264 camera — encoding raw frames with libx264")
+        encoder = LIBX264
+
+    if visualiser not in VISUALISERS:
+        log(f"⚠️ Unknown visualiser '{visualiser}' — using ffmpeg showfreqs")
+        visualiser = "ffmpeg"
+    if visualiser == "numpy" and not numpy:
+        log("⚠️ The NumPy visualiser needs python3-numpy — using ffmpeg showfreqs")
+        visualiser = "ffmpeg"
+
+    layout = profile.layout
+    if layout not in LAYOUTS:
+        log(f"⚠️ Unknown overlay layout '{layout}' — using classic")
+        layout = "classic"
+    if layout == "lts":
+        visualiser = "none"                    # the LTS look has no bars
+    if encoder == COPY:
+        layout, visualiser = "none", "none"    # nothing is decoded, so nothing can be drawn
+
+    if feeder not in FEEDERS:
+        log(f"⚠️ Unknown audio feeder '{feeder}' — using {FEEDERS[0]}")
+        feeder = FEEDERS[0]
+    if feeder == "splice" and not SPLICE_AVAILABLE:
+        log("⚠️ LOFI_FEEDER=splice needs Linux os.splice (Python 3.10+) — using the engine")
+        feeder = "engine"
+    if feeder == "splice" and visualiser == "numpy":
+        log("⚠️ The NumPy visualiser needs the engine's PCM — using the engine feeder")
+        feeder = "engine"
+
+    return profile._replace(encoder=encoder, camera=camera, layout=layout,
+                            visualiser=visualiser, feeder=feeder)
@@ -0,0 +1,321 @@
+"""
+Zero-copy PCM forwarding (LOFI_FEEDER=splice).
+
+AudioEngine pulls every decoded byte through Python twice (decoder pipe →
+ring → FIFO) so it can crossfade and tap the visualiser. When a profile
+needs neither, SpliceFeeder hands the decoder's stdout to AUDIO_FIFO with
+os.splice(): the kernel moves pages between the two pipes and the PCM never
+enters this process. The feeder thread wakes ten times a second to move
+100 ms of audio and otherwise sleeps.
+
+    feeder = SpliceFeeder(tracks, AUDIO_FIFO, describe=..., on_track=...)
+    feeder.run(stop_event)
+
+Each decoder's pipe is widened with F_SETPIPE_SZ (PIPE_SIZE, 1 MiB ≈ 6 s
+of audio), which is the decode-ahead buffer; the next track's decoder is
+started while the current one plays, so track changes stay gapless. An
+underrun is padded from one preallocated block of silence. Pacing, FIFO
+reopening and the stats/underrun counters match AudioEngine, so either can
+sit behind register_audio() and the status channel.
+
+Linux only (os.splice, Python 3.10+): SPLICE_AVAILABLE.
+"""
+
+import os
+import time
+import queue
+import fcntl
+import termios
+import threading
+import subprocess
+from array import array
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+from .audio import BYTE_RATE, CHANNELS, FRAME_BYTES, SAMPLE_RATE, WRITE_LEAD_SECONDS
+
+SPLICE_AVAILABLE = hasattr(os, "splice") and hasattr(fcntl, "F_SETPIPE_SZ")
+
+CHUNK_MS = 100                  # audio moved per wake-up
+PIPE_SIZE = 1 << 20             # decoder pipe = decode-ahead buffer
+MIN_PIPE_SIZE = 1 << 16         # the kernel default; never shrink below it
+
+
+def set_pipe_size(fd: int, size: int = PIPE_SIZE) -> int:
+    """
+    Grow a pipe/FIFO buffer to `size` bytes, halving on EPERM
+    (/proc/sys/fs/pipe-max-size) down to the 64 KiB default. Returns the
+    size the kernel actually gave it.
+    """
+    while size > MIN_PIPE_SIZE:
+        try:
+            return fcntl.fcntl(fd, fcntl.F_SETPIPE_SZ, size)
+        except OSError:
+            size //= 2
+    return fcntl.fcntl(fd, fcntl.F_GETPIPE_SZ)
+
+
+def pipe_available(fd: int) -> int:
+    """Bytes waiting in a pipe (FIONREAD), without reading them."""
+    buf = array("i", [0])
+    fcntl.ioctl(fd, termios.FIONREAD, buf, True)
+    return buf[0]
+
+
+def splice_all(src: int, dst: int, count: int) -> int:
+    """Move exactly `count` bytes pipe → pipe (fewer only at EOF)."""
+    done = 0
+    while done < count:
+        n = os.splice(src, dst, count - done, flags=os.SPLICE_F_MOVE)
+        if not n:
+            break
+        done += n
+    return done
+
+
+# -------------------------------------------------------
+# DECODER (stdout pipe is the buffer)
+# -------------------------------------------------------
+class PipeDecoder:
+    """One track decoded by plain ffmpeg into a widened stdout pipe."""
+
+    def __init__(self, track: Path, label: str = "", pipe_size: int = PIPE_SIZE):
+        self.track = track
+        self.label = label or track.stem
+        self.pipe_size = pipe_size
+        self.total_bytes = 0
+        self.announced = False
+        self._proc: Optional[subprocess.Popen] = None
+
+    @property
+    def fd(self) -> int:
+        return self._proc.stdout.fileno()
+
+    def start(self):
+        cmd = [
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-nostdin",
+            "-vn", "-i", str(self.track),
+            "-f", "s16le", "-ar", str(SAMPLE_RATE), "-ac", str(CHANNELS), "pipe:1"
+        ]
+        self._proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                      bufsize=0)
+        self.pipe_size = set_pipe_size(self.fd, self.pipe_size)
+
+    @property
+    def available(self) -> int:
+        return pipe_available(self.fd) if self._proc else 0
+
+    @property
+    def exited(self) -> bool:
+        return self._proc is None or self._proc.poll() is not None
+
+    def close(self):
+        p = self._proc
+        if not p:
+            return
+        if p.poll() is None:
+            try:
+                p.terminate()
+                p.wait(timeout=2)
+            except Exception:
+                try:
+                    p.kill()
+                except Exception:
+                    pass
+        elif p.returncode != 0:
+            print(f"⚠️ Audio decode error for {self.track.name} (ffmpeg rc={p.returncode})")
+        p.stdout.close()
+
+
+# -------------------------------------------------------
+# FEEDER
+# -------------------------------------------------------
+class SpliceFeeder:
+    """
+    Long-lived feeder for AUDIO_FIFO that never copies PCM into Python.
+
+    tracks, describe and on_track behave exactly as for AudioEngine; there
+    is no crossfade and no tap (use AudioEngine for those).
+    """
+
+    def __init__(self, tracks: Iterator[Path], fifo: Path,
+                 describe: Optional[Callable[[Path], str]] = None,
+                 on_track: Optional[Callable[[Path, str], None]] = None,
+                 chunk_ms: int = CHUNK_MS, pipe_size: int = PIPE_SIZE):
+        self.fifo = Path(fifo)
+        self.describe = describe
+        self.on_track = on_track
+        self.pipe_size = pipe_size
+
+        self.chunk_bytes = SAMPLE_RATE * chunk_ms // 1000 * FRAME_BYTES
+        self.chunk_seconds = self.chunk_bytes / BYTE_RATE
+        self._silence = memoryview(bytes(self.chunk_bytes))   # the only PCM we ever own
+
+        self._tracks = tracks
+        self._upcoming: "queue.Queue[PipeDecoder]" = queue.Queue(maxsize=1)
+        self._current: Optional[PipeDecoder] = None
+
+        self.underruns = 0
+        self.tracks_played = 0
+        self.bytes_out = 0
+
+    @property
+    def buffer_fill(self) -> float:
+        """Decoded-ahead fill of the playing track's pipe, 0.0 – 1.0."""
+        cur = self._current
+        if cur is None:
+            return 0.0
+        try:
+            return min(cur.available / cur.pipe_size, 1.0)
+        except (OSError, ValueError):
+            return 0.0
+
+    def stats(self) -> dict:
+        """Snapshot for the status channel."""
+        return {
+            "buffer_fill": round(self.buffer_fill, 3),
+            "underruns": self.underruns,
+            "tracks_played": self.tracks_played,
+        }
+
+    # ---------- threads ----------
+
+    def run(self, stop_event: threading.Event):
+        """Feed AUDIO_FIFO until stop_event is set, reopening it if ffmpeg goes away."""
+        threading.Thread(target=self._prefetch, args=(stop_event,), daemon=True).start()
+
+        try:
+            while not stop_event.is_set():
+                try:
+                    # Blocks until ffmpeg opens the FIFO for reading
+                    fd = os.open(self.fifo, os.O_WRONLY)
+                except FileNotFoundError:
+                    time.sleep(0.5)
+                    continue
+                except OSError as e:
+                    if stop_event.is_set():
+                        break
+                    print(f"❌ Audio FIFO error: {e}")
+                    time.sleep(1)
+                    continue
+                try:
+                    self._pump(fd, stop_event)
+                except BrokenPipeError:
+                    print("⚠️ Audio FIFO broken pipe — FFmpeg likely restarted. Reopening FIFO...")
+                    time.sleep(1)
+                except OSError as e:
+                    if not stop_event.is_set():
+                        print(f"❌ Audio FIFO error: {e}")
+                        time.sleep(1)
+                finally:
+                    os.close(fd)
+        finally:
+            self._shutdown()
+
+    def _prefetch(self, stop_event: threading.Event):
+        for track in self._tracks:
+            if stop_event.is_set():
+                break
+
+            label = track.stem
+            if self.describe:
+                try:
+                    label = self.describe(track)
+                except Exception:
+                    pass
+
+            decoder = PipeDecoder(track, label, self.pipe_size)
+            try:
+                decoder.start()
+            except OSError as e:
+                print(f"❌ Audio decoder error for {track.name}: {e}")
+                continue
+            while not stop_event.is_set():
+                try:
+                    self._upcoming.put(decoder, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+            else:
+                decoder.close()
+                break
+
+    def _pump(self, fd: int, stop_event: threading.Event):
+        started = time.monotonic()
+        sent = 0
+
+        while not stop_event.is_set():
+            self._forward(fd)
+            sent += 1
+
+            delay = started + sent * self.chunk_seconds - WRITE_LEAD_SECONDS - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -1.0:
+                # Reader stalled for a while: rebase the clock instead of bursting
+                started = time.monotonic() - sent * self.chunk_seconds + WRITE_LEAD_SECONDS
+
+    def _shutdown(self):
+        if self._current:
+            self._current.close()
+            self._current = None
+        while True:
+            try:
+                self._upcoming.get_nowait().close()
+            except queue.Empty:
+                break
+
+    # ---------- forwarding ----------
+
+    def _forward(self, fd: int):
+        """Move one chunk decoder → FIFO, switching tracks mid-chunk if needed."""
+        want = self.chunk_bytes
+        filled = 0
+
+        while filled < want:
+            cur = self._current
+            if cur is None:
+                try:
+                    cur = self._current = self._upcoming.get_nowait()
+                except queue.Empty:
+                    break
+
+            # Whole frames only, so a short read never shifts the channels
+            exited = cur.exited
+            n = min(cur.available, want - filled)
+            n -= n % FRAME_BYTES
+            if n:
+                if not cur.announced:
+                    self._announce(cur)
+                n = splice_all(cur.fd, fd, n)
+                cur.total_bytes += n
+                filled += n
+                continue
+
+            if not exited:
+                break       # decoder is alive but behind: underrun
+
+            if not cur.total_bytes:
+                print(f"⚠️ Skipping {cur.track.name} (no audio decoded)")
+            cur.close()     # any stray partial frame goes with the pipe
+            self._current = None
+
+        if filled < want:
+            self._write_silence(fd, want - filled)
+            if self.tracks_played:
+                self.underruns += 1
+        self.bytes_out += want
+
+    def _write_silence(self, fd: int, count: int):
+        out = self._silence[:count]
+        while len(out):
+            out = out[os.write(fd, out):]
+
+    def _announce(self, decoder: PipeDecoder):
+        decoder.announced = True
+        self.tracks_played += 1
+        if self.on_track:
+            try:
+                self.on_track(decoder.track, decoder.label)
+            except Exception as e:
+                print(f"⚠️ Track callback failed: {e}")
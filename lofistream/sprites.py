@@ -0,0 +1,119 @@
+"""
+Pre-rendered text overlays.
+
+`drawtext=textfile=...:reload=1` makes ffmpeg re-read and re-rasterise the
+text file on every frame even though now-playing changes once a track.
+Instead the streamer renders the text once into a fixed-size RGBA PNG,
+keeps recent renders in a small LRU (so a reshuffled playlist or a
+returning title card costs nothing) and swaps the PNG atomically only when
+the text changes. ffmpeg reads it as a looping image2 input at 1 fps and
+overlays it at a fixed position — no per-frame file I/O or font work.
+
+    NP = TextSprite(RUNTIME_DIR / "nowplaying.png", (1200, 40), font=FONT)
+    NP.show("Now Playing: Artist - Title")      # renders + swaps only if changed
+    cmd += NP.ffmpeg_input()
+
+The canvas never changes size, so a new track doesn't force ffmpeg to
+rebuild its filter graph. Needs Pillow (SPRITES_AVAILABLE); callers keep
+their drawtext path when it is missing.
+"""
+
+import io
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from .nowplaying import write_atomic
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+    SPRITES_AVAILABLE = True
+except ImportError:
+    SPRITES_AVAILABLE = False
+
+DEFAULT_FONT = Path("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf")
+FONT_SIZE = 24
+STROKE = 2
+SPRITE_CACHE = 16
+
+
+@lru_cache(maxsize=8)
+def load_font(path: Optional[str], size: int):
+    try:
+        return ImageFont.truetype(path or str(DEFAULT_FONT), size)
+    except OSError:
+        return ImageFont.load_default()
+
+
+def render_text(text: str, font_path: Optional[Path] = None, size: int = FONT_SIZE,
+                canvas: Optional[Tuple[int, int]] = None, align: str = "left",
+                line_spacing: int = 6) -> "Image.Image":
+    """
+    White text with a black outline (drawtext's borderw=2 look) on a
+    transparent background. With `canvas` the image has exactly that size
+    and the text is aligned inside it; otherwise it is cropped to the text.
+    """
+    font = load_font(str(font_path) if font_path else None, size)
+    probe = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    left, top, right, bottom = probe.multiline_textbbox(
+        (0, 0), text or " ", font=font, stroke_width=STROKE, spacing=line_spacing, align=align)
+    tw, th = right - left, bottom - top
+
+    w, h = canvas if canvas else (tw + 2, th + 2)
+    img = Image.new("RGBA", (w, h), (0, 0, 0, 0))
+    if text:
+        x = {"left": 1, "right": w - tw - 1, "center": (w - tw) // 2}[align] - left
+        ImageDraw.Draw(img).multiline_text(
+            (x, 1 - top), text, font=font, fill=(255, 255, 255, 255),
+            stroke_width=STROKE, stroke_fill=(0, 0, 0, 255), spacing=line_spacing, align=align)
+    return img
+
+
+class TextSprite:
+    """One overlay slot on disk, re-rendered (via an LRU of PNG bytes) only on change."""
+
+    def __init__(self, path: Path, canvas: Tuple[int, int], font: Optional[Path] = None,
+                 size: int = FONT_SIZE, align: str = "right", cache: int = SPRITE_CACHE):
+        self.path = Path(path)
+        self.canvas = canvas
+        self.font = font
+        self.size = size
+        self.align = align
+        self.limit = cache
+        self.current: Optional[str] = None
+        self.renders = 0
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def png(self, text: str) -> bytes:
+        data = self._cache.get(text)
+        if data is not None:
+            self._cache.move_to_end(text)
+            return data
+        buf = io.BytesIO()
+        render_text(text, self.font, self.size, self.canvas, self.align).save(buf, "PNG")
+        data = buf.getvalue()
+        self.renders += 1
+        self._cache[text] = data
+        if len(self._cache) > self.limit:
+            self._cache.popitem(last=False)
+        return data
+
+    def show(self, text: str) -> bool:
+        """Point the overlay at `text`. Returns False when nothing changed."""
+        with self._lock:
+            if text == self.current and self.path.exists():
+                return False
+            try:
+                write_atomic(self.path, self.png(text))   # ffmpeg never sees a half-written PNG
+            except OSError as e:
+                print(f"⚠️ Could not update overlay sprite {self.path}: {e}")
+                return False
+            self.current = text
+            return True
+
+    def ffmpeg_input(self) -> List[str]:
+        # image2 re-opens the file on every loop; once a second is plenty
+        return ["-f", "image2", "-loop", "1", "-framerate", "1", "-i", str(self.path)]
@@ -0,0 +1,74 @@
+"""
+Streamer → dashboard status channel.
+
+The streamer publishes small JSON datagrams on a Unix socket
+(AF_UNIX/SOCK_DGRAM) that the dashboard binds at STATUS_SOCKET. Sends are
+non-blocking and fire-and-forget: with no dashboard listening they are
+simply dropped, so the stream never waits on the UI.
+
+Every message carries the full current state, so a dashboard that
+restarts is back in sync with the next heartbeat:
+
+    update(now_playing=...)    merge fields and send right away
+    provide("audio", fn)       fn() is sampled into "audio" every heartbeat
+"""
+
+import os
+import json
+import time
+import socket
+import threading
+from pathlib import Path
+from typing import Callable, Dict
+
+STATUS_SOCKET = Path(os.environ.get("LOFI_STATUS_SOCKET", "/tmp/lofi_status.sock"))
+HEARTBEAT = 1.0
+
+
+class StatusPublisher:
+    def __init__(self, version: str, path: Path = STATUS_SOCKET, interval: float = HEARTBEAT):
+        self.path = str(path)
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._state: Dict[str, object] = {"version": version, "pid": os.getpid(),
+                                          "started": time.time()}
+        self._providers: Dict[str, Callable[[], object]] = {}
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)
+
+    def update(self, **fields):
+        with self._lock:
+            self._state.update(fields)
+        self.publish()
+
+    def provide(self, name: str, fn: Callable[[], object]):
+        with self._lock:
+            self._providers[name] = fn
+
+    def withdraw(self, name: str):
+        with self._lock:
+            self._providers.pop(name, None)
+            self._state.pop(name, None)
+
+    def start(self, stop_event: threading.Event) -> threading.Thread:
+        t = threading.Thread(target=self._run, args=(stop_event,), daemon=True)
+        t.start()
+        return t
+
+    def _run(self, stop_event: threading.Event):
+        while not stop_event.wait(self.interval):
+            self.publish()
+
+    def publish(self):
+        with self._lock:
+            for name, fn in self._providers.items():
+                try:
+                    self._state[name] = fn()
+                except Exception:
+                    pass
+            self._state["ts"] = time.time()
+            payload = json.dumps(self._state, default=str).encode()
+        try:
+            self._sock.sendto(payload, self.path)
+        except OSError:
+            pass        # no dashboard listening (or it is busy): drop, next heartbeat resyncs
@@ -0,0 +1,249 @@
+"""
+FFmpeg -progress telemetry shared by every build.
+
+With `-progress pipe:2` ffmpeg writes a block of key=value lines to stderr
+roughly twice a second, closed by `progress=continue` (or `progress=end`):
+
+    frame=1234  fps=20.00  bitrate=1502.3kbits/s  total_size=2318336
+    out_time_us=61700000  dup_frames=0  drop_frames=3  speed=1.00x
+
+FFmpegTelemetry folds each block into a ProgressSample with per-interval
+rates (frames/s, speed from out_time, drops/s, kbit/s from total_size) and
+keeps a short window of them for moving averages. ffmpeg's own fps= and
+speed= are running totals since the session started, so they are kept for
+display only: after an hour at 1.00x they would hide a drop for minutes. Everything else on stderr is ordinary log
+output: errors are remembered for the watchdog and echoed to the journal.
+
+    tel = FFmpegTelemetry()
+    start_reader(ff, tel, stop_event)
+    tel.progress_age()     # seconds since the last block (stall detection)
+    tel.warnings()         # slow encode / dropping frames, for the watchdog
+"""
+
+import time
+import threading
+from collections import deque
+from typing import Dict, NamedTuple, Optional
+
+from .metrics import REGISTRY
+
+WINDOW = 60            # samples kept for moving averages (~30 s at ffmpeg's 0.5 s period)
+SLOW_SPEED = 0.97      # averaged per-interval speed below this = encoder not keeping up with realtime
+DROP_RATE_WARN = 0.5   # averaged dropped frames per second worth warning about
+
+ERROR_WORDS = ("error", "failed", "connection", "broken pipe", "av_interleaved_write_frame")
+
+
+class ProgressSample(NamedTuple):
+    ts: float                  # monotonic time the block completed
+    interval: float            # seconds since the previous block (0 for the first)
+    frame: int
+    fps: float                 # ffmpeg's running fps since the start (display only)
+    speed: float               # ffmpeg's running speed since the start (display only)
+    bitrate_kbps: float        # ffmpeg's running average bitrate
+    total_size: int            # bytes written so far
+    out_time: float            # seconds of output written
+    drop_frames: int
+    dup_frames: int
+    frame_rate: float          # frames/s over this interval
+    speed_rate: float          # output seconds per wall second over this interval (1.0 = realtime)
+    drop_rate: float           # dropped frames/s over this interval
+    dup_rate: float
+    send_kbps: float           # kbit/s actually written over this interval
+    ended: bool
+
+
+def _number(raw: Optional[str], suffix: str = "") -> float:
+    if not raw:
+        return 0.0
+    raw = raw.strip()
+    if suffix and raw.endswith(suffix):
+        raw = raw[:-len(suffix)]
+    try:
+        return float(raw)
+    except ValueError:      # "N/A" before the first packet goes out
+        return 0.0
+
+
+class FFmpegTelemetry:
+    def __init__(self, window: int = WINDOW):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.last_progress_ts = self.started
+        self.last_line_ts = self.started
+        self.last_error_line = ""
+        self.seen_broken_pipe = False
+        self.latest: Optional[ProgressSample] = None
+        self.samples: deque = deque(maxlen=window)
+        self.blocks = 0
+        self._block: Dict[str, str] = {}
+
+    # ---------- ingest ----------
+
+    def update_line(self, line: str) -> bool:
+        """Feed one stderr line; returns True if it was part of a progress block."""
+        now = time.monotonic()
+        key, sep, value = line.partition("=")
+        with self.lock:
+            self.last_line_ts = now
+            if sep and key.isidentifier() and "=" not in value:
+                if key == "progress":
+                    self._finish_block(now, value.strip() == "end")
+                else:
+                    self._block[key] = value.strip()
+                return True
+
+            low = line.lower()
+            if "broken pipe" in low or "av_interleaved_write_frame" in low:
+                self.seen_broken_pipe = True
+                self.last_error_line = line.strip()
+            elif any(w in low for w in ERROR_WORDS):
+                self.last_error_line = line.strip()
+            return False
+
+    def _finish_block(self, now: float, ended: bool):
+        b, self._block = self._block, {}
+        prev = self.latest
+        frame = int(_number(b.get("frame")))
+        total_size = int(_number(b.get("total_size")))
+        drops = int(_number(b.get("drop_frames")))
+        dups = int(_number(b.get("dup_frames")))
+        if "out_time_us" in b:
+            out_time = _number(b.get("out_time_us")) / 1e6
+        else:   # older ffmpeg: out_time_ms is (confusingly) also microseconds
+            out_time = _number(b.get("out_time_ms")) / 1e6
+
+        interval = now - prev.ts if prev else 0.0
+        if prev and interval > 0:
+            frame_rate = max(0, frame - prev.frame) / interval
+            speed_rate = max(0.0, out_time - prev.out_time) / interval
+            drop_rate = max(0, drops - prev.drop_frames) / interval
+            dup_rate = max(0, dups - prev.dup_frames) / interval
+            send_kbps = max(0, total_size - prev.total_size) * 8 / 1000 / interval
+        else:
+            frame_rate = speed_rate = drop_rate = dup_rate = send_kbps = 0.0
+
+        sample = ProgressSample(
+            ts=now, interval=interval, frame=frame,
+            fps=_number(b.get("fps")),
+            speed=_number(b.get("speed"), "x"),
+            bitrate_kbps=_number(b.get("bitrate"), "kbits/s"),
+            total_size=total_size, out_time=out_time,
+            drop_frames=drops, dup_frames=dups,
+            frame_rate=frame_rate, speed_rate=speed_rate, drop_rate=drop_rate, dup_rate=dup_rate,
+            send_kbps=send_kbps, ended=ended,
+        )
+        self.latest = sample
+        if interval > 0:
+            self.samples.append(sample)
+        self.blocks += 1
+        self.last_progress_ts = now
+
+    # ---------- views ----------
+
+    def progress_age(self) -> float:
+        """Seconds since the last complete progress block (or since start)."""
+        return time.monotonic() - self.last_progress_ts
+
+    def averages(self) -> Dict[str, float]:
+        """Moving averages over the sample window (empty until two blocks arrived)."""
+        with self.lock:
+            window = list(self.samples)
+        if not window:
+            return {}
+        span = sum(s.interval for s in window) or 1.0
+        return {
+            "frame_rate": sum(s.frame_rate * s.interval for s in window) / span,
+            "speed_rate": sum(s.speed_rate * s.interval for s in window) / span,
+            "drop_rate": sum(s.drop_rate * s.interval for s in window) / span,
+            "dup_rate": sum(s.dup_rate * s.interval for s in window) / span,
+            "send_kbps": sum(s.send_kbps * s.interval for s in window) / span,
+            "window_seconds": span,
+        }
+
+    def warnings(self) -> Dict[str, str]:
+        """Sustained problems short of a stall, keyed "slow" / "dropping"."""
+        avg = self.averages()
+        if not avg or avg["window_seconds"] < 10:
+            return {}
+        out = {}
+        if avg["speed_rate"] < SLOW_SPEED:
+            out["slow"] = (f"encoder below realtime (speed {avg['speed_rate']:.2f}x over "
+                           f"{avg['window_seconds']:.0f}s)")
+        if avg["drop_rate"] > DROP_RATE_WARN:
+            out["dropping"] = f"dropping {avg['drop_rate']:.1f} frames/s"
+        return out
+
+    def snapshot(self):
+        with self.lock:
+            return (self.last_progress_ts, self.last_line_ts, self.last_error_line, self.seen_broken_pipe)
+
+    def status(self) -> dict:
+        """Latest block + moving averages for the dashboard status channel."""
+        with self.lock:
+            s = self.latest
+            out = {
+                "progress_age": round(time.monotonic() - self.last_progress_ts, 1),
+                "last_error": self.last_error_line,
+                "broken_pipe": self.seen_broken_pipe,
+            }
+        if s is not None:
+            out.update(frame=s.frame, fps=s.fps, speed=s.speed, bitrate=s.bitrate_kbps,
+                       frame_rate=round(s.frame_rate, 2), speed_rate=round(s.speed_rate, 3),
+                       total_size=s.total_size, out_time=round(s.out_time, 1),
+                       drop_frames=s.drop_frames, dup_frames=s.dup_frames)
+        out["avg"] = {k: round(v, 3) for k, v in self.averages().items()}
+        return out
+
+    def register_metrics(self):
+        """Point the encoder metrics at this (session's) telemetry."""
+        def latest(field):
+            return lambda: getattr(self.latest, field) if self.latest else None
+
+        REGISTRY.gauge("lofi_encoder_fps", "Encoder output frame rate over the last interval",
+                       fn=latest("frame_rate"))
+        REGISTRY.gauge("lofi_encoder_speed_ratio",
+                       "Encode speed relative to realtime over the last interval",
+                       fn=latest("speed_rate"))
+        REGISTRY.gauge("lofi_encoder_bitrate_kbps", "Output bitrate reported by ffmpeg",
+                       fn=latest("bitrate_kbps"))
+        REGISTRY.gauge("lofi_encoder_send_kbps", "Bytes written to the output over the last interval",
+                       fn=latest("send_kbps"))
+        REGISTRY.counter("lofi_encoder_frames_total", "Frames encoded this session",
+                         fn=latest("frame"))
+        REGISTRY.counter("lofi_encoder_dropped_frames_total", "Frames dropped this session",
+                         fn=latest("drop_frames"))
+        REGISTRY.counter("lofi_encoder_duplicated_frames_total", "Frames duplicated this session",
+                         fn=latest("dup_frames"))
+        REGISTRY.gauge("lofi_encoder_progress_age_seconds", "Seconds since the last progress block",
+                       fn=self.progress_age)
+
+
+# -------------------------------------------------------
+# stderr reader
+# -------------------------------------------------------
+def _reader(ff, tel: FFmpegTelemetry, stop_event: threading.Event, echo: str, log):
+    try:
+        for line in ff.stderr:
+            if stop_event.is_set():
+                break
+            line = line.strip()
+            if not line or tel.update_line(line):
+                continue
+            low = line.lower()
+            if echo == "all" or (echo == "errors" and any(w in low for w in ERROR_WORDS)):
+                log(f"⚠️ FFmpeg: {line}")
+    except (OSError, ValueError):
+        pass
+
+
+def start_reader(ff, tel: FFmpegTelemetry, stop_event: threading.Event,
+                 echo: str = "errors", log=print) -> threading.Thread:
+    """
+    Drain ff.stderr (Popen with stderr=PIPE, text=True) into `tel` so the
+    pipe never fills up. `echo` picks which non-progress lines reach the
+    journal: "all", "errors" or "none".
+    """
+    t = threading.Thread(target=_reader, args=(ff, tel, stop_event, echo, log), daemon=True)
+    t.start()
+    return t
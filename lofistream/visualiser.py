@@ -0,0 +1,197 @@
+"""
+In-process audio visualiser (replaces ffmpeg's showfreqs).
+
+`[1:a]showfreqs=...` runs an FFT for every video frame inside the main
+encoder graph just to draw a 140x28 strip of bars. The audio engine
+already has every PCM block in hand, so it hands each one to feed()
+(AudioEngine(tap=viz.feed)); a writer thread then, once per video frame,
+runs one windowed NumPy FFT over the newest samples, bins it into log-
+spaced bands and paints the bars into a tiny RGBA frame that goes to its
+own FIFO as rawvideo. ffmpeg only has to overlay it.
+
+    viz = Visualiser(VIZ_FIFO, fps)
+    AudioEngine(..., tap=viz.feed)
+    cmd += viz.ffmpeg_input()          # then [N:v]overlay=40:y
+    viz.start(stop_event)
+
+Tunables (env): LOFI_VIZ_BANDS (7), LOFI_VIZ_SMOOTHING (0.7, per-frame
+decay of the bars, 0 = none), LOFI_VIZ_COLOR (CCCCCC). Needs NumPy
+(VISUALISER_AVAILABLE); callers keep showfreqs without it.
+
+The FIFO is meant to be created once and kept across ffmpeg restarts: the
+writer reopens it after a broken pipe, and a writer parked in open() just
+waits for the next session's ffmpeg.
+"""
+
+import os
+import time
+import threading
+from pathlib import Path
+from typing import List, Tuple
+
+try:
+    import numpy as np
+    VISUALISER_AVAILABLE = True
+except ImportError:
+    VISUALISER_AVAILABLE = False
+
+from .audio import CHANNELS, SAMPLE_RATE, WRITE_LEAD_SECONDS
+
+BANDS = int(os.environ.get("LOFI_VIZ_BANDS", "7"))
+SMOOTHING = float(os.environ.get("LOFI_VIZ_SMOOTHING", "0.7"))
+COLOR = os.environ.get("LOFI_VIZ_COLOR", "CCCCCC")
+
+SIZE = (140, 28)
+FFT_SIZE = 2048            # ~46 ms at 44.1 kHz, about one video frame
+HISTORY = 32768            # mono samples kept; must cover FFT_SIZE + the engine's lead
+F_MIN, F_MAX = 50.0, 16000.0
+FLOOR_DB = -60.0           # bottom of the bars; 0 dB = full-scale tone
+GAP = 2                    # pixels between bars
+WRITE_LEAD = 0.2           # frames may go out this far ahead of the clock
+
+
+def parse_color(hex_rgb: str) -> Tuple[int, int, int]:
+    h = hex_rgb.strip().lstrip("#")
+    if h.lower().startswith("0x"):
+        h = h[2:]
+    try:
+        v = int(h[:6], 16)
+    except ValueError:
+        v = 0xCCCCCC
+    return (v >> 16) & 0xFF, (v >> 8) & 0xFF, v & 0xFF
+
+
+class Spectrum:
+    """Mono sample history + band levels (0..1) with peak-and-decay smoothing."""
+
+    def __init__(self, bands: int = BANDS, smoothing: float = SMOOTHING,
+                 fft_size: int = FFT_SIZE, lag: float = WRITE_LEAD_SECONDS):
+        self.bands = max(1, bands)
+        self.smoothing = min(max(smoothing, 0.0), 0.99)
+        self.fft_size = fft_size
+        self.lag = int(lag * SAMPLE_RATE)      # the engine writes this far ahead of playback
+        self._hist = np.zeros(HISTORY, dtype=np.float32)
+        self._written = 0
+        self._window = np.hanning(fft_size).astype(np.float32)
+        self._frame = np.empty(fft_size, dtype=np.float32)
+        self.level = np.zeros(self.bands, dtype=np.float32)
+
+        freqs = np.fft.rfftfreq(fft_size, 1.0 / SAMPLE_RATE)
+        edges = np.searchsorted(freqs, np.geomspace(F_MIN, F_MAX, self.bands + 1))
+        # every band gets at least one bin, even with many bands
+        edges = np.maximum(edges, edges[0] + np.arange(self.bands + 1))
+        self._starts = edges[:-1]
+        self._stop = int(edges[-1])
+        self._ref = (fft_size / 4.0) ** 2     # Hann-windowed full-scale sine
+
+    def feed(self, block):
+        """One s16le interleaved PCM block from the audio engine."""
+        pcm = np.frombuffer(block, dtype=np.int16).reshape(-1, CHANNELS)
+        mono = pcm.mean(axis=1, dtype=np.float32) * (1.0 / 32768)
+        n = len(mono)
+        pos = self._written % HISTORY
+        first = min(n, HISTORY - pos)
+        self._hist[pos:pos + first] = mono[:first]
+        if n > first:
+            self._hist[:n - first] = mono[first:]
+        self._written += n
+
+    def update(self) -> "np.ndarray":
+        """Levels for the samples that are being heard right now."""
+        end = self._written - self.lag
+        if end < self.fft_size:
+            new = np.zeros(self.bands, dtype=np.float32)
+        else:
+            idx = np.arange(end - self.fft_size, end) % HISTORY
+            np.multiply(self._hist[idx], self._window, out=self._frame)
+            power = np.abs(np.fft.rfft(self._frame)[:self._stop]) ** 2
+            energy = np.add.reduceat(power, self._starts)
+            db = 10.0 * np.log10(energy / self._ref + 1e-12)
+            new = np.clip(1.0 - db / FLOOR_DB, 0.0, 1.0).astype(np.float32)
+        np.maximum(new, self.level * self.smoothing, out=self.level)
+        return self.level
+
+
+class Visualiser:
+    """Spectrum → RGBA bars → rawvideo FIFO, paced to the video frame rate."""
+
+    def __init__(self, fifo: Path, fps: int, size: Tuple[int, int] = SIZE,
+                 bands: int = BANDS, smoothing: float = SMOOTHING, color: str = COLOR):
+        self.fifo = Path(fifo)
+        self.fps = fps
+        self.width, self.height = size
+        self.spectrum = Spectrum(bands, smoothing)
+        self.frames_out = 0
+
+        w, h = size
+        n = self.spectrum.bands
+        self._frame = np.zeros((h, w, 4), dtype=np.uint8)
+        self._frame[..., :3] = parse_color(color)
+        self._alpha = np.empty((h, w), dtype=bool)
+        self._rows = np.arange(h).reshape(-1, 1)
+        # column → band, or n for the gaps between bars (never lit)
+        pitch = (w + GAP) / n
+        cols = np.arange(w)
+        band = np.minimum((cols / pitch).astype(int), n - 1)
+        in_gap = cols - np.floor(band * pitch) >= pitch - GAP
+        self._col_band = np.where(in_gap, n, band)
+        self._tops = np.empty(n + 1, dtype=np.int64)
+        self._tops[n] = h
+        self._heights = np.empty(n, dtype=np.float32)
+
+    def feed(self, block):
+        self.spectrum.feed(block)
+
+    def render(self) -> memoryview:
+        levels = self.spectrum.update()
+        np.rint(self.height * (1.0 - levels), out=self._heights)
+        self._tops[:-1] = self._heights
+        np.greater_equal(self._rows, self._tops[self._col_band], out=self._alpha)
+        self._frame[..., 3] = self._alpha
+        self._frame[..., 3] *= 255
+        return memoryview(self._frame).cast("B")
+
+    def ffmpeg_input(self) -> List[str]:
+        return [
+            "-thread_queue_size", "64",
+            "-f", "rawvideo", "-pix_fmt", "rgba",
+            "-video_size", f"{self.width}x{self.height}",
+            "-framerate", str(self.fps),
+            "-i", str(self.fifo),
+        ]
+
+    def start(self, stop_event: threading.Event) -> threading.Thread:
+        t = threading.Thread(target=self.run, args=(stop_event,), daemon=True)
+        t.start()
+        return t
+
+    def run(self, stop_event: threading.Event):
+        while not stop_event.is_set():
+            try:
+                fd = os.open(self.fifo, os.O_WRONLY)     # blocks until ffmpeg opens its end
+            except OSError:
+                stop_event.wait(0.5)
+                continue
+            try:
+                self._pump(fd, stop_event)
+            except BrokenPipeError:
+                pass        # ffmpeg went away: reopen for the next session
+            finally:
+                os.close(fd)
+
+    def _pump(self, fd: int, stop_event: threading.Event):
+        started = time.monotonic()
+        sent = 0
+        fps = self.fps      # set per session by the streamer before ffmpeg opens the FIFO
+        while not stop_event.is_set():
+            view = self.render()
+            while view:
+                view = view[os.write(fd, view):]
+            sent += 1
+            self.frames_out += 1
+
+            delay = started + sent / fps - WRITE_LEAD - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -1.0:
+                started = time.monotonic() - sent / fps + WRITE_LEAD
@@ -0,0 +1,172 @@
+"""
+Live playlist folder watcher.
+
+Uses Linux inotify (through ctypes, no extra packages) to apply adds,
+removes and renames in PLAYLIST_DIR straight to the TrackLibrary, so new
+music rsynced onto a live box joins the running shuffle within a second
+and deleted files drop out before they reach the decoder. If inotify is
+not available it falls back to polling TrackLibrary.sync(), which only
+walks the folder when its mtime changes.
+"""
+
+import os
+import errno
+import select
+import struct
+import threading
+import ctypes
+import ctypes.util
+from pathlib import Path
+
+from .library import TrackLibrary
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0o2000000)
+
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF)
+
+_EVENT = struct.Struct("iIII")
+
+POLL_INTERVAL = 5.0
+
+
+def _load_libc():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class PlaylistWatcher:
+    """Keeps a TrackLibrary current while the stream runs."""
+
+    def __init__(self, library: TrackLibrary, poll_interval: float = POLL_INTERVAL):
+        self.library = library
+        self.poll_interval = poll_interval
+        self.mode = "stopped"
+
+    def start(self, stop_event: threading.Event) -> threading.Thread:
+        t = threading.Thread(target=self.run, args=(stop_event,), daemon=True)
+        t.start()
+        return t
+
+    def run(self, stop_event: threading.Event):
+        while not stop_event.is_set():
+            fd = self._open_inotify()
+            if fd is None:
+                self._run_polling(stop_event)
+                return
+            try:
+                self._run_inotify(fd, stop_event)
+            finally:
+                os.close(fd)
+            # Folder was deleted/moved: resync once it is back
+            if not stop_event.is_set():
+                stop_event.wait(self.poll_interval)
+                self._sync()
+
+    # ---------- inotify ----------
+
+    def _open_inotify(self):
+        libc = _load_libc()
+        if libc is None:
+            return None
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            print(f"⚠️ inotify unavailable ({os.strerror(ctypes.get_errno())}) — polling playlist folder")
+            return None
+        wd = libc.inotify_add_watch(fd, os.fsencode(str(self.library.directory)), WATCH_MASK)
+        if wd < 0:
+            print(f"⚠️ Cannot watch {self.library.directory} ({os.strerror(ctypes.get_errno())}) — polling")
+            os.close(fd)
+            return None
+        if self.mode != "inotify":
+            print(f"👀 Watching {self.library.directory} (inotify)")
+        self.mode = "inotify"
+        return fd
+
+    def _run_inotify(self, fd: int, stop_event: threading.Event):
+        poller = select.poll()
+        poller.register(fd, select.POLLIN)
+        directory = self.library.directory
+
+        while not stop_event.is_set():
+            if not poller.poll(1000):
+                continue
+            try:
+                data = os.read(fd, 64 * 1024)
+            except OSError as e:
+                if e.errno == errno.EAGAIN:
+                    continue
+                raise
+
+            moved_from = {}
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = _EVENT.unpack_from(data, offset)
+                offset += _EVENT.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+
+                if mask & IN_Q_OVERFLOW:
+                    self._sync(force=True)
+                    continue
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                    print(f"⚠️ Playlist folder went away: {directory}")
+                    return
+                if mask & IN_ISDIR or not name:
+                    continue
+
+                path = directory / os.fsdecode(name)
+                if mask & IN_MOVED_FROM:
+                    moved_from[cookie] = path
+                elif mask & IN_MOVED_TO:
+                    old = moved_from.pop(cookie, None)
+                    if old is not None and old in self.library:
+                        self._apply(self.library.rename, old, path, verb="renamed")
+                    else:
+                        self._apply(self.library.add, path, verb="added")
+                elif mask & IN_CLOSE_WRITE:
+                    self._apply(self.library.add, path, verb="added")
+                elif mask & IN_DELETE:
+                    self._apply(self.library.remove, path, verb="removed")
+
+            # Moved out of the folder (no matching MOVED_TO in this batch)
+            for path in moved_from.values():
+                self._apply(self.library.remove, path, verb="removed")
+
+    def _apply(self, fn, *paths: Path, verb: str):
+        try:
+            if fn(*paths):
+                print(f"🎶 Playlist {verb}: {paths[-1].name}")
+        except Exception as e:
+            print(f"⚠️ Playlist update failed for {paths[-1].name}: {e}")
+
+    # ---------- polling fallback ----------
+
+    def _run_polling(self, stop_event: threading.Event):
+        self.mode = "polling"
+        print(f"👀 Watching {self.library.directory} (polling every {self.poll_interval:.0f}s)")
+        while not stop_event.wait(self.poll_interval):
+            self._sync()
+
+    def _sync(self, force: bool = False):
+        try:
+            if self.library.sync(force=force):
+                print(f"🎶 Playlist updated: {len(self.library.tracks())} tracks")
+        except Exception as e:
+            print(f"⚠️ Playlist rescan failed: {e}")
@@ -1,13 +1,22 @@
 #!/usr/bin/env python3
 import os
+import math
+import io
 import subprocess
 from pathlib import Path
 import shutil
 import csv
-import uuid
+import glob
+import json
+import hashlib
+import argparse
+import threading
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
 # -------------------------------------------------------
-#  LOFI TRACK CLEANER — PRO EDITION (v3.2 BPM, 90s WAV)
+#  LOFI TRACK CLEANER — PRO EDITION (v3.5 native BPM)
 #  GENDEMIK DIGITAL · Ms Stevie Woo
 # -------------------------------------------------------
 
@@ -18,36 +27,78 @@ BACKUP = BASE_DIR / "Sounds_Originals"
 
 PLAYLIST_OUT = BASE_DIR / "cleaned_playlist.txt"
 ANALYSIS_CSV = BASE_DIR / "track_analysis.csv"
+MANIFEST_FILE = BASE_DIR / "cleaner_manifest.json"
+
+# Bump whenever build_audio_filter_chain() or the encode settings change,
+# so files cleaned by an older chain get cleaned again.
+FILTER_CHAIN_VERSION = "3.4-1"
+
+CSV_FIELDS = [
+    "filename", "duration_sec", "silent_warning", "bpm_estimate", "bpm_confidence",
+    "loudness_lufs", "loudness_range_lu", "true_peak_dbfs",
+    "max_volume_db", "mean_volume_db",
+]
 
 SUPPORTED = {".mp3", ".wav", ".flac", ".m4a", ".aac", ".ogg"}
 MAC_TRASH = {"._", ".DS_Store", "Thumbs.db"}
 
-# Use RAM for temp WAVs if possible
-TMP_DIR = Path("/dev/shm") if Path("/dev/shm").exists() else Path("/tmp")
+# BPM analysis window (streamed from the analysis decode, mono float PCM)
+BPM_SECONDS = 90
+BPM_RATES = {"numpy": 11025, "aubio": 44100}
+
+# NumPy tempo estimator: onset envelope frames and tempo search range
+ONSET_WIN = 1024
+ONSET_HOP = 256
+BPM_MIN = 60.0
+BPM_MAX = 200.0
+BPM_PRIOR = 90.0           # log-normal tempo prior centre (lofi sits ~70-95)
+BPM_PRIOR_OCTAVES = 1.0
+ONSET_BANDS = 24           # log-spaced bands, so kicks count as much as hats
+HALF_TIME_RATIO = 0.65     # beat-lag / bar-lag autocorrelation needed to double up
+BPM_MIN_CONFIDENCE = 0.1   # below this it is noise, not a beat
+
+SILENT_MAX_DB = -50.0
+
+# Loudness target (EBU R128 style, streaming level)
+LOUDNORM_I = -14.0
+LOUDNORM_TP = -1.5
+LOUDNORM_LRA = 11.0
+
+# ----- BPM backends: NumPy (built in), aubio (optional) -----
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
 
-# ----- AUBIO (BPM) -----
 try:
     import aubio
-    AUBIO_AVAILABLE = True
+    AUBIO_AVAILABLE = NUMPY_AVAILABLE
 except ImportError:
     AUBIO_AVAILABLE = False
 
+BPM_BACKENDS = [b for b, ok in (("numpy", NUMPY_AVAILABLE), ("aubio", AUBIO_AVAILABLE)) if ok]
+
+# Set by main() (and the pool initializer); None disables BPM
+_BPM_BACKEND = BPM_BACKENDS[0] if BPM_BACKENDS else None
+
 
 # -------------------------------------------------------
 #  Helpers
 # -------------------------------------------------------
 
 def banner():
-    print("\n🌙 LOFI TRACK CLEANER — PRO EDITION (v3.2 BPM)")
+    print("\n🌙 LOFI TRACK CLEANER — PRO EDITION (v3.5)")
     print("---------------------------------------------------")
     print(f"🎵 Sounds folder: {SOUNDS}")
     print("🎧 Output: MP3 192k + EBU R128 + Trim + Fades")
     print("🧹 Features: junk deletion • corruption detection")
     print("             silence trim • fade in/out • playlist")
-    if AUBIO_AVAILABLE:
-        print("🪩 BPM detection: ENABLED (aubio, 90s WAV analysis)")
+    print("📈 Analysis: one decode per file (volume + R128 loudness + BPM)")
+    if _BPM_BACKEND:
+        print(f"🪩 BPM detection: ENABLED ({_BPM_BACKEND}, first {BPM_SECONDS}s streamed)")
     else:
-        print("🪩 BPM detection: DISABLED (install python3-aubio)")
+        print("🪩 BPM detection: DISABLED (install python3-numpy)")
     print("---------------------------------------------------\n")
 
 
@@ -55,74 +106,155 @@ def is_junk(name: str) -> bool:
     return name.startswith("._") or name in MAC_TRASH or name.startswith(".")
 
 
-def ffprobe_duration(file: Path) -> float:
-    """Return track duration in seconds (float) or -1 on error."""
+def probe_file(file: Path):
+    """
+    Read stream info + duration from the container headers (no decode).
+    Returns {"duration": float} or None if there is no readable audio stream.
+    """
     try:
         result = subprocess.run(
             [
-                "ffprobe",
-                "-v", "error",
-                "-show_entries", "format=duration",
-                "-of", "default=noprint_wrappers=1:nokey=1",
+                "ffprobe", "-v", "error", "-hide_banner",
+                "-show_streams", "-show_format", "-of", "json",
                 str(file),
             ],
             capture_output=True,
             text=True,
         )
-        out = result.stdout.strip()
-        if not out:
-            return -1
-        return float(out)
+        info = json.loads(result.stdout or "{}")
     except Exception:
-        return -1
+        return None
 
+    audio = [st for st in info.get("streams", []) if st.get("codec_type") == "audio"]
+    if not audio:
+        return None
 
-def is_corrupt(file: Path) -> bool:
-    """Return True if ffprobe cannot read an audio stream."""
+    duration = -1.0
+    for raw in (info.get("format", {}).get("duration"), audio[0].get("duration")):
+        try:
+            duration = float(raw)
+            break
+        except (TypeError, ValueError):
+            continue
+
+    return {"duration": duration}
+
+
+def _summary_value(line: str):
     try:
-        result = subprocess.run(
-            ["ffprobe", "-v", "error", "-hide_banner", "-show_streams", str(file)],
-            capture_output=True,
-            text=True,
-        )
-        return "codec_type=audio" not in result.stdout
+        return float(line.split(":", 1)[1].split()[0])
     except Exception:
-        return True
+        return None
+
 
+def parse_analysis_log(stderr: str) -> dict:
+    """Pull volumedetect and ebur128 summary values out of ffmpeg's log."""
+    stats = {}
+    section = ""
+    for raw in stderr.splitlines():
+        if "max_volume:" in raw:
+            stats["max_volume"] = _summary_value(raw.split("]")[-1])
+            continue
+        if "mean_volume:" in raw:
+            stats["mean_volume"] = _summary_value(raw.split("]")[-1])
+            continue
 
-def is_silent(file: Path) -> bool:
+        line = raw.strip()
+        if line.startswith("Integrated loudness:"):
+            section = "integrated"
+        elif line.startswith("Loudness range:"):
+            section = "range"
+        elif line.startswith("True peak:"):
+            section = "peak"
+        elif line.startswith("I:"):
+            stats["loudness_i"] = _summary_value(line)
+        elif line.startswith("Threshold:") and section == "integrated":
+            stats["loudness_thresh"] = _summary_value(line)
+        elif line.startswith("LRA:"):
+            stats["loudness_lra"] = _summary_value(line)
+        elif line.startswith("Peak:") and section == "peak":
+            stats["true_peak"] = _summary_value(line)
+    return stats
+
+
+def analyse_file(file: Path, backend: str = None) -> dict:
     """
-    Check if track has near-zero amplitude.
-    Uses ffmpeg volumedetect; flags if max_volume < -50 dB.
+    Single analysis pass: one decode feeds
+      - volumedetect       → peak / mean volume (silence check)
+      - ebur128 peak=true  → integrated loudness, threshold, LRA, true peak
+      - first BPM_SECONDS as mono float PCM on stdout → BPM detector
+    No temp WAV; the BPM window is a fixed-size buffer, so memory stays flat.
     """
+    backend = backend or _BPM_BACKEND
+    want_bpm = backend is not None
+    full = "volumedetect,ebur128=peak=true:framelog=verbose"
+    if want_bpm:
+        graph = (
+            f"[0:a:0]asplit=2[a][b];[a]{full}[full];"
+            f"[b]atrim=end={BPM_SECONDS},"
+            f"aformat=sample_fmts=flt:sample_rates={BPM_RATES[backend]}:channel_layouts=mono[bpm]"
+        )
+    else:
+        graph = f"[0:a:0]{full}[full]"
+
+    cmd = [
+        "ffmpeg", "-nostdin", "-hide_banner", "-nostats", "-v", "info",
+        "-i", str(file),
+        "-filter_complex", graph,
+    ]
+    if want_bpm:
+        cmd += ["-map", "[bpm]", "-c:a", "pcm_f32le", "-f", "f32le", "pipe:1"]
+    cmd += ["-map", "[full]", "-f", "null", "-"]
+
+    stats = {"bpm": -1.0, "bpm_confidence": None}
     try:
-        cmd = [
-            "ffmpeg", "-v", "error",
-            "-i", str(file),
-            "-af", "volumedetect",
-            "-f", "null", "-"
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if "max_volume" not in result.stderr:
-            return False
-
-        for line in result.stderr.splitlines():
-            if "max_volume" in line:
-                try:
-                    vol = float(line.split(":")[1].replace(" dB", "").strip())
-                    return vol < -50.0
-                except Exception:
-                    return False
-        return False
-    except Exception:
-        return False
+        proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE if want_bpm else subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        # Drain the log on a thread so a chatty stderr can never block the PCM pipe
+        log = []
+        reader = threading.Thread(target=lambda: log.append(proc.stderr.read()), daemon=True)
+        reader.start()
+
+        if want_bpm:
+            stats["bpm"], stats["bpm_confidence"] = estimate_bpm_stream(
+                proc.stdout, BPM_RATES[backend], backend
+            )
+            proc.stdout.close()
+
+        proc.wait()
+        reader.join()
+        stats.update(parse_analysis_log(b"".join(log).decode("utf-8", "replace")))
+    except Exception as e:
+        print(f"   ⚠️ Analysis failed: {e}")
+    return stats
 
 
-def build_audio_filter_chain(duration: float) -> str:
+def loudnorm_filter(stats: dict = None) -> str:
+    """
+    Second loudnorm pass. With the analysis pass's ebur128 values this is
+    linear mode (one fixed gain, no pumping on quiet intros, far cheaper
+    per sample); without them it falls back to single-pass dynamic mode.
+    """
+    target = f"loudnorm=I={LOUDNORM_I:g}:TP={LOUDNORM_TP:g}:LRA={LOUDNORM_LRA:g}"
+    stats = stats or {}
+    measured = [stats.get(k) for k in ("loudness_i", "true_peak", "loudness_lra", "loudness_thresh")]
+    if not all(v is not None and math.isfinite(v) for v in measured):
+        return target
+    m_i, m_tp, m_lra, m_thresh = measured
+    return (
+        f"{target}:measured_I={m_i:.2f}:measured_TP={m_tp:.2f}"
+        f":measured_LRA={m_lra:.2f}:measured_thresh={m_thresh:.2f}:linear=true"
+    )
+
+
+def build_audio_filter_chain(duration: float, stats: dict = None) -> str:
     """
     Build the ffmpeg -af filter chain:
       - Trim silence
-      - Loudness normalisation
+      - Loudness normalisation (linear when measurements are known)
       - Fade in (1s)
       - Fade out (last 2s if duration known)
     """
@@ -130,7 +262,7 @@ def build_audio_filter_chain(duration: float) -> str:
         "silenceremove="
         "start_periods=1:start_threshold=-50dB:start_silence=0.2:"
         "stop_periods=1:stop_threshold=-50dB:stop_silence=0.5,"
-        "loudnorm=I=-14:TP=-1.5:LRA=11,"
+        f"{loudnorm_filter(stats)},"
         "afade=t=in:st=0:d=1"
     )
 
@@ -141,10 +273,10 @@ def build_audio_filter_chain(duration: float) -> str:
     return chain
 
 
-def clean_one(src: Path, dst: Path, duration: float) -> bool:
+def clean_one(src: Path, dst: Path, duration: float, stats: dict = None) -> bool:
     """Clean, trim, loudness-normalise and fade using ffmpeg."""
     try:
-        afilter = build_audio_filter_chain(duration)
+        afilter = build_audio_filter_chain(duration, stats)
 
         cmd = [
             "ffmpeg",
@@ -177,99 +309,454 @@ def median(values):
     return 0.5 * (values[mid - 1] + values[mid])
 
 
-def estimate_bpm_wav(file: Path, max_analysis_time: float = 90.0) -> float:
+def _read_full(stream, view: memoryview) -> int:
+    got = 0
+    while got < len(view):
+        n = stream.readinto(view[got:])
+        if not n:
+            break
+        got += n
+    return got
+
+
+def estimate_bpm_stream(stream, samplerate: int, backend: str) -> Tuple[float, float]:
+    """
+    Estimate BPM from mono float32 PCM read off a pipe; drains the pipe to EOF.
+    Returns (bpm, confidence 0..1), or (-1.0, 0.0) if it could not tell.
     """
-    Estimate BPM using aubio on a WAV file, analysing up to max_analysis_time seconds.
-    Returns BPM as float, or -1.0 if unavailable.
+    try:
+        if backend == "aubio":
+            return _bpm_aubio(stream, samplerate)
+        return _bpm_numpy(stream, samplerate)
+    except Exception as e:
+        print(f"   ⚠️ BPM estimation failed: {e}")
+        # keep ffmpeg unblocked so the loudness branch can finish
+        try:
+            while stream.read(65536):
+                pass
+        except Exception:
+            pass
+        return -1.0, 0.0
+
+
+def _fold_bpm(bpm: float) -> float:
+    # Clamp to a sensible musical BPM range
+    while bpm < BPM_MIN:
+        bpm *= 2
+    while bpm > BPM_MAX:
+        bpm /= 2
+    return bpm
+
+
+def _bpm_numpy(stream, samplerate: int) -> Tuple[float, float]:
+    """Read the whole window into one preallocated array, then go vectorised."""
+    buf = bytearray(BPM_SECONDS * samplerate * 4)
+    got = _read_full(stream, memoryview(buf))
+    while stream.read(65536):       # past the window (atrim should make this a no-op)
+        pass
+    samples = np.frombuffer(buf, dtype=np.float32, count=got // 4)
+    env = onset_envelope(samples)
+    return tempo_from_onsets(env, samplerate / ONSET_HOP)
+
+
+def onset_envelope(samples: "np.ndarray") -> "np.ndarray":
+    """Spectral flux: summed positive change in log band energy between frames."""
+    if len(samples) < ONSET_WIN * 4:
+        return np.zeros(0, dtype=np.float32)
+    frames = np.lib.stride_tricks.sliding_window_view(samples, ONSET_WIN)[::ONSET_HOP]
+    spec = np.abs(np.fft.rfft(frames * np.hanning(ONSET_WIN).astype(np.float32), axis=1))
+    edges = np.unique(np.geomspace(2, ONSET_WIN // 2 + 1, ONSET_BANDS + 1).round().astype(int))
+    bands = np.add.reduceat(spec, edges[:-1], axis=1) / np.diff(edges)
+    bands = np.log1p(100.0 * bands)
+    flux = np.maximum(np.diff(bands, axis=0), 0.0).sum(axis=1)
+    # Remove the slow trend (~0.5s) so sustained pads don't read as onsets
+    k = 21
+    trend = np.convolve(flux, np.ones(k) / k, mode="same")
+    return np.maximum(flux - trend, 0.0)
+
+
+def tempo_from_onsets(env: "np.ndarray", fps: float) -> Tuple[float, float]:
     """
-    if not AUBIO_AVAILABLE:
-        return -1.0
+    Autocorrelate the onset envelope (via FFT) and pick the strongest beat
+    period in BPM_MIN..BPM_MAX, weighted by a log-normal prior around
+    BPM_PRIOR to settle half/double-tempo ambiguity. Only a winner slower
+    than the beat range (below BPM_PRIOR / sqrt(2), i.e. a bar-level kick
+    period) with strong beats in between is doubled; a beat-period winner
+    keeps its tempo even when eighth-note hats correlate at half the lag.
+    Confidence is the normalised autocorrelation at the lag.
+    """
+    n = len(env)
+    if n < 4 or not env.any():
+        return -1.0, 0.0
+    env = env - env.mean()
+    spec = np.fft.rfft(env, 2 * n)
+    ac = np.fft.irfft(spec * np.conj(spec))[:n]
+    if ac[0] <= 0:
+        return -1.0, 0.0
+    ac /= ac[0]
+
+    lo = max(int(60.0 * fps / BPM_MAX), 1)
+    hi = min(int(60.0 * fps / BPM_MIN) + 1, n - 1)
+    if hi <= lo + 1:
+        return -1.0, 0.0
+    lags = np.arange(lo, hi)
+    bpms = 60.0 * fps / lags
+    prior = np.exp(-0.5 * (np.log2(bpms / BPM_PRIOR) / BPM_PRIOR_OCTAVES) ** 2)
+    best = lo + int(np.argmax(ac[lo:hi] * prior))
+    half = int(round(best / 2))
+    bar_level = 60.0 * fps / best < BPM_PRIOR / math.sqrt(2)
+    if bar_level and half >= lo and ac[half] >= HALF_TIME_RATIO * ac[best]:
+        best = half
+
+    # Parabolic interpolation for a sub-frame lag
+    a, b, c = ac[best - 1], ac[best], ac[best + 1]
+    denom = a - 2 * b + c
+    shift = 0.5 * (a - c) / denom if denom != 0 else 0.0
+    lag = best + max(-0.5, min(0.5, shift))
+
+    confidence = float(max(0.0, min(1.0, b)))
+    if confidence < BPM_MIN_CONFIDENCE:
+        return -1.0, confidence
+    return round(float(_fold_bpm(60.0 * fps / lag)), 1), round(confidence, 2)
+
+
+def _bpm_aubio(stream, samplerate: int) -> Tuple[float, float]:
+    """aubio's beat tracker, one hop at a time into a fixed buffer."""
+    win_s = 1024
+    hop_s = win_s // 2
+
+    buf = bytearray(hop_s * 4)
+    view = memoryview(buf)
+    samples = np.frombuffer(buf, dtype=np.float32)
+
+    tempo = aubio.tempo("default", win_s, hop_s, samplerate)
+
+    beats = []
+
+    while True:
+        got = _read_full(stream, view)
+        if got < len(buf):
+            view[got:] = bytes(len(buf) - got)
+        is_beat = tempo(samples)
+
+        if is_beat[0] == 1:
+            beats.append(tempo.get_last_s())
+
+        if got < len(buf):
+            break
+
+    intervals = [t1 - t0 for t0, t1 in zip(beats[:-1], beats[1:]) if t1 > t0]
+    avg_interval = median(intervals)
+    if avg_interval <= 0:
+        return -1.0, 0.0
+
+    confidence = max(0.0, min(1.0, float(tempo.get_confidence())))
+    return round(_fold_bpm(60.0 / avg_interval), 1), round(confidence, 2)
+
 
+# -------------------------------------------------------
+#  Cleaning manifest
+# -------------------------------------------------------
+#  cleaner_manifest.json remembers what was already cleaned:
+#    entries: content hash → {filename, filter_version, source, backup, row}
+#    paths:   filename     → {size, mtime_ns, hash}
+#    analysis: content hash → analysis-pass stats (loudness, peaks, BPM),
+#             so a re-encode of the same source skips straight to pass two
+#  An unchanged file is recognised from its stat() alone (no read, no
+#  decode), and the playlist + CSV are rebuilt from the stored rows.
+#  After a FILTER_CHAIN_VERSION bump a cleaned file is re-cleaned from its
+#  original in BACKUP (checked against `source`), never from itself.
+
+def file_hash(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load_manifest() -> dict:
+    try:
+        data = json.loads(MANIFEST_FILE.read_text())
+        if data.get("version") == 1:
+            data.setdefault("analysis", {})
+            return data
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"⚠️ Ignoring unreadable manifest {MANIFEST_FILE}: {e}")
+    return {"version": 1, "entries": {}, "paths": {}, "analysis": {}}
+
+
+def save_manifest(manifest: dict):
+    tmp = MANIFEST_FILE.with_suffix(".tmp")
     try:
-        win_s = 1024
-        hop_s = win_s // 2
+        tmp.write_text(json.dumps(manifest, separators=(",", ":")))
+        os.replace(tmp, MANIFEST_FILE)
+    except Exception as e:
+        print(f"⚠️ Could not write manifest: {e}")
 
-        src = aubio.source(str(file), 0, hop_s)
-        samplerate = src.samplerate
 
-        tempo = aubio.tempo("default", win_s, hop_s, samplerate)
+def cached_hash(manifest: dict, f: Path):
+    """Hash recorded for f if its size and mtime are unchanged, else None."""
+    rec = manifest["paths"].get(f.name)
+    if not rec:
+        return None
+    try:
+        st = f.stat()
+    except OSError:
+        return None
+    if rec["size"] == st.st_size and rec["mtime_ns"] == st.st_mtime_ns:
+        return rec["hash"]
+    return None
 
-        beats = []
-        total_time = 0.0
 
-        while True:
-            samples, read = src()
-            is_beat = tempo(samples)
+def remember_path(manifest: dict, f: Path, digest: str):
+    try:
+        st = f.stat()
+    except OSError:
+        return
+    manifest["paths"][f.name] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": digest}
+
+
+def clean_hashes(manifest: dict) -> set:
+    return {
+        h for h, e in manifest["entries"].items()
+        if e.get("cleaned") and e.get("filter_version") == FILTER_CHAIN_VERSION
+    }
+
+
+def stale_sources(manifest: dict) -> Dict[str, Tuple[str, Optional[str]]]:
+    """Cleaned with an older filter chain: cleaned hash → (source hash, backup name)."""
+    return {
+        h: (e["source"], e.get("backup"))
+        for h, e in manifest["entries"].items()
+        if e.get("cleaned") and e.get("source") and e.get("filter_version") != FILTER_CHAIN_VERSION
+    }
+
+
+def backup_path(name: str) -> Path:
+    """Where to back up `name` without ever overwriting an earlier backup."""
+    dst = BACKUP / name
+    n = 1
+    while dst.exists():
+        p = Path(name)
+        dst = BACKUP / f"{p.stem}.{n}{p.suffix}"
+        n += 1
+    return dst
+
+
+def find_backup(f: Path, source_hash: str, backup: Optional[str]) -> Optional[Path]:
+    """The original behind cleaned file f, verified by content hash."""
+    names = [backup] if backup else []
+    names += sorted(p.name for p in BACKUP.glob(glob.escape(f.stem) + ".*"))
+    for name in dict.fromkeys(names):
+        candidate = BACKUP / name
+        try:
+            if candidate.is_file() and file_hash(candidate) == source_hash:
+                return candidate
+        except OSError:
+            continue
+    return None
 
-            if is_beat[0] == 1:
-                this_beat = tempo.get_last_s()
-                beats.append(this_beat)
 
-            total_time += float(read) / float(samplerate)
-            if read < hop_s or total_time >= max_analysis_time:
-                break
+def prune_manifest(manifest: dict, present: List[Path]):
+    names = {f.name for f in present}
+    manifest["paths"] = {n: r for n, r in manifest["paths"].items() if n in names}
 
-        if len(beats) < 2:
-            return -1.0
+    keep = {r["hash"] for r in manifest["paths"].values()}
+    keep |= {manifest["entries"][h].get("source") for h in keep if h in manifest["entries"]}
+    manifest["entries"] = {h: e for h, e in manifest["entries"].items() if h in keep}
+    manifest["analysis"] = {h: a for h, a in manifest["analysis"].items() if h in keep}
 
-        intervals = [t1 - t0 for t0, t1 in zip(beats[:-1], beats[1:]) if t1 > t0]
-        if not intervals:
-            return -1.0
 
-        avg_interval = median(intervals)
-        if avg_interval <= 0:
-            return -1.0
+# -------------------------------------------------------
+#  Per-file work (runs in the pool workers with --jobs)
+# -------------------------------------------------------
 
-        bpm = 60.0 / avg_interval
+# Set once per worker (pool initializer) rather than pickled with every task
+_CLEAN_HASHES: set = set()
+_STALE: dict = {}
+_ANALYSIS: dict = {}
 
-        # Clamp to a sensible musical BPM range
-        if bpm < 60:
-            bpm *= 2
-        if bpm > 200:
-            bpm /= 2
 
-        return round(bpm, 1)
-    except Exception as e:
-        print(f"   ⚠️ BPM estimation failed: {e}")
-        return -1.0
+def _init_worker(hashes: set, stale: dict, analysis: dict, bpm_backend: str):
+    global _CLEAN_HASHES, _STALE, _ANALYSIS, _BPM_BACKEND
+    _CLEAN_HASHES = hashes
+    _STALE = stale
+    _ANALYSIS = analysis
+    _BPM_BACKEND = bpm_backend
 
 
-def estimate_bpm_via_temp_wav(mp3_file: Path) -> float:
+def _fmt(value) -> str:
+    return f"{value:.1f}" if value is not None else ""
+
+
+def process_file(f: Path, index: int, total: int) -> dict:
     """
-    Decode first ~90s of the MP3 to a temporary mono WAV and run aubio on that.
-    Cleans up the temp file afterwards.
+    Inspect, clean, back up and analyse one file.
+    Returns a result dict; main() does all counting and file writing.
     """
-    if not AUBIO_AVAILABLE:
-        return -1.0
+    result = {"status": "failed", "silent": False, "final": None, "row": None,
+              "name": f.name, "hash": None, "source_hash": None, "backup": None,
+              "analysis": None}
 
-    tmp_name = f"bpm_{uuid.uuid4().hex}.wav"
-    tmp_wav = TMP_DIR / tmp_name
+    print(f"→ [{index}/{total}] Processing: {f.name}")
 
+    # Touched but byte-identical to something we already cleaned?
     try:
-        # Decode first 90 seconds to mono 44.1k WAV
-        cmd = [
-            "ffmpeg",
-            "-v", "error",
-            "-t", "90",
-            "-i", str(mp3_file),
-            "-ac", "1",
-            "-ar", "44100",
-            "-y",
-            str(tmp_wav),
-        ]
-        subprocess.run(cmd, check=True)
+        src_hash = file_hash(f)
+    except OSError as e:
+        print(f"   ⚠️ Could not read file: {e}\n")
+        return result
+    result["source_hash"] = src_hash
+    if src_hash in _CLEAN_HASHES:
+        print("   ⏭ Already cleaned (content unchanged).\n")
+        result["status"] = "unchanged"
+        result["hash"] = src_hash
+        return result
+
+    # Our own output from an older filter chain: clean the original again,
+    # never the already-cleaned (lossy, normalised) file
+    source = f
+    if src_hash in _STALE:
+        source_hash, backup = _STALE[src_hash]
+        source = find_backup(f, source_hash, backup)
+        if source is None:
+            print(f"   ⚠️ Cleaned by an older filter chain, but its original is not in "
+                  f"{BACKUP.name} — leaving it as is.\n")
+            result["status"] = "unchanged"
+            result["hash"] = src_hash
+            return result
+        print(f"   ♻️ Filter chain changed — re-cleaning from {BACKUP.name}/{source.name}")
+        src_hash = result["source_hash"] = source_hash
+
+    # Stream info + duration (headers only)
+    info = probe_file(source)
+    if info is None and source is not f:
+        print(f"   ⚠️ Backup {source.name} is unreadable — leaving the cleaned file as is.\n")
+        return result
+    if info is None:
+        print("   ⚠️ Corrupt file removed.")
+        try:
+            f.unlink()
+        except Exception as e:
+            print(f"   ⚠️ Could not delete corrupt file: {e}")
+        result["status"] = "corrupt"
+        return result
+
+    dur = info["duration"]
+    if dur <= 0:
+        print("   ⚠️ Could not determine duration, cleaning without precise fade-out.")
+        dur = -1
+
+    # One decode: volume, loudness and BPM (stored from an earlier run if we have it)
+    stats = _ANALYSIS.get(src_hash)
+    if stats is not None:
+        print("   📏 Reusing stored loudness measurements.")
+    else:
+        stats = analyse_file(source)
+        if stats.get("loudness_i") is not None:
+            result["analysis"] = stats
+
+    # Silence check
+    max_vol = stats.get("max_volume")
+    silent_flag = max_vol is not None and max_vol < SILENT_MAX_DB
+    if silent_flag:
+        print("   🤫 File appears very quiet / mostly silence.")
+        result["silent"] = True
+
+    # Clean and convert
+    dst = SOUNDS / (f.stem + "_clean.mp3")
+
+    if not clean_one(source, dst, dur, stats):
+        print("   ✖ Cleaning failed.\n")
+        return result
+
+    # Backup original (never over an existing backup); a re-clean keeps its backup
+    if source is f:
+        backup = backup_path(f.name)
+        try:
+            shutil.move(str(f), backup)
+            result["backup"] = backup.name
+        except Exception as e:
+            print(f"   ⚠️ Could not move original to backup: {e}")
+    else:
+        result["backup"] = source.name
 
-        bpm = estimate_bpm_wav(tmp_wav, max_analysis_time=90.0)
-        return bpm
+    final = SOUNDS / (f.stem + ".mp3")
+    try:
+        dst.rename(final)
     except Exception as e:
-        print(f"   ⚠️ Failed to create temp WAV for BPM: {e}")
-        return -1.0
-    finally:
-        try:
-            if tmp_wav.exists():
-                tmp_wav.unlink()
-        except Exception:
-            pass
+        print(f"   ⚠️ Could not rename cleaned file: {e}")
+        return result
+
+    result["status"] = "cleaned"
+    result["final"] = final.name
+    try:
+        result["hash"] = file_hash(final)
+    except OSError:
+        pass
+    print(f"   ✔ Cleaned → {final.name}")
+
+    # BPM came from the analysis pass (source and cleaned file share a tempo)
+    bpm = stats["bpm"]
+    confidence = stats.get("bpm_confidence")
+    if bpm > 0:
+        print(f"   🪩 Estimated BPM: {bpm} (confidence {confidence})")
+    else:
+        if _BPM_BACKEND:
+            print("   🪩 BPM: could not determine")
+        else:
+            print("   🪩 BPM: disabled (NumPy not installed)")
+
+    print()
+
+    result["row"] = {
+        "filename": final.name,
+        "duration_sec": f"{dur:.2f}" if dur > 0 else "",
+        "silent_warning": "yes" if silent_flag else "no",
+        "bpm_estimate": f"{bpm:.1f}" if bpm > 0 else "",
+        "bpm_confidence": f"{confidence:.2f}" if bpm > 0 and confidence is not None else "",
+        "loudness_lufs": _fmt(stats.get("loudness_i")),
+        "loudness_range_lu": _fmt(stats.get("loudness_lra")),
+        "true_peak_dbfs": _fmt(stats.get("true_peak")),
+        "max_volume_db": _fmt(max_vol),
+        "mean_volume_db": _fmt(stats.get("mean_volume")),
+    }
+    return result
+
+
+def process_batch(batch: List[Tuple[int, Path]], total: int) -> Tuple[str, List[dict]]:
+    """
+    Pool worker entry point. Files sharing a stem (song.wav + song.mp3) end
+    up in one batch so they still run in order and never race on
+    song_clean.mp3. Output is captured and printed by main() in input order.
+    """
+    buf = io.StringIO()
+    with contextlib.redirect_stdout(buf):
+        results = [process_file(f, i, total) for i, f in batch]
+    return buf.getvalue(), results
+
+
+def make_batches(files: List[Path]) -> List[List[Tuple[int, Path]]]:
+    by_stem = {}
+    for i, f in enumerate(files, 1):
+        by_stem.setdefault(f.stem.lower(), []).append((i, f))
+    return list(by_stem.values())
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Lofi track cleaner")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=1,
+        help="files to process in parallel (0 = one per CPU core, default 1)",
+    )
+    parser.add_argument(
+        "--bpm", choices=BPM_BACKENDS + ["off"], default=_BPM_BACKEND or "off",
+        help="BPM backend (default: numpy when installed)",
+    )
+    return parser.parse_args()
 
 
 # -------------------------------------------------------
@@ -277,6 +764,11 @@ def estimate_bpm_via_temp_wav(mp3_file: Path) -> float:
 # -------------------------------------------------------
 
 def main():
+    global _BPM_BACKEND
+    args = parse_args()
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    _BPM_BACKEND = None if args.bpm == "off" else args.bpm
+
     banner()
 
     if not SOUNDS.exists():
@@ -308,84 +800,90 @@ def main():
         print("❌ No valid audio files found.")
         return
 
-    print(f"🔍 Found {len(files)} audio files to inspect.\n")
+    print(f"🔍 Found {len(files)} audio files to inspect.")
 
-    cleaned = 0
-    skipped = 0
-    silent_count = 0
-    corrupt_count = 0
-
-    playlist_entries = []
-    analysis_rows = []
+    manifest = load_manifest()
+    done_hashes = clean_hashes(manifest)
+    stale = stale_sources(manifest)
 
+    # O(1) skip: same name, size and mtime as a file we already cleaned
+    unchanged = 0
+    todo = []
     for f in files:
-        print(f"→ Processing: {f.name}")
-
-        # Corruption check
-        if is_corrupt(f):
-            print("   ⚠️ Corrupt file removed.")
-            try:
-                f.unlink()
-            except Exception as e:
-                print(f"   ⚠️ Could not delete corrupt file: {e}")
-            corrupt_count += 1
-            continue
-
-        # Duration
-        dur = ffprobe_duration(f)
-        if dur <= 0:
-            print("   ⚠️ Could not determine duration, cleaning without precise fade-out.")
-            dur = -1
-
-        # Silence check
-        silent_flag = is_silent(f)
-        if silent_flag:
-            print("   🤫 File appears very quiet / mostly silence.")
-            silent_count += 1
+        if cached_hash(manifest, f) in done_hashes:
+            unchanged += 1
+        else:
+            todo.append(f)
 
-        # Clean and convert
-        dst = SOUNDS / (f.stem + "_clean.mp3")
+    print(f"⏭ Unchanged since last run: {unchanged}")
+    print(f"⚙️ Parallel jobs: {jobs}\n")
 
-        if clean_one(f, dst, dur):
-            # Backup original
-            try:
-                shutil.move(str(f), BACKUP / f.name)
-            except Exception as e:
-                print(f"   ⚠️ Could not move original to backup: {e}")
+    cleaned = 0
+    skipped = 0
+    silent_count = 0
+    corrupt_count = 0
 
-            final = SOUNDS / (f.stem + ".mp3")
-            try:
-                dst.rename(final)
-            except Exception as e:
-                print(f"   ⚠️ Could not rename cleaned file: {e}")
+    batches = make_batches(todo)
+    total = len(todo)
+
+    def collect(results):
+        nonlocal cleaned, skipped, silent_count, corrupt_count, unchanged
+        for r in results:
+            if r["analysis"]:
+                manifest["analysis"][r["source_hash"]] = r["analysis"]
+            if r["silent"]:
+                silent_count += 1
+            if r["status"] == "corrupt":
+                corrupt_count += 1
+            elif r["status"] == "unchanged":
+                unchanged += 1
+                remember_path(manifest, SOUNDS / r["name"], r["hash"])
+            elif r["status"] == "cleaned" and r["hash"]:
+                cleaned += 1
+                manifest["entries"][r["hash"]] = {
+                    "filename": r["final"],
+                    "filter_version": FILTER_CHAIN_VERSION,
+                    "cleaned": True,
+                    "source": r["source_hash"],
+                    "backup": r["backup"],
+                    "row": r["row"],
+                }
+                remember_path(manifest, SOUNDS / r["final"], r["hash"])
+            else:
                 skipped += 1
-                continue
+                if r["source_hash"]:
+                    # Keep its measurements around for the retry
+                    remember_path(manifest, SOUNDS / r["name"], r["source_hash"])
+
+    if jobs > 1 and batches:
+        # Results come back in input order; only this process prints and writes files
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(done_hashes, stale, manifest["analysis"], _BPM_BACKEND)) as pool:
+            for text, results in pool.map(process_batch, batches, [total] * len(batches)):
+                print(text, end="", flush=True)
+                collect(results)
+    else:
+        _init_worker(done_hashes, stale, manifest["analysis"], _BPM_BACKEND)
+        for batch in batches:
+            for i, f in batch:
+                collect([process_file(f, i, total)])
 
-            playlist_entries.append(final.name)
-            cleaned += 1
-            print(f"   ✔ Cleaned → {final.name}")
+    # Rebuild playlist + CSV from the manifest (covers skipped files too)
+    present = [
+        f for f in SOUNDS.iterdir()
+        if f.suffix.lower() in SUPPORTED and not is_junk(f.name)
+    ]
+    prune_manifest(manifest, present)
+    save_manifest(manifest)
 
-            # BPM using temp WAV
-            bpm = estimate_bpm_via_temp_wav(final)
-            if bpm > 0:
-                print(f"   🪩 Estimated BPM: {bpm}")
-            else:
-                if AUBIO_AVAILABLE:
-                    print("   🪩 BPM: could not determine")
-                else:
-                    print("   🪩 BPM: aubio not installed")
-
-            print()
-
-            analysis_rows.append({
-                "filename": final.name,
-                "duration_sec": f"{dur:.2f}" if dur > 0 else "",
-                "silent_warning": "yes" if silent_flag else "no",
-                "bpm_estimate": f"{bpm:.1f}" if bpm > 0 else "",
-            })
-        else:
-            skipped += 1
-            print("   ✖ Cleaning failed.\n")
+    playlist_entries = []
+    analysis_rows = []
+    for name in sorted(manifest["paths"]):
+        entry = manifest["entries"].get(manifest["paths"][name]["hash"])
+        if not entry or not entry.get("cleaned"):
+            continue
+        playlist_entries.append(name)
+        analysis_rows.append(dict(entry["row"], filename=name))
 
     # Write cleaned playlist
     if playlist_entries:
@@ -400,8 +898,7 @@ def main():
     if analysis_rows:
         try:
             with ANALYSIS_CSV.open("w", newline="") as csvfile:
-                fieldnames = ["filename", "duration_sec", "silent_warning", "bpm_estimate"]
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+                writer = csv.DictWriter(csvfile, fieldnames=CSV_FIELDS, restval="")
                 writer.writeheader()
                 for row in analysis_rows:
                     writer.writerow(row)
@@ -410,14 +907,16 @@ def main():
 
     # Summary
     print("\n---------------------------------------------------")
-    print("✨ CLEANING SUMMARY (v3.2 BPM)")
+    print("✨ CLEANING SUMMARY (v3.5)")
     print(f"🎧 Cleaned tracks: {cleaned}")
+    print(f"⏭ Unchanged skipped: {unchanged}")
     print(f"🚫 Skipped errors: {skipped}")
     print(f"❌ Corrupt removed: {corrupt_count}")
     print(f"🤫 Silent warnings: {silent_count}")
     print(f"📦 Original backups: {BACKUP}")
     print(f"📝 Playlist file: {PLAYLIST_OUT}")
     print(f"📊 Analysis CSV:   {ANALYSIS_CSV}")
+    print(f"🗃 Manifest:       {MANIFEST_FILE}")
     print("---------------------------------------------------\n")
 
 